@@ -0,0 +1,70 @@
+"""
+Benchmark: cost of per-prediction feature attributions vs. plain predict_proba.
+
+Uses the trained artifacts when present (MODEL_PATH / SCALER_PATH), otherwise
+trains the standard Lab 3 forest on freshly generated data first.
+
+Usage:
+    python benchmarks/explain_overhead.py [--repeats 300] [--batch-size 10000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from data_generator import generate_manufacturing_data
+from forest_explainer import ForestExplainer
+from model_training import FEATURE_COLUMNS, train_optimized_model
+
+
+def load_or_train():
+    model_path = os.environ.get('MODEL_PATH', '/exchange/quality_model.joblib')
+    scaler_path = os.environ.get('SCALER_PATH', '/exchange/scaler.joblib')
+    if os.path.exists(model_path) and os.path.exists(scaler_path):
+        return joblib.load(model_path), joblib.load(scaler_path)
+    model, scaler, _, _ = train_optimized_model(generate_manufacturing_data(n_samples=5000))
+    return model, scaler
+
+
+def time_call(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure explanation overhead on the Lab 3 forest.')
+    parser.add_argument('--repeats', type=int, default=300)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    model, scaler = load_or_train()
+    data = generate_manufacturing_data(n_samples=args.batch_size, seed=7)
+    X = scaler.transform(data[FEATURE_COLUMNS].values)
+
+    start = time.perf_counter()
+    explainer = ForestExplainer(model, FEATURE_COLUMNS)
+    build_seconds = time.perf_counter() - start
+
+    single = X[:1]
+    single_proba = time_call(lambda: model.predict_proba(single), args.repeats)
+    single_explain = time_call(lambda: explainer.explain(single), args.repeats)
+    batch_proba = time_call(lambda: model.predict_proba(X), 5)
+    batch_explain = time_call(lambda: explainer.explain(X), 5)
+
+    probabilities, _ = explainer.explain(X)
+    max_error = float(np.abs(probabilities - model.predict_proba(X)).max())
+
+    print("\n[EXPLANATION OVERHEAD]")
+    print(f"  Precompute at model load : {build_seconds * 1000:8.1f} ms ({explainer.table_nbytes / 1024**2:.1f} MB table)")
+    print(f"  Single row predict_proba : {single_proba * 1000:8.2f} ms")
+    print(f"  Single row explain       : {single_explain * 1000:8.2f} ms ({single_explain / single_proba:.2f}x)")
+    print(f"  {args.batch_size} rows predict_proba : {batch_proba * 1000:8.1f} ms")
+    print(f"  {args.batch_size} rows explain       : {batch_explain * 1000:8.1f} ms ({batch_explain / batch_proba:.2f}x)")
+    print(f"  Max |proba - (bias + sum contributions)| : {max_error:.2e}\n")
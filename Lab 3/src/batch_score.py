@@ -0,0 +1,284 @@
+"""
+Manufacturing Quality Prediction - Offline Batch Scoring CLI
+Rescores historical CSV / Parquet sensor dumps with the trained artifacts,
+without routing every row through the Flask API.
+
+The model and scaler are loaded once in the parent process; the worker pool is
+forked afterwards so every worker shares the same read-only copy of the forest
+(copy-on-write). Input is streamed in chunks, at most a few chunks are in flight
+at any time, and results are appended to the output file in input order. A
+progress checkpoint is written after every chunk so a crashed run can be resumed.
+
+Usage:
+    python src/batch_score.py INPUT OUTPUT [--chunk-size N] [--workers N] [--resume] [--explain]
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import resource
+import sys
+import time
+import logging
+from collections import deque
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from forest_explainer import ForestExplainer
+
+# Configure logging for detailed output
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - [BATCH_SCORER] - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+FEATURE_COLUMNS = ['spindle_speed', 'feed_rate', 'depth_of_cut', 'vibration', 'temperature', 'tool_wear']
+CLASS_LABELS = {0: 'Good Quality', 1: 'Minor Defect', 2: 'Major Defect'}
+
+MODEL_PATH = os.environ.get('MODEL_PATH', '/exchange/quality_model.joblib' if os.path.exists('/exchange/quality_model.joblib') else 'quality_model.joblib')
+SCALER_PATH = os.environ.get('SCALER_PATH', '/exchange/scaler.joblib' if os.path.exists('/exchange/scaler.joblib') else 'scaler.joblib')
+
+# ── Artifacts shared with forked workers (copy-on-write) ──
+_model = None
+_scaler = None
+_explainer = None
+
+
+def load_artifacts(model_path=MODEL_PATH, scaler_path=SCALER_PATH, explain=False):
+    """Load the model and scaler into the module globals used by the workers."""
+    global _model, _scaler, _explainer
+    logger.info(f"Loading predictive model from {model_path}...")
+    _model = joblib.load(model_path)
+    # Each worker scores its own chunk; nested tree-level threading would oversubscribe the pool.
+    if hasattr(_model, 'n_jobs'):
+        _model.n_jobs = 1
+    logger.info(f"Loading feature scaler from {scaler_path}...")
+    _scaler = joblib.load(scaler_path)
+    if explain:
+        logger.info("Precomputing per-leaf feature attributions for explanations...")
+        _explainer = ForestExplainer(_model, FEATURE_COLUMNS)
+
+
+def _init_spawned_worker(model_path, scaler_path, explain):
+    """Pool initializer for platforms without fork: each worker loads its own copy."""
+    load_artifacts(model_path, scaler_path, explain)
+
+
+def score_chunk(features, explain=False):
+    """Score one chunk of raw (unscaled) sensor values. Runs inside a worker."""
+    scaled = _scaler.transform(features)
+    if explain:
+        probabilities, contributions = _explainer.explain(scaled)
+        attributions = _explainer.predicted_class_contributions(probabilities, contributions)
+    else:
+        probabilities = _model.predict_proba(scaled)
+        attributions = None
+    predicted = _model.classes_.take(np.argmax(probabilities, axis=1))
+    return predicted.astype(np.int64), probabilities, attributions
+
+
+def iter_input_chunks(input_path, chunk_size, skip_rows=0):
+    """Yield DataFrames of at most ``chunk_size`` rows from a CSV or Parquet file."""
+    if input_path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        skipped = 0
+        for batch in pq.ParquetFile(input_path).iter_batches(batch_size=chunk_size):
+            if skipped + batch.num_rows <= skip_rows:
+                skipped += batch.num_rows
+                continue
+            frame = batch.to_pandas()
+            if skipped < skip_rows:
+                frame = frame.iloc[skip_rows - skipped:]
+                skipped = skip_rows
+            yield frame
+    else:
+        reader = pd.read_csv(
+            input_path,
+            chunksize=chunk_size,
+            skiprows=range(1, skip_rows + 1) if skip_rows else None
+        )
+        for frame in reader:
+            yield frame
+
+
+def format_output(frame, predicted, probabilities, attributions=None):
+    """Attach prediction columns to the input rows of one chunk."""
+    output = frame.copy()
+    output['predicted_class'] = predicted
+    output['prediction_result'] = [CLASS_LABELS[int(p)] for p in predicted]
+    for class_index, label in CLASS_LABELS.items():
+        column = 'probability_' + label.lower().replace(' ', '_')
+        output[column] = np.round(probabilities[:, class_index], 6)
+    if attributions is not None:
+        for feature_index, feature in enumerate(FEATURE_COLUMNS):
+            output['contribution_' + feature] = np.round(attributions[:, feature_index], 6)
+    return output
+
+
+# ── Checkpointing ──
+
+def checkpoint_path_for(output_path):
+    return output_path + '.progress.json'
+
+
+def load_checkpoint(output_path, input_path, chunk_size, explain):
+    """Return the saved progress for this exact job, or None if it cannot be resumed."""
+    path = checkpoint_path_for(output_path)
+    if not os.path.exists(path) or not os.path.exists(output_path):
+        return None
+    with open(path, 'r') as f:
+        checkpoint = json.load(f)
+    if (checkpoint.get('input_path') != os.path.abspath(input_path)
+            or checkpoint.get('chunk_size') != chunk_size
+            or checkpoint.get('explain') != explain):
+        logger.warning("Checkpoint belongs to a different input, chunk size or output layout. Starting from scratch.")
+        return None
+    return checkpoint
+
+
+def save_checkpoint(output_path, checkpoint):
+    """Atomically replace the checkpoint so a crash never leaves it half-written."""
+    path = checkpoint_path_for(output_path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+def peak_memory_mb():
+    """Peak resident set size of this process and its (reaped) workers, in MB."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    divisor = 1024 ** 2 if sys.platform == 'darwin' else 1024
+    return own / divisor, children / divisor
+
+
+# ── Driver ──
+
+def run_batch_scoring(input_path, output_path, chunk_size=50000, workers=None, resume=False, explain=False):
+    """Stream ``input_path`` through the model and write ordered predictions to ``output_path``."""
+    workers = workers or os.cpu_count() or 1
+    load_artifacts(explain=explain)
+
+    checkpoint = load_checkpoint(output_path, input_path, chunk_size, explain) if resume else None
+    if checkpoint:
+        chunks_done = checkpoint['chunks_completed']
+        rows_done = checkpoint['rows_completed']
+        # Discard anything written after the last checkpointed chunk.
+        with open(output_path, 'r+b') as f:
+            f.truncate(checkpoint['output_bytes'])
+        logger.info(f"Resuming after chunk {chunks_done} ({rows_done} rows already scored).")
+    else:
+        chunks_done, rows_done = 0, 0
+        checkpoint = {
+            'input_path': os.path.abspath(input_path),
+            'chunk_size': chunk_size,
+            'explain': explain,
+            'started_at': datetime.now().isoformat()
+        }
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+    if 'fork' in mp.get_all_start_methods():
+        pool = mp.get_context('fork').Pool(workers)
+    else:
+        pool = mp.get_context('spawn').Pool(workers, _init_spawned_worker, (MODEL_PATH, SCALER_PATH, explain))
+
+    logger.info(f"Scoring {input_path} in chunks of {chunk_size} rows across {workers} worker(s)...")
+    start_time = time.time()
+    rows_this_run = 0
+    in_flight = deque()
+    max_in_flight = workers * 2
+
+    def drain_one(out_file):
+        nonlocal chunks_done, rows_done, rows_this_run
+        frame, pending = in_flight.popleft()
+        predicted, probabilities, attributions = pending.get()
+        format_output(frame, predicted, probabilities, attributions).to_csv(out_file, index=False, header=(out_file.tell() == 0))
+        out_file.flush()
+        os.fsync(out_file.fileno())
+
+        chunks_done += 1
+        rows_done += len(frame)
+        rows_this_run += len(frame)
+        checkpoint.update({
+            'chunks_completed': chunks_done,
+            'rows_completed': rows_done,
+            'output_bytes': out_file.tell(),
+            'updated_at': datetime.now().isoformat()
+        })
+        save_checkpoint(output_path, checkpoint)
+
+        elapsed = time.time() - start_time
+        logger.info(f"Chunk {chunks_done} complete: {rows_done} rows total ({rows_this_run / max(elapsed, 1e-9):,.0f} rows/s)")
+
+    try:
+        with open(output_path, 'a', newline='') as out_file:
+            for frame in iter_input_chunks(input_path, chunk_size, skip_rows=rows_done):
+                missing = [c for c in FEATURE_COLUMNS if c not in frame.columns]
+                if missing:
+                    raise ValueError(f"Input is missing required sensor columns: {missing}")
+                features = frame[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+                in_flight.append((frame, pool.apply_async(score_chunk, (features, explain))))
+                # Bounded window: never hold more than a few chunks in memory.
+                if len(in_flight) >= max_in_flight:
+                    drain_one(out_file)
+            while in_flight:
+                drain_one(out_file)
+    finally:
+        pool.close()
+        pool.join()
+
+    duration = time.time() - start_time
+    own_peak, worker_peak = peak_memory_mb()
+    if os.path.exists(checkpoint_path_for(output_path)):
+        os.remove(checkpoint_path_for(output_path))
+
+    summary = {
+        'rows_scored_this_run': rows_this_run,
+        'rows_total': rows_done,
+        'chunks_total': chunks_done,
+        'duration_seconds': round(duration, 2),
+        'throughput_rows_per_second': round(rows_this_run / max(duration, 1e-9), 1),
+        'peak_rss_parent_mb': round(own_peak, 1),
+        'peak_rss_largest_worker_mb': round(worker_peak, 1),
+        'workers': workers
+    }
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Offline batch scoring for the CNC quality classifier.')
+    parser.add_argument('input', help='Input sensor file (.csv or .parquet)')
+    parser.add_argument('output', help='Output CSV with predictions and class probabilities')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='Rows per chunk (default: 50000)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--resume', action='store_true', help='Resume from the last completed chunk')
+    parser.add_argument('--explain', action='store_true', help='Add per-sensor contributions to the predicted class')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    print("\n" + "="*80)
+    print("  BATCH SCORING ENGINE: OFFLINE QUALITY PREDICTION")
+    print("="*80)
+
+    if not os.path.exists(args.input):
+        logger.error(f"Input file not found at {args.input}. Aborting.")
+        exit(1)
+
+    report = run_batch_scoring(args.input, args.output, args.chunk_size, args.workers, args.resume, args.explain)
+
+    print("\n[BATCH SCORING SUMMARY]")
+    for key, value in report.items():
+        print(f"  {key:30}: {value}")
+
+    print("\n" + "="*80)
+    print("  BATCH SCORING COMPLETE")
+    print("="*80 + "\n")
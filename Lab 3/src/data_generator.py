@@ -8,7 +8,9 @@ import pandas as pd
 import json
 import os
 import logging
+import time
 from datetime import datetime
+from pipeline_cache import stage_fingerprint, skip_if_current, record_stage_run
 
 # Configure logging for detailed output
 logging.basicConfig(
@@ -103,10 +105,22 @@ if __name__ == '__main__':
     print("  MANUFACTURING ENGINE: HIGH-PRECISION DATA GENERATION")
     print("="*80)
     
-    dataset = generate_manufacturing_data(n_samples=5000)
-    
+    n_samples, seed = 5000, 42
     output_directory = '/exchange'
     output_file = os.path.join(output_directory, 'manufacturing_data.csv')
+    metadata_file = os.path.join(output_directory, 'data_metadata.json')
+    
+    fingerprint, stage_inputs = stage_fingerprint(
+        code_files=['data_generator.py'],
+        params={'n_samples': n_samples, 'seed': seed, 'sensor_limits': LIMITS},
+        upstream_files=[]
+    )
+    if skip_if_current('data-generator', fingerprint):
+        print("  Dataset is up to date with the current code and parameters. Nothing to do.\n")
+        exit(0)
+    
+    stage_start = time.time()
+    dataset = generate_manufacturing_data(n_samples=n_samples, seed=seed)
     os.makedirs(output_directory, exist_ok=True)
     
     logger.info(f"Writing dataset to {output_file}...")
@@ -124,11 +138,11 @@ if __name__ == '__main__':
         'class_distribution': dataset['quality_label'].value_counts().to_dict()
     }
     
-    metadata_file = os.path.join(output_directory, 'data_metadata.json')
     with open(metadata_file, 'w') as f:
         json.dump(metadata, f, indent=4)
     
     logger.info(f"Metadata successfully saved to {metadata_file}")
+    record_stage_run('data-generator', fingerprint, stage_inputs, [output_file, metadata_file], time.time() - stage_start)
     
     print("\n[SUMMARY REPORT]")
     print(f"  Total Samples: {len(dataset)}")
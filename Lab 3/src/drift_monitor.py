@@ -0,0 +1,139 @@
+"""
+Manufacturing Quality Prediction - Live Sensor Drift Monitor
+Compares incoming sensor readings against the training-time reference profile.
+
+At training time each sensor is summarised as a fixed histogram: interior bin
+edges at the training quantiles and the fraction of training rows per bin.
+At serving time every reading is mapped to its bin index and pushed into a
+fixed-size ring buffer. Each sliding window keeps running bin counts, so an
+update is O(1) per window (one increment, one decrement) and memory stays
+constant no matter how much traffic the server sees.
+
+Drift is scored with the Population Stability Index (PSI) per sensor:
+    PSI < 0.10  -> stable
+    PSI < 0.25  -> moderate drift
+    otherwise   -> significant drift
+"""
+import json
+import threading
+from bisect import bisect_right
+from datetime import datetime
+
+import numpy as np
+
+DEFAULT_BINS = 10
+DEFAULT_WINDOWS = (500, 5000)
+PSI_MODERATE = 0.10
+PSI_SIGNIFICANT = 0.25
+# Windows with fewer readings than this report status "insufficient_data".
+MIN_WINDOW_READINGS = 100
+_EPSILON = 1e-4
+
+
+def build_reference_profile(features, feature_names, n_bins=DEFAULT_BINS):
+    """
+    Summarise training data as per-sensor quantile histograms.
+
+    Args:
+        features: 2-D array of raw (unscaled) training values.
+        feature_names: Column names matching ``features``.
+        n_bins: Number of quantile bins per sensor.
+    """
+    features = np.asarray(features, dtype=np.float64)
+    quantiles = np.linspace(0, 1, n_bins + 1)[1:-1]
+    profile = {}
+    for index, name in enumerate(feature_names):
+        column = features[:, index]
+        edges = np.unique(np.quantile(column, quantiles))
+        counts = np.bincount(np.searchsorted(edges, column, side='right'), minlength=len(edges) + 1)
+        profile[name] = {
+            'edges': edges.tolist(),
+            'proportions': (counts / counts.sum()).tolist()
+        }
+    return {
+        'created_at': datetime.now().isoformat(),
+        'n_reference_rows': int(features.shape[0]),
+        'features': profile
+    }
+
+
+def population_stability_index(expected, observed):
+    """PSI between two proportion vectors, smoothed to avoid log(0)."""
+    expected = np.clip(np.asarray(expected, dtype=np.float64), _EPSILON, None)
+    observed = np.clip(np.asarray(observed, dtype=np.float64), _EPSILON, None)
+    return float(np.sum((observed - expected) * np.log(observed / expected)))
+
+
+def drift_status(psi):
+    if psi >= PSI_SIGNIFICANT:
+        return 'significant_drift'
+    if psi >= PSI_MODERATE:
+        return 'moderate_drift'
+    return 'stable'
+
+
+class DriftMonitor:
+    """Fixed-memory sliding-window histograms for each sensor."""
+
+    def __init__(self, reference_profile, windows=DEFAULT_WINDOWS):
+        self.feature_names = list(reference_profile['features'].keys())
+        self.edges = [reference_profile['features'][f]['edges'] for f in self.feature_names]
+        self.reference = [np.asarray(reference_profile['features'][f]['proportions']) for f in self.feature_names]
+        self.windows = sorted(int(w) for w in windows)
+        self.capacity = self.windows[-1]
+
+        n_features = len(self.feature_names)
+        max_bins = max(len(e) + 1 for e in self.edges)
+        # Ring buffer of bin indices sized to the largest window.
+        self._ring = np.zeros((self.capacity, n_features), dtype=np.int16)
+        # Running bin counts per window, per sensor.
+        self._counts = np.zeros((len(self.windows), n_features, max_bins), dtype=np.int64)
+        self._columns = np.arange(n_features)
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def update(self, reading):
+        """Record one reading given as a sequence ordered like ``feature_names``."""
+        bins = [bisect_right(edges, value) for edges, value in zip(self.edges, reading)]
+        columns = self._columns
+        with self._lock:
+            position = self._total % self.capacity
+            for w, size in enumerate(self.windows):
+                if self._total >= size:
+                    # Evict the reading that just fell out of this window.
+                    evicted = self._ring[(self._total - size) % self.capacity]
+                    self._counts[w, columns, evicted] -= 1
+                self._counts[w, columns, bins] += 1
+            self._ring[position] = bins
+            self._total += 1
+
+    def scores(self):
+        """Per-window, per-sensor PSI against the reference profile."""
+        with self._lock:
+            counts = self._counts.copy()
+            total = self._total
+
+        report = {'readings_observed': total, 'windows': {}}
+        for w, size in enumerate(self.windows):
+            n = min(total, size)
+            window = {'window_size': size, 'readings_in_window': n, 'sensors': {}}
+            if n < MIN_WINDOW_READINGS:
+                window['status'] = 'insufficient_data'
+                report['windows'][str(size)] = window
+                continue
+
+            worst = 0.0
+            for f, name in enumerate(self.feature_names):
+                n_bins = len(self.reference[f])
+                psi = population_stability_index(self.reference[f], counts[w, f, :n_bins] / n)
+                window['sensors'][name] = {'psi': round(psi, 4), 'status': drift_status(psi)}
+                worst = max(worst, psi)
+            window['max_psi'] = round(worst, 4)
+            window['status'] = drift_status(worst)
+            report['windows'][str(size)] = window
+        return report
+
+
+def load_reference_profile(path):
+    with open(path, 'r') as f:
+        return json.load(f)
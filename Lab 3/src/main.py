@@ -3,13 +3,20 @@ Manufacturing Quality Prediction - High-Fidelity Serving API
 Server-side component for predicting precision CNC defect status.
 Revised for full terminology and strict sensor input validation.
 """
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template
 import numpy as np
 import joblib
+import hmac
 import json
+import math
 import os
 import logging
+import threading
 from datetime import datetime
+from drift_monitor import DriftMonitor, load_reference_profile, DEFAULT_WINDOWS
+from forest_explainer import ForestExplainer
+from pipeline_cache import load_manifest
+from sampling_profiler import SamplingProfiler, DEFAULT_INTERVAL
 
 # Configure logging for professional request tracking
 logging.basicConfig(
@@ -36,7 +43,13 @@ PORT = int(os.environ.get('SERVING_PORT', 5000))
 MODEL_PATH = os.environ.get('MODEL_PATH', '/exchange/quality_model.joblib' if os.path.exists('/exchange/quality_model.joblib') else 'quality_model.joblib')
 SCALER_PATH = os.environ.get('SCALER_PATH', '/exchange/scaler.joblib' if os.path.exists('/exchange/scaler.joblib') else 'scaler.joblib')
 METRICS_PATH = os.environ.get('METRICS_PATH', '/exchange/training_metrics.json' if os.path.exists('/exchange/training_metrics.json') else 'training_metrics.json')
+DRIFT_REFERENCE_PATH = os.environ.get('DRIFT_REFERENCE_PATH', '/exchange/drift_reference.json' if os.path.exists('/exchange/drift_reference.json') else 'drift_reference.json')
+DRIFT_WINDOWS = [int(w) for w in os.environ.get('DRIFT_WINDOWS', ','.join(map(str, DEFAULT_WINDOWS))).split(',')]
 DEBUG_MODE = os.environ.get('FLASK_DEBUG', 'false').lower() == 'true'
+# On-demand profiling is off unless explicitly enabled and protected by a token
+PROFILER_ENABLED = os.environ.get('ENABLE_PROFILER', 'false').lower() == 'true'
+PROFILER_TOKEN = os.environ.get('PROFILER_TOKEN', '')
+PROFILER_MAX_SECONDS = float(os.environ.get('PROFILER_MAX_SECONDS', 30))
 
 # ── App Setup ──
 app = Flask(__name__)
@@ -45,20 +58,31 @@ app = Flask(__name__)
 model = None
 scaler = None
 training_metrics = {}
+drift_monitor = None
+explainer = None
 prediction_counter = 0
+profile_lock = threading.Lock()
 
 def load_system_artifacts():
-    global model, scaler, training_metrics
+    global model, scaler, training_metrics, drift_monitor, explainer
     try:
         logger.info(f"Loading predictive model from {MODEL_PATH}...")
         model = joblib.load(MODEL_PATH)
         logger.info(f"Loading feature scaler from {SCALER_PATH}...")
         scaler = joblib.load(SCALER_PATH)
+        logger.info("Precomputing per-leaf feature attributions for explanations...")
+        explainer = ForestExplainer(model, FEATURE_KEY_ORDER)
         
         if os.path.exists(METRICS_PATH):
             with open(METRICS_PATH, 'r') as f:
                 training_metrics = json.load(f)
             logger.info("Training metrics successfully synchronized.")
+        
+        if os.path.exists(DRIFT_REFERENCE_PATH):
+            drift_monitor = DriftMonitor(load_reference_profile(DRIFT_REFERENCE_PATH), windows=DRIFT_WINDOWS)
+            logger.info(f"Drift monitor armed with sliding windows {drift_monitor.windows}.")
+        else:
+            logger.warning(f"Drift reference profile not found at {DRIFT_REFERENCE_PATH}. Drift monitoring disabled.")
             
         logger.info("System artifacts loaded. Integrity check: PASSED.")
     except Exception as e:
@@ -91,10 +115,70 @@ def system_metrics():
         'model_metadata': training_metrics.get('model_name', 'Manufacturing Classifier'),
         'model_accuracy': round(training_metrics.get('accuracy', 0.0), 4),
         'predictions_since_startup': prediction_counter,
+        'pipeline_stages': {
+            stage: {
+                'fingerprint': entry.get('fingerprint', '')[:12],
+                'last_status': entry.get('last_status'),
+                'duration_seconds': entry.get('duration_seconds'),
+                'time_saved_seconds': entry.get('time_saved_seconds')
+            }
+            for stage, entry in load_manifest()['stages'].items()
+        },
         'feature_terminology': {k: v['unit'] for k, v in SENSOR_LIMITS.items()}
     })
 
 
+@app.route('/drift')
+def drift_scores():
+    """Expose live sensor drift scores against the training reference profile."""
+    if drift_monitor is None:
+        return jsonify({'enabled': False, 'reason': 'No drift reference profile loaded.'}), 503
+    report = drift_monitor.scores()
+    report['enabled'] = True
+    report['timestamp'] = datetime.now().isoformat()
+    return jsonify(report)
+
+
+@app.route('/debug/profile')
+def profile_live_process():
+    """Sample the live process for N seconds and return collapsed stacks for flamegraph tools."""
+    if not PROFILER_ENABLED:
+        return jsonify({'success': False, 'errors': ['Profiler is disabled.']}), 404
+    supplied_token = request.headers.get('X-Profiler-Token', '')
+    if not PROFILER_TOKEN or not hmac.compare_digest(supplied_token, PROFILER_TOKEN):
+        logger.warning("Rejected profiler request with missing or invalid token.")
+        return jsonify({'success': False, 'errors': ['Invalid profiler token.']}), 403
+    
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        interval = float(request.args.get('interval_ms', DEFAULT_INTERVAL * 1000)) / 1000
+    except ValueError:
+        return jsonify({'success': False, 'errors': ['seconds and interval_ms must be numeric.']}), 400
+    if not (math.isfinite(seconds) and seconds > 0):
+        return jsonify({'success': False, 'errors': ['seconds must be a positive finite number.']}), 400
+    if not (math.isfinite(interval) and interval > 0):
+        return jsonify({'success': False, 'errors': ['interval_ms must be a positive finite number.']}), 400
+    seconds = min(seconds, PROFILER_MAX_SECONDS)
+    
+    # One profile at a time; a second caller is turned away rather than queued.
+    if not profile_lock.acquire(blocking=False):
+        return jsonify({'success': False, 'errors': ['A profile is already running.']}), 409
+    try:
+        logger.info(f"Starting sampling profile for {seconds:.1f}s (interval {interval * 1000:.1f} ms)...")
+        collapsed, stats = SamplingProfiler(interval=interval).profile(
+            seconds, exclude_thread_ids={threading.get_ident()}
+        )
+    finally:
+        profile_lock.release()
+    
+    logger.info(f"Profile complete: {stats['samples']} samples, overhead {stats['overhead_fraction']:.2%}")
+    return Response(collapsed, mimetype='text/plain', headers={
+        'X-Profile-Samples': str(stats['samples']),
+        'X-Profile-Overhead-Fraction': f"{stats['overhead_fraction']:.4f}",
+        'X-Profile-Dropped-Stacks': str(stats['dropped_stacks'])
+    })
+
+
 @app.route('/predict', methods=['POST'])
 def perform_prediction():
     global prediction_counter
@@ -103,6 +187,7 @@ def perform_prediction():
         # 1. Capture and Validate Data
         data = request.form if request.form else request.get_json()
         logger.info("Received incoming prediction request.")
+        explain_requested = str(data.get('explain', 'false')).lower() in ('1', 'true', 'yes', 'on')
         
         input_values = []
         validation_errors = []
@@ -129,12 +214,21 @@ def perform_prediction():
             logger.warning(f"Request rejected due to {len(validation_errors)} validation failure(s).")
             return jsonify({'success': False, 'errors': validation_errors}), 400
 
+        if drift_monitor is not None:
+            drift_monitor.update(input_values)
+        
         # 2. Execute Prediction
         input_array = np.array(input_values).reshape(1, -1)
         scaled_input = scaler.transform(input_array)
         
-        predicted_index = int(model.predict(scaled_input)[0])
-        probabilities = model.predict_proba(scaled_input)[0]
+        if explain_requested:
+            # One tree traversal yields both the probabilities and their attribution.
+            all_probabilities, contributions = explainer.explain(scaled_input)
+            probabilities = all_probabilities[0]
+            predicted_index = int(model.classes_[np.argmax(probabilities)])
+        else:
+            predicted_index = int(model.predict(scaled_input)[0])
+            probabilities = model.predict_proba(scaled_input)[0]
         confidence_score = float(np.max(probabilities))
         
         result_label = CLASS_LABELS[predicted_index]
@@ -143,7 +237,7 @@ def perform_prediction():
         # 3. Success Response with Full Terminology
         logger.info(f"Prediction result: {result_label} (Confidence: {confidence_score:.2%})")
         
-        return jsonify({
+        response = {
             'success': True,
             'prediction_result': result_label,
             'confidence_score_percentage': round(confidence_score * 100, 2),
@@ -155,7 +249,25 @@ def perform_prediction():
                 SENSOR_LIMITS[k]['name']: {'value': v, 'unit': SENSOR_LIMITS[k]['unit']}
                 for k, v in zip(FEATURE_KEY_ORDER, input_values)
             }
-        })
+        }
+        
+        if explain_requested:
+            # Percentage points each sensor added to (or removed from) the predicted class probability
+            class_position = int(np.argmax(probabilities))
+            drivers = sorted(
+                zip(FEATURE_KEY_ORDER, contributions[0, :, class_position]),
+                key=lambda item: abs(item[1]), reverse=True
+            )
+            response['feature_attributions'] = {
+                'explained_class': result_label,
+                'baseline_percentage': round(float(explainer.bias[class_position]) * 100, 2),
+                'contributions_percentage_points': {
+                    SENSOR_LIMITS[k]['name']: round(float(c) * 100, 2) for k, c in drivers
+                },
+                'top_driver': SENSOR_LIMITS[drivers[0][0]]['name']
+            }
+        
+        return jsonify(response)
         
     except Exception as error:
         logger.error(f"Internal server error during prediction processing: {str(error)}")
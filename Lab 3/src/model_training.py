@@ -5,11 +5,14 @@ Includes detailed logging and hyperparameter tuning for pitch-perfect performanc
 """
 import pandas as pd
 import numpy as np
+import argparse
+import hashlib
 import json
 import joblib
 import os
 import time
 import logging
+import warnings
 from datetime import datetime
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
@@ -19,6 +22,8 @@ from sklearn.metrics import (
     accuracy_score, 
     confusion_matrix
 )
+from drift_monitor import build_reference_profile
+from pipeline_cache import file_sha256, stage_fingerprint, skip_if_current, record_stage_run
 
 # Configure logging for professional output
 logging.basicConfig(
@@ -37,6 +42,26 @@ FEATURE_COLUMNS = [
     'tool_wear'       # Millimeters
 ]
 
+# High-Accuracy Hyperparameters
+HYPERPARAMETERS = {
+    'n_estimators': 200,
+    'max_depth': 15,
+    'min_samples_split': 2,
+    'min_samples_leaf': 1,
+    'random_state': 42,
+    'n_jobs': -1,
+    'class_weight': 'balanced_subsample'  # Improved handling for synthetic data
+}
+SPLIT_SEED = 42
+
+
+def scaler_fingerprint(scaler):
+    """Hash of the fitted scaling parameters; any refit of the scaler changes it."""
+    digest = hashlib.sha256()
+    for array in (scaler.mean_, scaler.scale_):
+        digest.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
 def train_optimized_model(dataframe):
     """
     Train a highly accurate RandomForest model with tuned hyperparameters.
@@ -49,7 +74,7 @@ def train_optimized_model(dataframe):
     # Stratified split for balanced class representation
     logger.info("Splitting dataset (80% Train / 20% Test) with stratification...")
     X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
+        X, y, test_size=0.2, random_state=SPLIT_SEED, stratify=y
     )
     
     # Feature Scaling
@@ -60,15 +85,7 @@ def train_optimized_model(dataframe):
     
     # High-Accuracy Hyperparameters
     logger.info("Configuring High-Accuracy RandomForest (200 Estimators, Depth 15)...")
-    model = RandomForestClassifier(
-        n_estimators=200,
-        max_depth=15,
-        min_samples_split=2,
-        min_samples_leaf=1,
-        random_state=42,
-        n_jobs=-1,
-        class_weight='balanced_subsample' # Improved handling for synthetic data
-    )
+    model = RandomForestClassifier(**HYPERPARAMETERS)
     
     logger.info("Starting model fitting (this may take a few moments)...")
     start_time = time.time()
@@ -102,40 +119,246 @@ def train_optimized_model(dataframe):
         'feature_importance_ranking': importances,
         'classification_report_full': report,
         'confusion_matrix': conf_matrix.tolist(),
+        'feature_schema': FEATURE_COLUMNS,
+        'scaler_fingerprint': scaler_fingerprint(scaler),
+        'training_time_seconds': duration,
         'training_timestamp': datetime.now().isoformat()
     }
     
-    return model, scaler, metrics
+    # Reference distribution of the raw training features for live drift monitoring
+    logger.info("Building sensor reference profile for drift monitoring...")
+    reference_profile = build_reference_profile(X_train, FEATURE_COLUMNS)
+    
+    return model, scaler, metrics, reference_profile
+
+
+def train_incremental_model(new_dataframe, model, scaler, previous_metrics,
+                            new_trees=50, max_trees=None, reference_dataframe=None):
+    """
+    Grow additional trees on newly arrived data instead of retraining from scratch.
+    
+    The previous scaler is reused unchanged; the update is refused if the scaler or
+    the feature schema no longer match what the model was trained with. A stratified
+    random 20% of ``new_dataframe`` is held out to compare the forest before and after
+    the update and, when ``reference_dataframe`` (the original training data) is given,
+    against a full retrain on old + new data.
+    """
+    logger.info("Initializing incremental (warm-start) training pipeline...")
+    
+    # Schema and scaler guards
+    missing = [c for c in FEATURE_COLUMNS if c not in new_dataframe.columns]
+    if missing:
+        raise ValueError(f"New data is missing sensor columns: {missing}")
+    if previous_metrics.get('feature_schema') != FEATURE_COLUMNS:
+        raise ValueError(
+            f"Feature schema changed since the model was trained "
+            f"({previous_metrics.get('feature_schema')} vs {FEATURE_COLUMNS}). Run a full retrain."
+        )
+    if previous_metrics.get('scaler_fingerprint') != scaler_fingerprint(scaler):
+        raise ValueError("Scaler on disk does not match the one the model was trained with. Run a full retrain.")
+    
+    X = new_dataframe[FEATURE_COLUMNS].values
+    y = new_dataframe['quality_label'].values
+    if set(np.unique(y)) != set(model.classes_.tolist()):
+        raise ValueError(f"New data must contain every class {model.classes_.tolist()} to grow consistent trees.")
+    
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=SPLIT_SEED, stratify=y
+    )
+    X_train_scaled = scaler.transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+    
+    trees_before = len(model.estimators_)
+    accuracy_before = accuracy_score(y_test, model.predict(X_test_scaled))
+    
+    # Warm start skips len(estimators_) seeds of random_state, so once trees have been
+    # retired the next update would replay seeds of trees still in the forest. Each
+    # update instead draws from its own stream, keyed by the count of trees ever grown.
+    previous_updates = previous_metrics.get('incremental_updates', [])
+    trees_grown = previous_metrics.get(
+        'trees_grown', trees_before + sum(u.get('trees_retired', 0) for u in previous_updates)
+    )
+    base_seed = model.random_state
+    update_seed = int(np.random.SeedSequence([HYPERPARAMETERS['random_state'], trees_grown]).generate_state(1)[0] >> 1)
+    
+    logger.info(f"Growing {new_trees} additional trees on {len(X_train)} new samples (forest has {trees_before})...")
+    model.set_params(warm_start=True, n_estimators=trees_before + new_trees, random_state=update_seed)
+    start_time = time.time()
+    try:
+        with warnings.catch_warnings():
+            # balanced_subsample weights each new tree on its own bootstrap, which is what we want here.
+            warnings.filterwarnings('ignore', message='class_weight presets')
+            model.fit(X_train_scaled, y_train)
+    finally:
+        model.set_params(random_state=base_seed)
+    duration = time.time() - start_time
+    
+    retired = 0
+    if max_trees and len(model.estimators_) > max_trees:
+        # Estimators are appended in training order, so the oldest trees come first.
+        retired = len(model.estimators_) - max_trees
+        model.estimators_ = model.estimators_[retired:]
+        model.n_estimators = max_trees
+        logger.info(f"Retired the {retired} oldest trees to cap the forest at {max_trees}.")
+    model.set_params(warm_start=False)
+    
+    accuracy_after = accuracy_score(y_test, model.predict(X_test_scaled))
+    logger.info(f"Incremental update completed in {duration:.2f} seconds. Holdout accuracy {accuracy_before:.2%} -> {accuracy_after:.2%}")
+    
+    update = {
+        'new_samples': int(len(X_train)),
+        'holdout_samples': int(len(X_test)),
+        'trees_added': new_trees,
+        'trees_retired': retired,
+        'random_state': update_seed,
+        'forest_size': len(model.estimators_),
+        'training_time_seconds': duration,
+        'holdout_accuracy_before': float(accuracy_before),
+        'holdout_accuracy_after': float(accuracy_after),
+        'timestamp': datetime.now().isoformat()
+    }
+    
+    if reference_dataframe is not None:
+        logger.info("Running full retrain on previous + new data for comparison...")
+        combined = np.vstack([reference_dataframe[FEATURE_COLUMNS].values, X_train])
+        combined_y = np.concatenate([reference_dataframe['quality_label'].values, y_train])
+        full_scaler = StandardScaler()
+        full_model = RandomForestClassifier(**HYPERPARAMETERS)
+        start_time = time.time()
+        full_model.fit(full_scaler.fit_transform(combined), combined_y)
+        full_duration = time.time() - start_time
+        full_accuracy = accuracy_score(y_test, full_model.predict(full_scaler.transform(X_test)))
+        update['full_retrain'] = {
+            'training_samples': int(len(combined)),
+            'training_time_seconds': full_duration,
+            'holdout_accuracy': float(full_accuracy),
+            'speedup': full_duration / max(duration, 1e-9),
+            'accuracy_gap': float(full_accuracy - accuracy_after)
+        }
+        logger.info(f"Full retrain: {full_duration:.2f}s, holdout accuracy {full_accuracy:.2%}")
+    
+    metrics = dict(previous_metrics)
+    metrics['hyperparameters'] = dict(metrics.get('hyperparameters', {}), n_estimators=len(model.estimators_))
+    metrics['feature_importance_ranking'] = dict(zip(FEATURE_COLUMNS, model.feature_importances_.tolist()))
+    metrics['incremental_updates'] = previous_updates + [update]
+    metrics['trees_grown'] = trees_grown + new_trees
+    metrics['training_timestamp'] = datetime.now().isoformat()
+    return model, metrics, update
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Train (or incrementally update) the CNC quality classifier.')
+    parser.add_argument('--incremental', action='store_true', help='Grow the existing forest instead of retraining')
+    parser.add_argument('--new-data', default='/exchange/new_manufacturing_data.csv', help='Newly arrived labelled data')
+    parser.add_argument('--new-trees', type=int, default=50, help='Trees to add in incremental mode')
+    parser.add_argument('--max-trees', type=int, default=None, help='Retire the oldest trees beyond this forest size')
+    parser.add_argument('--compare-full', action='store_true', help='Also run a full retrain and report the trade-off')
+    return parser.parse_args(argv)
 
 
 if __name__ == '__main__':
+    args = parse_args()
+    
     print("\n" + "="*80)
     print("  MODEL FACTORY: HIGH-ACCURACY TRAINING PIPELINE")
     print("="*80)
     
     data_source = '/exchange/manufacturing_data.csv'
+    output_path = '/exchange'
+    artifact_files = [
+        os.path.join(output_path, name)
+        for name in ('quality_model.joblib', 'scaler.joblib', 'training_metrics.json', 'drift_reference.json')
+    ]
+    
+    training_params = {'hyperparameters': HYPERPARAMETERS, 'split_seed': SPLIT_SEED, 'features': FEATURE_COLUMNS}
+    
+    if args.incremental:
+        if not os.path.exists(args.new_data):
+            logger.error(f"New data not found at {args.new_data}. Aborting.")
+            exit(1)
+        # Keeps the full-training inputs in the fingerprint, so a change to the base
+        # data or hyperparameters still makes the compose check retrain from scratch.
+        fingerprint, stage_inputs = stage_fingerprint(
+            code_files=['model_training.py', 'drift_monitor.py'],
+            params=dict(training_params, incremental={
+                'new_trees': args.new_trees, 'max_trees': args.max_trees,
+                'base_model_sha256': file_sha256(artifact_files[0])
+            }),
+            upstream_files=[data_source, args.new_data]
+        )
+        stage_start = time.time()
+        logger.info(f"Loading previous artifacts and new data from {args.new_data}...")
+        previous_model = joblib.load(artifact_files[0])
+        previous_scaler = joblib.load(artifact_files[1])
+        with open(artifact_files[2], 'r') as f:
+            previous_metrics = json.load(f)
+        reference_df = pd.read_csv(data_source) if args.compare_full and os.path.exists(data_source) else None
+        
+        try:
+            final_model, final_metrics, update = train_incremental_model(
+                pd.read_csv(args.new_data), previous_model, previous_scaler, previous_metrics,
+                new_trees=args.new_trees, max_trees=args.max_trees, reference_dataframe=reference_df
+            )
+        except ValueError as e:
+            logger.error(f"Incremental update refused: {e}")
+            exit(1)
+        
+        # The scaler and drift reference stay unchanged by design.
+        joblib.dump(final_model, artifact_files[0])
+        with open(artifact_files[2], 'w') as f:
+            json.dump(final_metrics, f, indent=4)
+        logger.info(f"Updated model saved to {artifact_files[0]}")
+        # Recorded under the training stage so a compose restart keeps the updated forest.
+        record_stage_run('model-training', fingerprint, stage_inputs, artifact_files, time.time() - stage_start)
+        
+        print("\n[INCREMENTAL UPDATE SUMMARY]")
+        print(f"  Forest Size: {update['forest_size']} (+{update['trees_added']}, -{update['trees_retired']})")
+        print(f"  Training Time: {update['training_time_seconds']:.2f}s")
+        print(f"  Holdout Accuracy: {update['holdout_accuracy_before']:.4f} -> {update['holdout_accuracy_after']:.4f}")
+        if 'full_retrain' in update:
+            full = update['full_retrain']
+            print(f"  Full Retrain: {full['training_time_seconds']:.2f}s, accuracy {full['holdout_accuracy']:.4f} "
+                  f"({full['speedup']:.1f}x slower, accuracy gap {full['accuracy_gap']:+.4f})")
+        print("\n" + "="*80)
+        print("  INCREMENTAL UPDATE COMPLETE: READY FOR DEPLOYMENT")
+        print("="*80 + "\n")
+        exit(0)
+    
     if not os.path.exists(data_source):
         logger.error(f"Data source not found at {data_source}. Aborting.")
         exit(1)
         
+    fingerprint, stage_inputs = stage_fingerprint(
+        code_files=['model_training.py', 'drift_monitor.py'],
+        params=training_params,
+        upstream_files=[data_source]
+    )
+    if skip_if_current('model-training', fingerprint):
+        print("  Model artifacts are up to date with the current data and code. Nothing to do.\n")
+        exit(0)
+    
+    stage_start = time.time()
     logger.info(f"Loading manufacturing dataset from {data_source}...")
     df = pd.read_csv(data_source)
     
     # Execute Training
-    final_model, final_scaler, final_metrics = train_optimized_model(df)
+    final_model, final_scaler, final_metrics, final_reference = train_optimized_model(df)
     
     # Save Artifacts
-    output_path = '/exchange'
     os.makedirs(output_path, exist_ok=True)
     
     logger.info("Saving model and scaler artifacts...")
-    joblib.dump(final_model, os.path.join(output_path, 'quality_model.joblib'))
-    joblib.dump(final_scaler, os.path.join(output_path, 'scaler.joblib'))
+    joblib.dump(final_model, artifact_files[0])
+    joblib.dump(final_scaler, artifact_files[1])
     
-    with open(os.path.join(output_path, 'training_metrics.json'), 'w') as f:
+    with open(artifact_files[2], 'w') as f:
         json.dump(final_metrics, f, indent=4)
     
+    with open(artifact_files[3], 'w') as f:
+        json.dump(final_reference, f, indent=4)
+    
     logger.info(f"All artifacts saved to {output_path}")
+    record_stage_run('model-training', fingerprint, stage_inputs, artifact_files, time.time() - stage_start)
     
     print("\n[PERFORMANCE SUMMARY]")
     print(f"  Accuracy Score: {final_metrics['accuracy']:.4f}")
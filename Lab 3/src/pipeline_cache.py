@@ -0,0 +1,167 @@
+"""
+Manufacturing Quality Prediction - Pipeline Stage Fingerprinting
+Lets each compose stage skip itself when nothing it depends on has changed.
+
+Every stage fingerprints its inputs (source files, parameters, seed and the
+hashes of upstream artifacts) and, after a successful run, records that
+fingerprint together with the hashes of its outputs and its duration in
+``/exchange/pipeline_manifest.json``. On the next start a stage whose
+fingerprint matches and whose outputs are still intact exits immediately, and
+the manifest accumulates how much time those cache hits saved.
+
+Only the standard library is used so the check can run before any
+``pip install`` in the compose commands:
+
+    python src/pipeline_cache.py check model-training || <run the stage>
+
+Set PIPELINE_FORCE_RERUN=true to ignore the cache.
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+EXCHANGE_DIR = os.environ.get('EXCHANGE_DIR', '/exchange')
+MANIFEST_PATH = os.path.join(EXCHANGE_DIR, 'pipeline_manifest.json')
+FORCE_RERUN = os.environ.get('PIPELINE_FORCE_RERUN', 'false').lower() == 'true'
+
+
+def file_sha256(path, block_size=1 << 20):
+    """Stream a file through SHA-256 without loading it into memory."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def stage_fingerprint(code_files, params, upstream_files):
+    """
+    Fingerprint a stage's inputs.
+
+    Args:
+        code_files: Source file names (relative to ``src/``) the stage executes.
+        params: JSON-serialisable parameters, including the random seed.
+        upstream_files: Paths of artifacts produced by earlier stages.
+
+    Returns:
+        (fingerprint, inputs) where ``inputs`` is the descriptor stored in the manifest.
+    """
+    inputs = {
+        'code': {name: file_sha256(os.path.join(SOURCE_DIR, name)) for name in code_files},
+        'params': params,
+        'upstream': {path: file_sha256(path) if os.path.exists(path) else None for path in upstream_files}
+    }
+    canonical = json.dumps(inputs, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(canonical).hexdigest(), inputs
+
+
+def load_manifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return {'stages': {}}
+    try:
+        with open(MANIFEST_PATH, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        logger.warning(f"Manifest at {MANIFEST_PATH} is unreadable. Treating every stage as stale.")
+        return {'stages': {}}
+
+
+def _save_manifest(manifest):
+    os.makedirs(EXCHANGE_DIR, exist_ok=True)
+    tmp_path = MANIFEST_PATH + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def _outputs_intact(entry):
+    for path, expected in entry.get('outputs', {}).items():
+        if not os.path.exists(path) or file_sha256(path) != expected:
+            return False
+    return bool(entry.get('outputs'))
+
+
+def skip_if_current(stage, fingerprint):
+    """
+    Return True (and record a cache hit) when ``stage`` already produced outputs
+    for exactly this fingerprint and those outputs are untouched.
+    """
+    if FORCE_RERUN:
+        logger.info(f"{stage}: PIPELINE_FORCE_RERUN is set. Ignoring cache.")
+        return False
+
+    start_time = time.time()
+    manifest = load_manifest()
+    entry = manifest['stages'].get(stage)
+    if not entry or entry.get('fingerprint') != fingerprint:
+        logger.info(f"{stage}: inputs changed since last run (or first run). Executing stage.")
+        return False
+    if not _outputs_intact(entry):
+        logger.info(f"{stage}: outputs missing or modified. Executing stage.")
+        return False
+
+    check_seconds = time.time() - start_time
+    entry['cache_hits'] = entry.get('cache_hits', 0) + 1
+    entry['time_saved_seconds'] = round(entry.get('time_saved_seconds', 0.0) + entry['duration_seconds'] - check_seconds, 3)
+    entry['last_checked_at'] = datetime.now().isoformat()
+    entry['last_status'] = 'skipped'
+    _save_manifest(manifest)
+    logger.info(
+        f"{stage}: fingerprint {fingerprint[:12]} unchanged, outputs intact. "
+        f"Skipping (saved ~{entry['duration_seconds']:.1f}s, {entry['time_saved_seconds']:.1f}s in total)."
+    )
+    return True
+
+
+def record_stage_run(stage, fingerprint, inputs, output_files, duration_seconds):
+    """Store the fingerprint, output hashes and duration of a completed stage."""
+    manifest = load_manifest()
+    previous = manifest['stages'].get(stage, {})
+    manifest['stages'][stage] = {
+        'fingerprint': fingerprint,
+        'inputs': inputs,
+        'outputs': {path: file_sha256(path) for path in output_files},
+        'duration_seconds': round(duration_seconds, 3),
+        'completed_at': datetime.now().isoformat(),
+        'last_status': 'executed',
+        'cache_hits': previous.get('cache_hits', 0),
+        'time_saved_seconds': previous.get('time_saved_seconds', 0.0)
+    }
+    _save_manifest(manifest)
+    logger.info(f"{stage}: recorded fingerprint {fingerprint[:12]} ({duration_seconds:.2f}s) in {MANIFEST_PATH}")
+
+
+def check_recorded_stage(stage):
+    """
+    Dependency-free freshness check used by the compose commands. Recomputes the
+    fingerprint from the recorded parameters and the current code/upstream hashes.
+    """
+    entry = load_manifest()['stages'].get(stage)
+    if not entry:
+        logger.info(f"{stage}: no previous run recorded.")
+        return False
+    recorded = entry['inputs']
+    try:
+        fingerprint, _ = stage_fingerprint(list(recorded['code']), recorded['params'], list(recorded['upstream']))
+    except OSError as e:
+        logger.info(f"{stage}: recorded source no longer available ({e}).")
+        return False
+    return skip_if_current(stage, fingerprint)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - [PIPELINE_CACHE] - %(levelname)s - %(message)s'
+    )
+    if len(sys.argv) != 3 or sys.argv[1] != 'check':
+        print("Usage: python src/pipeline_cache.py check <stage>")
+        sys.exit(2)
+    sys.exit(0 if check_recorded_stage(sys.argv[2]) else 1)
@@ -0,0 +1,89 @@
+"""
+Manufacturing Quality Prediction - Low-Overhead Sampling Profiler
+Samples the Python stacks of every thread in the live serving process and
+returns them in collapsed-stack format ("root;caller;leaf count"), which
+flamegraph.pl, speedscope and inferno read directly.
+
+Nothing is instrumented: a background thread wakes up every ``interval``
+seconds, reads ``sys._current_frames()`` and counts the stacks it sees. The
+sampler measures its own cost and stretches the sleep between samples so it
+never uses more than ``max_overhead`` of one core, and the number of distinct
+stacks kept is capped so memory stays bounded on long runs.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+DEFAULT_INTERVAL = 0.01
+MIN_INTERVAL = 0.001
+DEFAULT_MAX_OVERHEAD = 0.02
+MAX_STACK_DEPTH = 128
+MAX_DISTINCT_STACKS = 20000
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Periodic stack sampler for the current process."""
+
+    def __init__(self, interval=DEFAULT_INTERVAL, max_overhead=DEFAULT_MAX_OVERHEAD):
+        self.interval = max(float(interval), MIN_INTERVAL)
+        self.max_overhead = max_overhead
+
+    def _collapse(self, frame, thread_name):
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            stack.append(_frame_label(frame))
+            frame = frame.f_back
+        stack.append(f"thread:{thread_name}")
+        return ';'.join(reversed(stack))
+
+    def profile(self, duration, exclude_thread_ids=()):
+        """
+        Sample all threads for ``duration`` seconds.
+
+        Returns:
+            (collapsed_text, stats) where ``stats`` reports samples taken,
+            time spent sampling and the resulting overhead fraction.
+        """
+        counts = Counter()
+        stats = {'samples': 0, 'dropped_stacks': 0, 'sampling_seconds': 0.0}
+        stop = threading.Event()
+
+        def sampler():
+            own_id = threading.get_ident()
+            skipped = set(exclude_thread_ids) | {own_id}
+            while not stop.is_set():
+                started = time.perf_counter()
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id in skipped:
+                        continue
+                    stack = self._collapse(frame, names.get(thread_id, thread_id))
+                    if stack in counts or len(counts) < MAX_DISTINCT_STACKS:
+                        counts[stack] += 1
+                    else:
+                        stats['dropped_stacks'] += 1
+                cost = time.perf_counter() - started
+                stats['samples'] += 1
+                stats['sampling_seconds'] += cost
+                # Sleep long enough that cost / (cost + sleep) stays under the overhead budget.
+                stop.wait(max(self.interval, cost / self.max_overhead - cost))
+
+        worker = threading.Thread(target=sampler, name='sampling-profiler', daemon=True)
+        wall_start = time.perf_counter()
+        worker.start()
+        stop.wait(duration)
+        stop.set()
+        worker.join()
+        wall = time.perf_counter() - wall_start
+
+        stats['wall_seconds'] = wall
+        stats['overhead_fraction'] = stats['sampling_seconds'] / wall if wall else 0.0
+        collapsed = '\n'.join(f"{stack} {count}" for stack, count in counts.most_common())
+        return collapsed + '\n', stats
@@ -0,0 +1,86 @@
+"""
+Benchmark: compiled feature registry versus the hand-coded pandas features.
+
+The baseline is the per-feature pandas code feature_engineering used before the
+registry: every operation allocates a full-length temporary. The compiled plan
+evaluates all features chunk by chunk into preallocated columns. Reports batch
+time and peak extra memory (tracemalloc), single-request latency, and whether
+both give bit-identical values.
+
+Usage (from the Lab 4 directory):
+    python benchmarks/feature_registry.py [--rows 5000000] [--requests 2000]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.feature_registry import compile_features
+from src.utils import FEATURE_DEFINITIONS, SENSOR_FEATURES, ENGINEERED_FEATURES
+
+
+def hand_coded_features(df):
+    out = pd.DataFrame(index=df.index)
+    out["speed_feed_ratio"] = df["spindle_speed"] / (df["feed_rate"] + 1e-6)
+    out["vibration_temp_interaction"] = df["vibration"] * df["temperature"] / 1000
+    out["tool_wear_severity"] = (df["tool_wear"] ** 2) * df["vibration"]
+    out["cutting_energy_proxy"] = (df["spindle_speed"] * df["feed_rate"] * df["depth_of_cut"]) / 1e6
+    out["thermal_stress_index"] = (((df["temperature"] - 200) / 100) * df["depth_of_cut"]).clip(0)
+    return out
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the compiled feature plan with hand-coded pandas.")
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "spindle_speed": np.clip(rng.normal(2000, 500, args.rows), 800, 3200),
+        "feed_rate": np.clip(rng.normal(200, 80, args.rows), 50, 400),
+        "depth_of_cut": rng.uniform(0.5, 4.0, args.rows),
+        "vibration": np.clip(rng.exponential(2.5, args.rows), 0.5, 8.0),
+        "temperature": np.clip(rng.normal(240, 45, args.rows), 150, 350),
+        "tool_wear": rng.beta(2, 5, args.rows) * 0.8
+    })
+    plan = compile_features(FEATURE_DEFINITIONS, SENSOR_FEATURES)
+
+    baseline, baseline_time, baseline_peak = measure(hand_coded_features, df)
+    compiled, compiled_time, compiled_peak = measure(plan.evaluate_frame, df)
+    identical = all(np.array_equal(baseline[f].to_numpy(), compiled[f].to_numpy()) for f in ENGINEERED_FEATURES)
+    output_mb = args.rows * len(ENGINEERED_FEATURES) * 8 / 1024**2
+
+    records = df.head(args.requests).to_dict("records")
+    start = time.perf_counter()
+    for record in records:
+        hand_coded_features(pd.DataFrame([record]))
+    baseline_request = (time.perf_counter() - start) / len(records)
+    start = time.perf_counter()
+    for record in records:
+        plan.evaluate_one(record)
+    compiled_request = (time.perf_counter() - start) / len(records)
+
+    print(f"\n[FEATURE REGISTRY] {args.rows:,} rows, {len(ENGINEERED_FEATURES)} features "
+          f"({len(plan.ops)} ops in the compiled plan, output {output_mb:.0f} MB)")
+    print(f"  Batch      hand-coded: {baseline_time:7.3f}s  peak {baseline_peak / 1024**2:8.1f} MB")
+    print(f"  Batch      compiled  : {compiled_time:7.3f}s  peak {compiled_peak / 1024**2:8.1f} MB")
+    print(f"  Request    hand-coded: {baseline_request * 1e6:7.1f} us")
+    print(f"  Request    compiled  : {compiled_request * 1e6:7.1f} us")
+    print(f"  Bit-identical output : {identical}\n")
@@ -0,0 +1,56 @@
+"""
+Benchmark: sharded data generation speedup versus worker count.
+
+Generates the same dataset with 1, 2, 4 and 8 workers (capped at the machine's
+cores unless --workers is given), reports wall time and speedup, and checks the
+output files are byte-identical.
+
+Usage (from the Lab 4 directory):
+    python benchmarks/generation_scaling.py [--rows 10000000] [--workers 1 2 4 8]
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = tempfile.mkdtemp(prefix="lab4_generation_")
+os.environ["DATA_DIR"] = BENCH_DIR
+os.environ.setdefault("PIPELINE_TRACING", "false")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src import data_generator
+from src.utils import RAW_DATA_PATH
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure Lab 4 generation scaling.")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--workers", type=int, nargs="+")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    workers = args.workers or [w for w in (1, 2, 4, 8) if w <= cores]
+
+    timings = {}
+    digests = set()
+    for w in workers:
+        start = time.perf_counter()
+        data_generator.run(num_samples=args.rows, num_workers=w)
+        timings[w] = time.perf_counter() - start
+        digests.add(file_sha256(RAW_DATA_PATH))
+
+    print(f"\n[GENERATION SCALING] {args.rows:,} rows, {cores} cores available")
+    for w, seconds in timings.items():
+        print(f"  {w} worker(s): {seconds:8.2f}s  speedup {timings[workers[0]] / seconds:5.2f}x  "
+              f"({args.rows / seconds:,.0f} rows/s)")
+    print(f"  Identical output across worker counts: {len(digests) == 1}\n")
@@ -0,0 +1,100 @@
+"""
+Benchmark: MLflow tracking round trips per training run, batched versus direct.
+
+Starts --tasks processes at once (the parallel trainers), each logging a
+trainer-shaped run (4 tags, --params params, --metrics metrics, --artifacts
+small files) through src/run_logger.py, first with every call sent directly
+and then with tags/params/metrics batched and artifacts uploaded in the
+background. All processes create the same new experiment concurrently, so the
+run also checks that experiment creation is idempotent. Then it checks that
+both modes stored the same tags, params, metrics and artifacts.
+
+Runs against a temporary local file store unless --tracking-uri is given
+(e.g. http://localhost:5001 for the docker-compose MLflow server).
+
+Usage (from the Lab 4 directory):
+    python benchmarks/mlflow_logging.py [--tasks 4] [--tracking-uri URI]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.run_logger import BatchedRunLogger
+
+
+def log_run(tracking_uri, experiment_name, task, batched, args, results):
+    from mlflow.tracking import MlflowClient
+    artifact_dir = tempfile.mkdtemp(prefix="lab4_mlflow_artifacts_")
+    start = time.perf_counter()
+    with BatchedRunLogger(tracking_uri, experiment_name, f"task{task}_run", batched=batched) as run:
+        run.set_tags({"model_type": f"task{task}", "pipeline_stage": "training",
+                      "author": "Ajith Srikanth", "domain": "Manufacturing"})
+        run.log_params({f"param_{i}": i for i in range(args.params)})
+        run.log_metrics({f"metric_{i}": i / 10 for i in range(args.metrics)})
+        for i in range(args.artifacts):
+            path = os.path.join(artifact_dir, f"artifact_{i}.txt")
+            with open(path, "w") as f:
+                f.write("x" * 10000)
+            run.log_artifact(path)
+    stats = run.stats()
+    experiment_id = MlflowClient(tracking_uri).get_run(run.run_id).info.experiment_id
+    results[(task, batched)] = (time.perf_counter() - start, stats, run.run_id, experiment_id)
+
+
+def fan_out(tracking_uri, experiment_name, batched, args, results):
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=log_run, args=(tracking_uri, experiment_name, task, batched, args, results))
+                 for task in range(args.tasks)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return time.perf_counter() - start
+
+
+def stored_run(client, run_id):
+    run = client.get_run(run_id)
+    tags = {key: value for key, value in run.data.tags.items() if not key.startswith("mlflow.")}
+    artifacts = sorted(info.path for info in client.list_artifacts(run_id))
+    return tags, run.data.params, run.data.metrics, artifacts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare batched and direct MLflow logging.")
+    parser.add_argument("--tasks", type=int, default=4)
+    parser.add_argument("--params", type=int, default=13)
+    parser.add_argument("--metrics", type=int, default=9)
+    parser.add_argument("--artifacts", type=int, default=3)
+    parser.add_argument("--tracking-uri", default=None)
+    args = parser.parse_args()
+
+    from mlflow.tracking import MlflowClient
+    tracking_uri = args.tracking_uri or "file://" + tempfile.mkdtemp(prefix="lab4_mlruns_")
+    client = MlflowClient(tracking_uri)
+    results = multiprocessing.Manager().dict()
+
+    print(f"\n[MLFLOW LOGGING] {args.tasks} concurrent runs against {tracking_uri}")
+    for batched in (False, True):
+        experiment_name = f"bench-{uuid.uuid4().hex[:8]}"
+        wall = fan_out(tracking_uri, experiment_name, batched, args, results)
+        runs = [results[(task, batched)] for task in range(args.tasks) if (task, batched) in results]
+        experiment_ids = {experiment_id for _, _, _, experiment_id in runs}
+        round_trips = [stats["round_trips"] for _, stats, _, _ in runs]
+        print(f"  {'Batched' if batched else 'Direct '}: {len(runs)}/{args.tasks} runs in {wall:.2f}s, "
+              f"round trips per run {min(round_trips)}-{max(round_trips)}, "
+              f"tracking time per run {max(stats['tracking_seconds'] for _, stats, _, _ in runs):.3f}s, "
+              f"experiments created {len(experiment_ids)}")
+        print(f"    requests: {runs[0][1]['calls']}")
+
+    identical = all(
+        stored_run(client, results[(task, False)][2]) == stored_run(client, results[(task, True)][2])
+        for task in range(args.tasks) if (task, False) in results and (task, True) in results
+    )
+    print(f"  Same tags, params, metrics and artifacts in both modes: {identical}\n")
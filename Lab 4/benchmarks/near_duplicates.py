@@ -0,0 +1,67 @@
+"""
+Benchmark: tolerance-based near-duplicate detection at scale.
+
+Draws sensor readings with the generator's distributions, appends jittered
+copies of a fraction of them (replayed packets / last-decimal noise), then times
+the grid-bucketed search and checks every injected copy was clustered with its
+original. On a small slice the result is also compared with an O(n^2) scan.
+
+Usage (from the Lab 4 directory):
+    python benchmarks/near_duplicates.py [--rows 1000000] [--replay-fraction 0.01]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.near_duplicates import near_duplicate_clusters, near_duplicate_pairs
+from src.utils import NEAR_DUPLICATE_TOLERANCES, SENSOR_FEATURES
+
+
+def sensor_readings(rng, n):
+    return np.column_stack([
+        np.clip(rng.normal(2000, 500, n), 800, 3200),
+        np.clip(rng.normal(200, 80, n), 50, 400),
+        rng.uniform(0.5, 4.0, n),
+        np.clip(rng.exponential(2.5, n), 0.5, 8.0),
+        np.clip(rng.normal(240, 45, n), 150, 350),
+        rng.beta(2, 5, n) * 0.8
+    ])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure near-duplicate detection cost.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--replay-fraction", type=float, default=0.01)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    tolerances = np.array([NEAR_DUPLICATE_TOLERANCES[f] for f in SENSOR_FEATURES])
+    base = sensor_readings(rng, args.rows)
+    sources = rng.choice(args.rows, int(args.rows * args.replay_fraction), replace=False)
+    replays = base[sources] + rng.uniform(-0.4, 0.4, (len(sources), len(tolerances))) * tolerances
+    sensors = np.vstack([base, replays])
+
+    start = time.perf_counter()
+    cluster_ids, representative, n_pairs = near_duplicate_clusters(sensors, tolerances)
+    elapsed = time.perf_counter() - start
+
+    replay_ids = cluster_ids[args.rows:]
+    recovered = np.mean((replay_ids >= 0) & (replay_ids == cluster_ids[sources]))
+
+    check = 3000
+    first, second = near_duplicate_pairs(sensors[:check], tolerances)
+    close = np.all(np.abs(sensors[:check, None, :] - sensors[None, :check, :]) <= tolerances, axis=2)
+    brute = {(int(i), int(j)) for i, j in zip(*np.nonzero(np.triu(close, 1)))}
+    exact = brute == set(zip(first.tolist(), second.tolist()))
+
+    print(f"\n[NEAR-DUPLICATES] {len(sensors):,} readings ({len(sources):,} replayed)")
+    print(f"  Detection time        : {elapsed:8.2f}s ({len(sensors) / elapsed:,.0f} rows/s)")
+    print(f"  Pairs / clusters      : {n_pairs:,} / {int(cluster_ids.max()) + 1:,}")
+    print(f"  Rows kept in drop mode: {int(representative.sum()):,}")
+    print(f"  Replays recovered     : {recovered:.2%}")
+    print(f"  Matches O(n^2) scan on {check} rows: {exact}\n")
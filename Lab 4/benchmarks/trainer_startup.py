@@ -0,0 +1,144 @@
+"""
+Benchmark: import time and training-task wall time before and after moving plots and
+heavy imports off the training tasks.
+
+model_trainer used to import matplotlib, seaborn and the MLflow model flavors at
+module load and render both plots inside each training task. Each measurement runs
+in a fresh interpreter, in this tree and, with --before REF, in the Lab 4 directory
+exported from that git revision (e.g. the commit before the change):
+  * importing the src modules the DAG file imports, which every Airflow task pays
+    when it parses the DAG,
+  * importing src.model_trainer on its own,
+  * with --model, one training task end to end (DAG imports included) against a
+    temporary MLflow file store, and in this tree the render_reports task that now
+    draws that model's plots.
+The import time of each library the trainer defers is reported as well. Libraries
+that are not installed are reported and skipped.
+
+Usage (from the Lab 4 directory):
+    python benchmarks/trainer_startup.py [--before REF] [--model NeuralNet] [--rows 50000] [--repeats 3]
+"""
+import argparse
+import importlib.util
+import io
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+LAB_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+DEFERRED_IMPORTS = ["matplotlib.pyplot", "seaborn", "mlflow", "mlflow.sklearn", "mlflow.xgboost", "mlflow.lightgbm"]
+
+PREPARE_SCRIPT = """
+import sys
+from src import data_generator, data_validator, feature_engineering, training_data
+data_generator.run(num_samples=int(sys.argv[1]))
+data_validator.run()
+feature_engineering.run()
+training_data.run()
+"""
+
+TASK_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+from src import {modules}
+{call}
+print(time.perf_counter() - start)
+"""
+
+
+def timed_python(code, *args, cwd=LAB_DIR, env=None):
+    """Seconds reported by ``code`` in a fresh interpreter, or None if it fails."""
+    result = subprocess.run([sys.executable, "-c", code, *args], cwd=cwd, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def import_seconds(modules, repeats, env, cwd=LAB_DIR):
+    code = f"import time; start = time.perf_counter(); import {modules}; print(time.perf_counter() - start)"
+    times = [timed_python(code, cwd=cwd, env=env) for _ in range(repeats)]
+    return None if None in times else min(times)
+
+
+def dag_modules(lab_dir):
+    """The src modules the tree's DAG file imports."""
+    with open(os.path.join(lab_dir, "dags", "manufacturing_dag.py")) as f:
+        names = re.search(r"from src import \(([^)]*)\)", f.read()).group(1)
+    return [name.strip() for name in names.split(",") if name.strip()]
+
+
+def export_tree(ref):
+    """Extracts the Lab 4 directory of git revision ``ref`` into a temporary directory."""
+    archive = subprocess.run(["git", "archive", ref, "."], cwd=LAB_DIR, capture_output=True, check=True).stdout
+    target = tempfile.mkdtemp(prefix="lab4_before_")
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(target)
+    return target
+
+
+def fmt(seconds):
+    return f"{seconds:7.3f}s" if seconds is not None else "  failed"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure trainer imports and training-task wall time before and after.")
+    parser.add_argument("--before", default=None, help="git revision to compare against, e.g. the commit before the change")
+    parser.add_argument("--model", default=None, help="also time one training task of this model end to end")
+    parser.add_argument("--rows", type=int, default=50_000, help="generated rows behind the timed training task")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    trees = {"after": LAB_DIR}
+    if args.before:
+        trees = {"before": export_tree(args.before), **trees}
+    env = dict(os.environ, DATA_DIR=tempfile.mkdtemp(prefix="lab4_startup_"), PIPELINE_TRACING="false")
+
+    print(f"\n[TRAINER STARTUP] best of {args.repeats} fresh interpreters")
+    for label, lab_dir in trees.items():
+        modules = dag_modules(lab_dir)
+        dag_seconds = import_seconds(", ".join("src." + m for m in modules), args.repeats, env, lab_dir)
+        trainer_seconds = import_seconds("src.model_trainer", args.repeats, env, lab_dir)
+        print(f"  {label:<6} DAG imports ({len(modules)} modules): {fmt(dag_seconds)}   "
+              f"src.model_trainer alone: {fmt(trainer_seconds)}")
+
+    installed = []
+    for module in DEFERRED_IMPORTS:
+        if importlib.util.find_spec(module.split(".")[0]) is None:
+            print(f"  deferred {module:<24}: not installed")
+            continue
+        seconds = import_seconds(module, args.repeats, env)
+        if seconds is None:
+            print(f"  deferred {module:<24}: import failed")
+            continue
+        installed.append(module)
+        print(f"  deferred {module:<24}: {fmt(seconds)}")
+    if installed:
+        print(f"  {'deferred, all together':<33}: {fmt(import_seconds(', '.join(installed), args.repeats, env))}")
+
+    if args.model:
+        if importlib.util.find_spec("mlflow") is None:
+            print("  Training task: mlflow not installed")
+        else:
+            prepared = tempfile.mkdtemp(prefix="lab4_prepared_")
+            subprocess.run([sys.executable, "-c", PREPARE_SCRIPT, str(args.rows)], cwd=LAB_DIR,
+                           env=dict(env, DATA_DIR=prepared), capture_output=True, check=True)
+            print(f"  Training task {args.model} ({args.rows:,} generated rows), DAG imports included:")
+            for label, lab_dir in trees.items():
+                data_dir = tempfile.mkdtemp(prefix=f"lab4_{label}_")
+                shutil.copytree(prepared, data_dir, dirs_exist_ok=True)
+                task_env = dict(env, DATA_DIR=data_dir, MLFLOW_TRACKING_URI="file://" + os.path.join(data_dir, "mlruns"))
+                modules = ", ".join(dag_modules(lab_dir))
+                train = timed_python(TASK_SCRIPT.format(modules=modules, call="model_trainer.run(sys.argv[1])"),
+                                     args.model, cwd=lab_dir, env=task_env)
+                line = f"    {label:<6} train_{args.model}: {fmt(train)}"
+                if os.path.exists(os.path.join(lab_dir, "src", "report_renderer.py")):
+                    render = timed_python(TASK_SCRIPT.format(modules=modules, call="report_renderer.run()"),
+                                          cwd=lab_dir, env=task_env)
+                    line += f"   render_reports (off the training path): {fmt(render)}"
+                print(line)
+    print()
@@ -0,0 +1,119 @@
+"""
+Benchmark: wall time of the parallel training fan-out with and without CPU budgeting.
+
+Starts one process per model at the same time, as the DAG's training tasks run
+under LocalExecutor, each memory-mapping the same prepared arrays. Without
+budgeting every library uses its default threading (RandomForest n_jobs=-1,
+XGBoost/LightGBM all threads, BLAS all cores); with budgeting each task gets
+its core quota from src/cpu_budget.py. --search wraps every model in a small
+GridSearchCV as Lab 5 does (n_jobs=-1 versus quota-many single-threaded fits).
+Models whose library is not installed are skipped.
+
+Usage (from the Lab 4 directory):
+    python benchmarks/training_fanout.py [--rows 200000] [--cpus 0] [--search]
+"""
+import argparse
+import importlib.util
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.cpu_budget import CpuBudget
+from src.utils import MODEL_CONFIGS
+
+MODEL_LIBRARIES = {"XGBoost": "xgboost", "LightGBM": "lightgbm"}
+# Two candidates x 3 folds per model in --search mode
+SEARCH_GRIDS = {
+    "RandomForest": {"max_depth": [8, 12]},
+    "XGBoost": {"max_depth": [6, 8]},
+    "LightGBM": {"num_leaves": [31, 63]},
+    "NeuralNet": {"learning_rate_init": [0.001, 0.01]}
+}
+
+
+def build_model(model_name, config):
+    if model_name == "RandomForest":
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(**config)
+    if model_name == "XGBoost":
+        import xgboost as xgb
+        return xgb.XGBClassifier(**config)
+    if model_name == "LightGBM":
+        import lightgbm as lgb
+        return lgb.LGBMClassifier(**config)
+    from sklearn.neural_network import MLPClassifier
+    return MLPClassifier(**config)
+
+
+def train(model_name, slot, concurrency, cpus, budgeting, search, data_dir, results):
+    X = np.load(os.path.join(data_dir, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(data_dir, "y.npy"), mmap_mode="r")
+    budget = CpuBudget(concurrency, slot=slot, total=cpus, enabled=budgeting)
+    start = time.perf_counter()
+    if search:
+        from sklearn.model_selection import GridSearchCV
+        config = {**MODEL_CONFIGS[model_name], **budget.estimator_params(model_name, threads=1)}
+        model = GridSearchCV(build_model(model_name, config), SEARCH_GRIDS[model_name], cv=3,
+                             scoring="f1_weighted", n_jobs=budget.search_jobs())
+        with budget.search():
+            report = budget.report(search_jobs=model.n_jobs)
+            model.fit(X, y)
+    else:
+        config = {**MODEL_CONFIGS[model_name], **budget.estimator_params(model_name)}
+        model = build_model(model_name, config)
+        with budget.limit():
+            report = budget.report(model_threads=config.get("n_jobs"))
+            model.fit(X, y)
+    results[model_name] = (time.perf_counter() - start, report)
+
+
+def fan_out(models, cpus, budgeting, search, data_dir):
+    manager = multiprocessing.Manager()
+    results = manager.dict()
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=train, args=(name, slot, len(models), cpus, budgeting, search, data_dir, results))
+                 for slot, name in enumerate(models)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return time.perf_counter() - start, dict(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the training fan-out with and without CPU budgeting.")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--cpus", type=int, default=0, help="cores to budget; 0 detects them")
+    parser.add_argument("--search", action="store_true", help="wrap each model in a GridSearchCV as Lab 5 does")
+    args = parser.parse_args()
+
+    models = [name for name in MODEL_CONFIGS
+              if name not in MODEL_LIBRARIES or importlib.util.find_spec(MODEL_LIBRARIES[name])]
+    skipped = sorted(set(MODEL_CONFIGS) - set(models))
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(args.rows, 11))
+    y = (X[:, 0] + 0.5 * X[:, 3] > 0.8).astype(np.int64) + (X[:, 4] * X[:, 5] > 1.2).astype(np.int64)
+    data_dir = tempfile.mkdtemp(prefix="lab4_fanout_")
+    np.save(os.path.join(data_dir, "X.npy"), X)
+    np.save(os.path.join(data_dir, "y.npy"), y)
+
+    print(f"\n[TRAINING FAN-OUT] {args.rows:,} rows, {len(models)} concurrent trainers"
+          f"{' with GridSearchCV' if args.search else ''}"
+          f"{f' (skipped, not installed: {skipped})' if skipped else ''}")
+    for budgeting in (False, True):
+        wall, results = fan_out(models, args.cpus, budgeting, args.search, data_dir)
+        print(f"  {'Budgeted' if budgeting else 'Unbudgeted'}: fan-out wall time {wall:.2f}s")
+        for name in models:
+            seconds, report = results[name]
+            threads = report["search_jobs"] if args.search else report["model_threads"]
+            print(f"    {name:<13} fit {seconds:7.2f}s  quota {report['core_quota']}/{report['cpus_available']}  "
+                  f"{'search jobs' if args.search else 'threads'} {threads}  pools {report['threadpools']}")
+    print()
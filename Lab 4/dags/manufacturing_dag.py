@@ -11,8 +11,10 @@ from src import (
     data_generator,
     data_validator,
     feature_engineering,
+    training_data,
     model_trainer,
-    model_evaluator
+    model_evaluator,
+    report_renderer
 )
 
 default_args = {
@@ -37,12 +39,14 @@ with DAG(
 This pipeline orchestrates the end-to-end ML lifecycle for predicting machining quality.
 
 ## Stages:
-1. **Generate Data**: Synthetic sensor data creation with physics rules.
+1. **Generate Data**: Synthetic sensor data creation with physics rules (size set by `num_samples` in the run conf).
 2. **Validate Data**: 5-point data quality check.
 3. **Feature Engineering**: Domain-specific feature extraction.
-4. **Parallel Training**: RF, XGBoost, LightGBM, and NeuralNet training with MLflow.
-5. **Evaluate & Compare**: champion selection based on F1 score.
-6. **Register Model**: Promotes the champion to MLflow Model Registry.
+4. **Prepare Training Data**: Split and scale once into memory-mapped arrays shared by the trainers.
+5. **Parallel Training**: RF, XGBoost, LightGBM, and NeuralNet training with MLflow.
+6. **Evaluate & Compare**: champion selection based on F1 score.
+7. **Register Model**: Promotes the champion to MLflow Model Registry.
+8. **Render Reports**: Draws each model's plots from its saved predictions, alongside evaluation.
 
 **Author:** Ajith Srikanth
     """
@@ -51,7 +55,7 @@ This pipeline orchestrates the end-to-end ML lifecycle for predicting machining
     gen_data = PythonOperator(
         task_id="generate_data",
         python_callable=data_generator.run,
-        doc_md="Generates 3000 synthetic sensor readings."
+        doc_md="Generates synthetic sensor readings in parallel shards (3000 by default; trigger with conf {\"num_samples\": N} to change)."
     )
 
     val_data = PythonOperator(
@@ -66,6 +70,12 @@ This pipeline orchestrates the end-to-end ML lifecycle for predicting machining
         doc_md="Calculates engineered features like Cutting Energy and Tool Wear Severity."
     )
 
+    prep_data = PythonOperator(
+        task_id="prepare_training_data",
+        python_callable=training_data.run,
+        doc_md="Splits and scales the features once into memory-mapped arrays for all trainers."
+    )
+
     evaluate = PythonOperator(
         task_id="evaluate_and_compare",
         python_callable=model_evaluator.run_evaluate,
@@ -78,6 +88,14 @@ This pipeline orchestrates the end-to-end ML lifecycle for predicting machining
         doc_md="Registers the champion model in MLflow Model Registry."
     )
 
+    render = PythonOperator(
+        task_id="render_reports",
+        python_callable=report_renderer.run,
+        # Runs once every trainer has finished, so a failed trainer does not cost the others their plots
+        trigger_rule="all_done",
+        doc_md="Renders confusion matrix and feature importance plots from the saved predictions and logs them to each model's MLflow run."
+    )
+
     # Parallel Training Tasks
     models = ["RandomForest", "XGBoost", "LightGBM", "NeuralNet"]
     training_tasks = []
@@ -93,4 +111,5 @@ This pipeline orchestrates the end-to-end ML lifecycle for predicting machining
         training_tasks.append(train_task)
 
     # Dependencies
-    gen_data >> val_data >> feat_eng >> training_tasks >> evaluate >> register
+    gen_data >> val_data >> feat_eng >> prep_data >> training_tasks >> evaluate >> register
+    training_tasks >> render
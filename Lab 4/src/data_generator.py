@@ -1,96 +1,170 @@
+import os
+import shutil
+import multiprocessing
 import numpy as np
 import pandas as pd
-import random
+import pyarrow.parquet as pq
 from src.utils import (
-    get_logger, log_stage, log_dataframe_summary, log_dict_table,
-    RAW_DATA_PATH, DATA_DIR, SENSOR_FEATURES, save_metadata
+    get_logger, log_stage, log_dict_table, trace_span,
+    RAW_DATA_PATH, DATA_DIR, DATA_FORMAT, SENSOR_FEATURES, save_metadata,
+    NUM_SAMPLES, GENERATOR_WORKERS, GENERATOR_SHARD_SIZE, GENERATION_SEED
 )
+from src.defect_rules import assign_labels
+from src.streaming_stats import MomentsAccumulator
+from src.data_io import is_parquet, write_frame, open_parquet_writer, report_storage
 
 logger = get_logger(__name__)
 
-@log_stage("Data Generation")
-def run():
-    """Generates synthetic CNC sensor readings with defect labels."""
-    num_samples = 3000
-    np.random.seed(42)
-    random.seed(42)
+MACHINE_IDS = ["CNC-A01", "CNC-A02", "CNC-B01"]
+NOISE_PCT = 0.03
+START_TIME = pd.Timestamp("2024-01-01")
+READING_INTERVAL_S = 30
+PARTS_DIR = DATA_DIR / "raw_parts"
+
+def plan_shards(num_samples, shard_size=GENERATOR_SHARD_SIZE):
+    """Splits the dataset into fixed-size shards; the plan never depends on the worker count."""
+    return [(i, start, min(shard_size, num_samples - start))
+            for i, start in enumerate(range(0, num_samples, shard_size))]
+
+def generate_shard(shard):
+    """Generates one shard from its own RNG stream and writes it as a part file (headerless for CSV)."""
+    shard_index, start, size = shard
+    # Child stream i of the master seed (what SeedSequence(seed).spawn(n)[i] returns)
+    rng = np.random.default_rng(np.random.SeedSequence(GENERATION_SEED, spawn_key=(shard_index,)))
 
     # 1. Sensor distributions
-    data = {
-        "spindle_speed": np.clip(np.random.normal(2000, 500, num_samples), 800, 3200),
-        "feed_rate": np.clip(np.random.normal(200, 80, num_samples), 50, 400),
-        "depth_of_cut": np.random.uniform(0.5, 4.0, num_samples),
-        "vibration": np.clip(np.random.exponential(2.5, num_samples), 0.5, 8.0),
-        "temperature": np.clip(np.random.normal(240, 45, num_samples), 150, 350),
-        "tool_wear": np.random.beta(2, 5, num_samples) * 0.8
+    df = pd.DataFrame({
+        "spindle_speed": np.clip(rng.normal(2000, 500, size), 800, 3200),
+        "feed_rate": np.clip(rng.normal(200, 80, size), 50, 400),
+        "depth_of_cut": rng.uniform(0.5, 4.0, size),
+        "vibration": np.clip(rng.exponential(2.5, size), 0.5, 8.0),
+        "temperature": np.clip(rng.normal(240, 45, size), 150, 350),
+        "tool_wear": rng.beta(2, 5, size) * 0.8
+    })
+
+    # 2. Defect labeling rules (see DEFECT_RULES in utils)
+    labels = assign_labels(df)
+    baseline_counts = np.bincount(labels, minlength=3)
+
+    # 3. Label noise: the shard's share of floor(num_samples * NOISE_PCT), drawn and applied in one step
+    num_noise = int((start + size) * NOISE_PCT) - int(start * NOISE_PCT)
+    noise_rows = rng.choice(size, num_noise, replace=False)
+    labels[noise_rows] = rng.integers(0, 3, num_noise)
+    df["quality"] = labels
+
+    # 4. Time/Machine columns
+    offsets = np.arange(start, start + size, dtype=np.int64) * READING_INTERVAL_S
+    df["timestamp"] = START_TIME + pd.to_timedelta(offsets, unit="s")
+    df["machine_id"] = rng.choice(MACHINE_IDS, size)
+
+    part_path = PARTS_DIR / f"part-{shard_index:05d}.{DATA_FORMAT}"
+    if is_parquet(part_path):
+        write_frame(df, part_path)
+    else:
+        df.to_csv(part_path, index=False, header=False)
+
+    return {
+        "part_path": str(part_path),
+        "rows": size,
+        "noise_rows": num_noise,
+        "baseline_counts": baseline_counts,
+        "quality_counts": np.bincount(labels, minlength=3),
+        "machine_counts": df["machine_id"].value_counts().reindex(MACHINE_IDS, fill_value=0).to_numpy(),
+        "moments": MomentsAccumulator(SENSOR_FEATURES).update(df[SENSOR_FEATURES].to_numpy())
     }
 
-    df = pd.DataFrame(data)
-
-    # 2. Defect labeling rules
-    def get_quality(row):
-        # Major Defect (label=2)
-        if (row["vibration"] > 5.5 and row["tool_wear"] > 0.45) or \
-           (row["temperature"] > 310 and row["depth_of_cut"] > 3.0) or \
-           (row["spindle_speed"] > 2800 and row["feed_rate"] > 330 and row["vibration"] > 4.0):
-            return 2
-        
-        # Minor Defect (label=1)
-        if (row["vibration"] > 3.5 and row["tool_wear"] > 0.30) or \
-           (row["temperature"] > 280 and row["depth_of_cut"] > 2.5) or \
-           (row["feed_rate"] > 300 and row["vibration"] > 3.0) or \
-           (row["tool_wear"] > 0.50):
-            return 1
-            
-        return 0
-
-    df["quality"] = df.apply(get_quality, axis=1)
-
-    # 3. Rules statistics logging
+def _resolve_num_samples(num_samples, context):
+    if num_samples is None:
+        dag_run = context.get("dag_run")
+        conf = getattr(dag_run, "conf", None) or {}
+        num_samples = conf.get("num_samples", NUM_SAMPLES)
+    num_samples = int(num_samples)
+    if num_samples <= 0:
+        raise ValueError(f"num_samples must be positive, got {num_samples}")
+    return num_samples
+
+@log_stage("Data Generation")
+def run(num_samples=None, num_workers=None, **context):
+    """
+    Generates synthetic CNC sensor readings with defect labels.
+
+    num_samples comes from the argument, the DAG run conf ({"num_samples": N}) or NUM_SAMPLES.
+    Shards are generated in parallel; the output is identical for any worker count.
+    """
+    num_samples = _resolve_num_samples(num_samples, context)
+    shards = plan_shards(num_samples)
+    num_workers = min(num_workers or GENERATOR_WORKERS or os.cpu_count() or 1, len(shards))
+    logger.info(f"Generating {num_samples:,} samples in {len(shards)} shard(s) with {num_workers} worker(s)")
+
+    shutil.rmtree(PARTS_DIR, ignore_errors=True)
+    PARTS_DIR.mkdir(parents=True, exist_ok=True)
+    with trace_span("generate_shards", shards=len(shards), workers=num_workers):
+        if num_workers == 1:
+            results = [generate_shard(shard) for shard in shards]
+        else:
+            with multiprocessing.get_context("fork").Pool(num_workers) as pool:
+                results = pool.map(generate_shard, shards, chunksize=1)
+
+    # Rules statistics logging
+    baseline = sum(r["baseline_counts"] for r in results)
     rule_stats = {
-        "Major Defect Rules": len(df[df["quality"] == 2]),
-        "Minor Defect Rules": len(df[df["quality"] == 1]),
-        "Good Samples": len(df[df["quality"] == 0])
+        "Major Defect Rules": int(baseline[2]),
+        "Minor Defect Rules": int(baseline[1]),
+        "Good Samples": int(baseline[0])
     }
     log_dict_table(logger, rule_stats, "Baseline Quality Distribution")
+    num_noise = sum(r["noise_rows"] for r in results)
+    logger.info(f"Injected {NOISE_PCT*100}% label noise into {num_noise} samples")
 
-    # 4. Inject 3% label noise
-    noise_pct = 0.03
-    num_noise = int(num_samples * noise_pct)
-    noise_indices = np.random.choice(df.index, num_noise, replace=False)
-    for idx in noise_indices:
-        df.at[idx, "quality"] = random.choice([0, 1, 2])
-    
-    logger.info(f"Injected {noise_pct*100}% label noise into {num_noise} samples")
-
-    # 5. Metadata and Time/Machine columns
-    df["timestamp"] = pd.date_range(start="2024-01-01", periods=num_samples, freq="30s")
-    df["machine_id"] = np.random.choice(["CNC-A01", "CNC-A02", "CNC-B01"], num_samples)
-
-    # 6. Final Logging
-    log_dataframe_summary(logger, df, "Raw Generated Data")
-    
-    sensor_stats = {}
-    for feat in SENSOR_FEATURES:
-        sensor_stats[feat] = f"Mean: {df[feat].mean():.2f}, Std: {df[feat].std():.2f}, Range: [{df[feat].min():.2f}, {df[feat].max():.2f}]"
-    log_dict_table(logger, sensor_stats, "Sensor Statistics")
-
-    # Save data
+    # Concatenate the parts in shard order
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    df.to_csv(RAW_DATA_PATH, index=False)
+    columns = SENSOR_FEATURES + ["quality", "timestamp", "machine_id"]
+    with trace_span("write_raw", rows=num_samples):
+        if is_parquet(RAW_DATA_PATH):
+            # Each shard becomes one row group, the unit validation workers split on
+            with open_parquet_writer(RAW_DATA_PATH, pq.read_schema(results[0]["part_path"])) as writer:
+                for r in results:
+                    writer.write_table(pq.read_table(r["part_path"]))
+        else:
+            with open(RAW_DATA_PATH, "wb") as out:
+                out.write((",".join(columns) + "\n").encode("utf-8"))
+                for r in results:
+                    with open(r["part_path"], "rb") as part:
+                        shutil.copyfileobj(part, out, 1 << 20)
+    shutil.rmtree(PARTS_DIR, ignore_errors=True)
     logger.info(f"Raw data saved to {RAW_DATA_PATH} ({RAW_DATA_PATH.stat().st_size / 1024:.2f} KB)")
+    storage_stats = report_storage(logger, RAW_DATA_PATH)
+
+    # Final Logging
+    quality_counts = sum(r["quality_counts"] for r in results)
+    machine_counts = sum(r["machine_counts"] for r in results)
+    logger.info("Summary of Raw Generated Data:")
+    logger.info(f" - Shape: ({num_samples}, {len(columns)})")
+    logger.info(f" - Class Distribution: {dict(enumerate(quality_counts.tolist()))}")
+
+    moments = MomentsAccumulator(SENSOR_FEATURES)
+    for r in results:
+        moments.merge(r["moments"])
+    sensor_stats = {}
+    for feat, v in moments.summary().items():
+        sensor_stats[feat] = f"Mean: {v['mean']:.2f}, Std: {v['std']:.2f}, Range: [{v['min']:.2f}, {v['max']:.2f}]"
+    log_dict_table(logger, sensor_stats, "Sensor Statistics")
 
     # Save metadata
     metadata = {
         "generation_stats": {
             "total_samples": num_samples,
-            "quality_distribution": df["quality"].value_counts().to_dict(),
-            "machine_distribution": df["machine_id"].value_counts().to_dict(),
-            "noise_percentage": noise_pct,
-            "seed": 42
+            "quality_distribution": dict(enumerate(quality_counts.tolist())),
+            "machine_distribution": dict(zip(MACHINE_IDS, machine_counts.tolist())),
+            "noise_percentage": NOISE_PCT,
+            "seed": GENERATION_SEED,
+            "shards": len(shards),
+            "workers": num_workers,
+            "storage": storage_stats
         }
     }
     save_metadata(metadata)
 
 if __name__ == "__main__":
-    run()
+    import sys
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,149 @@
+import os
+import time
+import tempfile
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.utils import (
+    log_dict_table, SENSOR_FEATURES, ENGINEERED_FEATURES,
+    PARQUET_COMPRESSION, CSV_EXPORT, IO_COMPARE_CSV, IO_COMPARE_MAX_ROWS
+)
+
+# Explicit column types of the Parquet intermediates; other columns keep the type Arrow infers
+COLUMN_TYPES = {
+    **{feature: pa.float32() for feature in SENSOR_FEATURES + ENGINEERED_FEATURES},
+    "quality": pa.int8(),
+    "timestamp": pa.timestamp("ms"),
+    "machine_id": pa.dictionary(pa.int8(), pa.string())
+}
+CATEGORICAL_COLUMNS = ["machine_id"]
+
+def is_parquet(path):
+    return str(path).endswith(".parquet")
+
+def to_arrow(df):
+    """Converts a frame to an Arrow table with the COLUMN_TYPES schema."""
+    df = df.copy(deep=False)
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    schema = pa.schema([pa.field(name, COLUMN_TYPES.get(name, table.schema.field(name).type))
+                        for name in table.column_names])
+    return table.cast(schema)
+
+def read_frame(path, columns=None):
+    """Reads a stage file; only ``columns`` are decoded from Parquet (projected read)."""
+    if is_parquet(path):
+        return pq.read_table(path, columns=columns).to_pandas()
+    return pd.read_csv(path, usecols=columns)
+
+def write_frame(df, path):
+    if is_parquet(path):
+        pq.write_table(to_arrow(df), path, compression=PARQUET_COMPRESSION)
+    else:
+        df.to_csv(path, index=False)
+
+def parquet_columns(path):
+    return pq.ParquetFile(path).schema_arrow.names
+
+def open_parquet_writer(path, schema):
+    return pq.ParquetWriter(path, schema, compression=PARQUET_COMPRESSION)
+
+def split_row_groups(path, n_ranges):
+    """Splits the row groups of a Parquet file into up to ``n_ranges`` contiguous ranges of similar row counts."""
+    metadata = pq.ParquetFile(path).metadata
+    sizes = [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+    total = sum(sizes)
+    bounds, rows = [0], 0
+    for i, size in enumerate(sizes[:-1]):
+        rows += size
+        if rows >= total * len(bounds) / n_ranges:
+            bounds.append(i + 1)
+    bounds.append(len(sizes))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def copy_kept_rows(path, keep, writer):
+    """Writes the rows of a Parquet file whose ``keep`` flag is set, one row group at a time."""
+    parquet_file = pq.ParquetFile(path)
+    offset = 0
+    for i in range(parquet_file.num_row_groups):
+        table = parquet_file.read_row_group(i)
+        mask = keep[offset:offset + table.num_rows]
+        offset += table.num_rows
+        if mask.all():
+            writer.write_table(table)
+        elif mask.any():
+            writer.write_table(table.filter(pa.array(mask)))
+
+def export_csv(path):
+    """Writes a human-readable .csv copy of a Parquet file next to it, one row group at a time."""
+    csv_path = str(path)[:-len(".parquet")] + ".csv"
+    parquet_file = pq.ParquetFile(path)
+    with open(csv_path, "w", newline="") as out:
+        for i in range(parquet_file.num_row_groups):
+            parquet_file.read_row_group(i).to_pandas().to_csv(out, index=False, header=(i == 0))
+    return csv_path
+
+def compare_with_csv(path, max_rows=IO_COMPARE_MAX_ROWS):
+    """
+    Measures size and read/write time of the same rows stored as Parquet and as CSV.
+    Uses the first ``max_rows`` rows of ``path`` so the cost stays bounded on large runs.
+    """
+    parquet_file = pq.ParquetFile(path)
+    batches, rows = [], 0
+    for batch in parquet_file.iter_batches(batch_size=min(max_rows, 65536)):
+        batches.append(batch)
+        rows += batch.num_rows
+        if rows >= max_rows:
+            break
+    sample = pa.Table.from_batches(batches, schema=parquet_file.schema_arrow).slice(0, max_rows)
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(str(path))) as tmp:
+        parquet_path = os.path.join(tmp, "sample.parquet")
+        csv_path = os.path.join(tmp, "sample.csv")
+        start = time.perf_counter()
+        pq.write_table(sample, parquet_path, compression=PARQUET_COMPRESSION)
+        parquet_write = time.perf_counter() - start
+        start = time.perf_counter()
+        df = pq.read_table(parquet_path).to_pandas()
+        parquet_read = time.perf_counter() - start
+        start = time.perf_counter()
+        df.to_csv(csv_path, index=False)
+        csv_write = time.perf_counter() - start
+        start = time.perf_counter()
+        pd.read_csv(csv_path)
+        csv_read = time.perf_counter() - start
+        parquet_bytes, csv_bytes = os.path.getsize(parquet_path), os.path.getsize(csv_path)
+
+    return {
+        "rows": sample.num_rows,
+        "parquet_mb": round(parquet_bytes / 1024**2, 3),
+        "csv_mb": round(csv_bytes / 1024**2, 3),
+        "size_ratio": round(csv_bytes / parquet_bytes, 2) if parquet_bytes else None,
+        "parquet_write_s": round(parquet_write, 4),
+        "csv_write_s": round(csv_write, 4),
+        "parquet_read_s": round(parquet_read, 4),
+        "csv_read_s": round(csv_read, 4)
+    }
+
+def report_storage(logger, path):
+    """
+    After a stage writes ``path``: exports the CSV copy (CSV_EXPORT) and logs the
+    Parquet vs CSV comparison (IO_COMPARE_CSV). Returns the comparison for metadata.
+    """
+    if not is_parquet(path):
+        return None
+    if CSV_EXPORT:
+        logger.info(f"CSV copy saved to {export_csv(path)}")
+    if not IO_COMPARE_CSV:
+        return None
+    comparison = compare_with_csv(path)
+    log_dict_table(logger, {
+        "Rows Compared": f"{comparison['rows']:,}",
+        "Size": f"Parquet {comparison['parquet_mb']:.2f} MB vs CSV {comparison['csv_mb']:.2f} MB "
+                f"({comparison['size_ratio']}x smaller)",
+        "Write": f"Parquet {comparison['parquet_write_s']:.3f}s vs CSV {comparison['csv_write_s']:.3f}s",
+        "Read": f"Parquet {comparison['parquet_read_s']:.3f}s vs CSV {comparison['csv_read_s']:.3f}s"
+    }, "Storage Format Comparison")
+    return comparison
@@ -1,39 +1,177 @@
-import pandas as pd
+import os
+import shutil
+import multiprocessing
 import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
 from src.utils import (
-    get_logger, log_stage, log_dataframe_summary, log_dict_table,
-    RAW_DATA_PATH, VALIDATED_DATA_PATH, SENSOR_FEATURES, SENSOR_RANGES,
-    save_metadata
+    get_logger, log_stage, log_dict_table, trace_span,
+    DATA_DIR, RAW_DATA_PATH, VALIDATED_DATA_PATH, SENSOR_RANGES,
+    VALIDATION_BLOCK_BYTES, VALIDATION_WORKERS, DEDUP_INDEX_MODE, DEDUP_INDEX_DIR,
+    DEDUP_BLOOM_CAPACITY, DEDUP_BLOOM_FP_RATE, NEAR_DUPLICATE_CHECK, NEAR_DUPLICATE_TOLERANCES,
+    SENSOR_FEATURES, save_metadata, current_run_id
+)
+from src.validation_engine import (
+    REQUIRED_COLUMNS, read_header, split_byte_ranges, validate_part, merge_parts, copy_kept_lines
 )
+from src.data_io import (
+    is_parquet, read_frame, parquet_columns, split_row_groups, open_parquet_writer,
+    copy_kept_rows, report_storage
+)
+from src.dedup_index import DedupIndexStore, source_digest, describe_dedup_index
+from src.near_duplicates import near_duplicate_clusters
 
 logger = get_logger(__name__)
 
+def check_near_duplicates(data_start, stats):
+    """
+    Optional check: clusters validated readings that match within NEAR_DUPLICATE_TOLERANCES
+    and, in "drop" mode, rewrites the validated file keeping the first reading of each cluster
+    (adjusting the row and class counters in ``stats``).
+    """
+    logger.info(f"Optional check: Near-duplicate detection ({NEAR_DUPLICATE_CHECK})")
+    with trace_span("near_duplicates"):
+        df = read_frame(VALIDATED_DATA_PATH, columns=SENSOR_FEATURES + ["quality"])
+        sensors = df[SENSOR_FEATURES].to_numpy(dtype=np.float64)
+        tolerances = [NEAR_DUPLICATE_TOLERANCES[f] for f in SENSOR_FEATURES]
+        cluster_ids, representative, n_pairs = near_duplicate_clusters(sensors, tolerances)
+
+    n_clusters = int(cluster_ids.max(initial=-1)) + 1
+    clustered_rows = int((cluster_ids >= 0).sum())
+    result = {
+        "mode": NEAR_DUPLICATE_CHECK,
+        "pairs": n_pairs,
+        "clusters": n_clusters,
+        "clustered_rows": clustered_rows,
+        "largest_cluster": int(np.bincount(cluster_ids[cluster_ids >= 0]).max()) if n_clusters else 0,
+        "dropped_rows": 0
+    }
+    if n_clusters == 0:
+        logger.info(" - No near-duplicate sensor readings found")
+        return result
+
+    logger.warning(f"Found {n_clusters} near-duplicate clusters covering {clustered_rows} readings")
+    if NEAR_DUPLICATE_CHECK == "drop":
+        tmp_path = VALIDATED_DATA_PATH.with_suffix(".tmp")
+        if is_parquet(VALIDATED_DATA_PATH):
+            with open_parquet_writer(tmp_path, pq.ParquetFile(VALIDATED_DATA_PATH).schema_arrow) as writer:
+                copy_kept_rows(VALIDATED_DATA_PATH, representative, writer)
+        else:
+            with open(tmp_path, "wb") as out:
+                with open(VALIDATED_DATA_PATH, "rb") as f:
+                    out.write(f.readline())
+                copy_kept_lines(VALIDATED_DATA_PATH, data_start, representative, out, VALIDATION_BLOCK_BYTES)
+        os.replace(tmp_path, VALIDATED_DATA_PATH)
+        result["dropped_rows"] = int((~representative).sum())
+        stats["output_rows"] -= result["dropped_rows"]
+        dropped_labels = df["quality"].to_numpy()[~representative]
+        for label in stats["quality_counts"]:
+            stats["quality_counts"][label] -= int((dropped_labels == label).sum())
+        logger.warning(f"Kept one reading per cluster, removed {result['dropped_rows']} readings")
+    return result
+
+VALIDATION_PARTS_DIR = DATA_DIR / "validation_parts"
+# Smallest byte range worth handing to a separate worker
+MIN_RANGE_BYTES = 1024**2
+
+def plan_ranges(num_workers):
+    """
+    Returns (columns, data_start, ranges): byte ranges of a raw CSV (data_start is
+    where the rows begin) or row group ranges of a raw Parquet file.
+    """
+    file_size = RAW_DATA_PATH.stat().st_size
+    if is_parquet(RAW_DATA_PATH):
+        ranges = split_row_groups(RAW_DATA_PATH, num_workers)
+        logger.info(f"Starting validation of {RAW_DATA_PATH} ({file_size / 1024**2:.2f} MB) "
+                    f"in {ranges[-1][1] if ranges else 0} row group(s)")
+        return parquet_columns(RAW_DATA_PATH), 0, ranges
+
+    columns, data_start = read_header(RAW_DATA_PATH)
+    logger.info(f"Starting validation of {RAW_DATA_PATH} ({file_size / 1024**2:.2f} MB) "
+                f"in blocks of {VALIDATION_BLOCK_BYTES / 1024**2:.0f} MB")
+    data_bytes = file_size - data_start
+    n_ranges = max(1, min(num_workers, -(-data_bytes // MIN_RANGE_BYTES)))
+    return columns, data_start, split_byte_ranges(RAW_DATA_PATH, data_start, file_size, n_ranges)
+
 @log_stage("Data Validation")
-def run():
-    """Performs 5 validation checks on the raw sensor data."""
+def run(num_workers=None, **context):
+    """
+    Performs 5 validation checks on the raw sensor data.
+
+    The raw file is split into ranges (newline-aligned byte ranges of a CSV, row
+    group ranges of a Parquet file) validated in parallel worker processes. Each
+    worker reads its range block by block, runs every check in one vectorized
+    sweep per block and streams kept rows to a part file; the parts are merged in
+    range order with a cross-range duplicate check, so the output is identical for
+    any worker count.
+    """
     if not RAW_DATA_PATH.exists():
         logger.error(f"Raw data file not found at {RAW_DATA_PATH}")
         return
 
-    df = pd.read_csv(RAW_DATA_PATH)
-    initial_rows = len(df)
-    logger.info(f"Starting validation on {initial_rows} rows")
+    num_workers = num_workers or VALIDATION_WORKERS or os.cpu_count() or 1
+    columns, data_start, data_ranges = plan_ranges(num_workers)
 
     # 1. Schema check
-    REQUIRED_COLUMNS = SENSOR_FEATURES + ["quality"]
-    missing_cols = [c for c in REQUIRED_COLUMNS if c not in df.columns]
     logger.info(f"Check 1/5: Schema validation")
+    missing_cols = [c for c in REQUIRED_COLUMNS if c not in columns]
     if missing_cols:
         logger.error(f"Missing columns: {missing_cols}")
         raise ValueError(f"Schema validation failed: Missing {missing_cols}")
     logger.info(" - All required columns present")
 
+    # Checks 2-5 in a single sweep per block, one range per worker
+    logger.info(f"Validating {len(data_ranges)} range(s) with {min(num_workers, len(data_ranges))} worker(s)")
+
+    shutil.rmtree(VALIDATION_PARTS_DIR, ignore_errors=True)
+    VALIDATION_PARTS_DIR.mkdir(parents=True, exist_ok=True)
+    tasks = [(i, start, end, str(RAW_DATA_PATH), columns, str(VALIDATION_PARTS_DIR), VALIDATION_BLOCK_BYTES)
+             for i, (start, end) in enumerate(data_ranges)]
+    with trace_span("validate_ranges", ranges=len(data_ranges), workers=num_workers):
+        if len(tasks) == 1:
+            part_results = [validate_part(tasks[0])]
+        else:
+            with multiprocessing.get_context("fork").Pool(min(num_workers, len(tasks))) as pool:
+                part_results = pool.map(validate_part, tasks, chunksize=1)
+
+    # The index is only written back once the whole stage has succeeded
+    dedup_store, history, source = None, None, None
+    if DEDUP_INDEX_MODE != "off":
+        dedup_store = DedupIndexStore(DEDUP_INDEX_MODE, str(DEDUP_INDEX_DIR), DEDUP_BLOOM_CAPACITY, DEDUP_BLOOM_FP_RATE)
+        with trace_span("source_digest"):
+            source = source_digest(RAW_DATA_PATH)
+        batch_status = dedup_store.batch_status(source)
+        history = dedup_store.open(source)
+        if batch_status == "earlier":
+            logger.warning(f"{RAW_DATA_PATH.name} was already ingested before later batches; "
+                           f"skipping the cross-run duplicate check and leaving the index unchanged")
+        else:
+            if batch_status == "latest":
+                logger.info(f"{RAW_DATA_PATH.name} is the last ingested batch; checking it against the index from before it")
+            logger.info(f"Loaded {DEDUP_INDEX_MODE} duplicate index with {len(history):,} readings from previous runs")
+
+    with trace_span("merge_ranges", ranges=len(data_ranges)):
+        if is_parquet(RAW_DATA_PATH):
+            with open_parquet_writer(VALIDATED_DATA_PATH, pq.ParquetFile(RAW_DATA_PATH).schema_arrow) as writer:
+                stats = merge_parts(part_results, writer, VALIDATION_BLOCK_BYTES, history=history)
+        else:
+            with open(VALIDATED_DATA_PATH, "wb") as out:
+                with open(RAW_DATA_PATH, "rb") as f:
+                    out.write(f.readline())
+                stats = merge_parts(part_results, out, VALIDATION_BLOCK_BYTES, history=history)
+    shutil.rmtree(VALIDATION_PARTS_DIR, ignore_errors=True)
+
+    dedup_index_stats = None
+    if history is not None:
+        dedup_index_stats = {"mode": DEDUP_INDEX_MODE, "batch": batch_status, "previously_seen": stats["previously_seen"],
+                             **describe_dedup_index(history)}
+    initial_rows = stats["input_rows"]
+    logger.info(f"Validated {initial_rows} rows")
+
     # 2. Target integrity
     logger.info(f"Check 2/5: Target integrity")
-    invalid_quality = df[~df["quality"].isin([0, 1, 2])]
-    if not invalid_quality.empty:
-        logger.warning(f"Found {len(invalid_quality)} invalid quality labels. Dropping.")
-        df = df[df["quality"].isin([0, 1, 2])]
+    if stats["invalid_quality"]:
+        logger.warning(f"Found {stats['invalid_quality']} invalid quality labels. Dropping.")
     else:
         logger.info(" - Quality labels are valid {0, 1, 2}")
 
@@ -41,10 +179,10 @@ def run():
     logger.info(f"Check 3/5: Range validation")
     range_issues = 0
     for feature, ranges in SENSOR_RANGES.items():
-        out_of_range = df[(df[feature] < ranges["min"]) | (df[feature] > ranges["max"])]
-        if not out_of_range.empty:
-            logger.warning(f" - {feature}: {len(out_of_range)} values out of range [{ranges['min']}, {ranges['max']}] {ranges['unit']}")
-            range_issues += len(out_of_range)
+        out_of_range = stats["range_issues"][feature]
+        if out_of_range:
+            logger.warning(f" - {feature}: {out_of_range} values out of range [{ranges['min']}, {ranges['max']}] {ranges['unit']}")
+            range_issues += out_of_range
     
     if range_issues == 0:
         logger.info(" - All sensors within expected ranges")
@@ -53,27 +191,35 @@ def run():
 
     # 4. Null check
     logger.info(f"Check 4/5: Null values check")
-    null_counts = df[REQUIRED_COLUMNS].isnull().sum()
-    total_nulls = null_counts.sum()
-    if total_nulls > 0:
-        logger.warning(f"Found {total_nulls} null values. Dropping rows.")
-        df = df.dropna(subset=REQUIRED_COLUMNS)
+    if stats["null_values"] > 0:
+        logger.warning(f"Found {stats['null_values']} null values. Dropping rows.")
     else:
         logger.info(" - No null values detected in sensor or quality columns")
 
     # 5. Duplicate detection
     logger.info(f"Check 5/5: Duplicate detection")
-    duplicates = df.duplicated(subset=SENSOR_FEATURES).sum()
-    if duplicates > 0:
-        logger.warning(f"Found {duplicates} duplicate sensor readings. Removing.")
-        df = df.drop_duplicates(subset=SENSOR_FEATURES)
+    if stats["duplicates"] > 0:
+        logger.warning(f"Found {stats['duplicates']} duplicate sensor readings. Removing.")
     else:
         logger.info(" - No exact duplicate sensor readings found")
+    if dedup_index_stats:
+        if stats["previously_seen"] > 0:
+            logger.warning(f"Found {stats['previously_seen']} readings already ingested in previous runs. Removing.")
+        else:
+            logger.info(" - No readings from previous runs found")
+        log_dict_table(logger, dedup_index_stats, "Duplicate Index")
+        if DEDUP_INDEX_MODE == "bloom" and len(history) > DEDUP_BLOOM_CAPACITY:
+            logger.warning(f"Bloom index holds {len(history):,} readings, above its capacity of {DEDUP_BLOOM_CAPACITY:,}; "
+                           f"the false-positive rate is now {dedup_index_stats['estimated_fp_rate']:.4%}")
+
+    near_duplicate_stats = None
+    if NEAR_DUPLICATE_CHECK != "off":
+        near_duplicate_stats = check_near_duplicates(data_start, stats)
 
     # Conclusion
-    final_rows = len(df)
+    final_rows = stats["output_rows"]
     dropped_rows = initial_rows - final_rows
-    drop_rate = (dropped_rows / initial_rows) * 100
+    drop_rate = (dropped_rows / initial_rows) * 100 if initial_rows else 0.0
 
     validation_stats = {
         "Input Rows": initial_rows,
@@ -86,11 +232,11 @@ def run():
     if drop_rate > 10:
         logger.warning(f"High drop rate detected: {drop_rate:.2f}%!")
 
-    log_dataframe_summary(logger, df, "Validated Data")
-
-    # Save output
-    df.to_csv(VALIDATED_DATA_PATH, index=False)
+    logger.info("Summary of Validated Data:")
+    logger.info(f" - Shape: ({final_rows}, {len(columns)})")
+    logger.info(f" - Class Distribution: {stats['quality_counts']}")
     logger.info(f"Validated data saved to {VALIDATED_DATA_PATH}")
+    storage_stats = report_storage(logger, VALIDATED_DATA_PATH)
 
     # Update metadata
     metadata = {
@@ -99,10 +245,25 @@ def run():
             "final_rows": final_rows,
             "dropped_rows": dropped_rows,
             "drop_rate_pct": drop_rate,
+            "invalid_quality_rows": stats["invalid_quality"],
+            "range_issues": stats["range_issues"],
+            "null_values": stats["null_values"],
+            "null_rows": stats["null_rows"],
+            "duplicate_rows": stats["duplicates"],
+            "dedup_index": dedup_index_stats,
+            "near_duplicates": near_duplicate_stats,
+            "ranges": len(data_ranges),
+            "workers": min(num_workers, len(data_ranges)),
+            "storage": storage_stats,
             "validation_timestamp": pd.Timestamp.now().isoformat()
         }
     }
     save_metadata(metadata)
 
+    if history is not None:
+        path = dedup_store.commit(history, source, raw_file=RAW_DATA_PATH.name, run_id=current_run_id(),
+                                  rows_kept=final_rows, committed_at=pd.Timestamp.now().isoformat())
+        logger.info(f"Saved duplicate index to {path}")
+
 if __name__ == "__main__":
     run()
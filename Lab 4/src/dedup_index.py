@@ -0,0 +1,176 @@
+import os
+import json
+import math
+import hashlib
+import numpy as np
+from src.validation_engine import SortedHashSet
+
+EXACT_INDEX_FILE = "sensor_hashes.npy"
+BLOOM_INDEX_FILE = "sensor_bloom.npz"
+LEDGER_FILE = "ledger.json"
+PROBE_BATCH = 1 << 20
+
+class BloomFilter:
+    """
+    Bloom filter over 64-bit sensor hashes. The k probe positions come from
+    double hashing the two 32-bit halves of each hash, so no rehashing is needed.
+    """
+
+    def __init__(self, capacity, fp_rate, bits=None, n_inserted=0):
+        self.capacity = int(capacity)
+        self.fp_rate = float(fp_rate)
+        self.n_bits = max(64, int(math.ceil(-self.capacity * math.log(self.fp_rate) / math.log(2) ** 2)))
+        self.n_hashes = max(1, int(round(self.n_bits / self.capacity * math.log(2))))
+        self.bits = np.zeros((self.n_bits + 7) // 8, dtype=np.uint8) if bits is None else bits
+        self.n_inserted = int(n_inserted)
+
+    def __len__(self):
+        return self.n_inserted
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def _positions(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        low = hashes & np.uint64(0xFFFFFFFF)
+        high = (hashes >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.n_hashes, dtype=np.uint64)
+        return (low[:, None] + steps[None, :] * high[:, None]) % np.uint64(self.n_bits)
+
+    def contains(self, hashes):
+        found = np.zeros(len(hashes), dtype=bool)
+        # Probe in slices so the (rows x k) position matrix stays small
+        for start in range(0, len(hashes), PROBE_BATCH):
+            positions = self._positions(hashes[start:start + PROBE_BATCH])
+            bits = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+            found[start:start + PROBE_BATCH] = bits.all(axis=1)
+        return found
+
+    def add(self, hashes):
+        for start in range(0, len(hashes), PROBE_BATCH):
+            positions = self._positions(hashes[start:start + PROBE_BATCH]).ravel()
+            np.bitwise_or.at(self.bits, positions >> np.uint64(3), (1 << (positions & np.uint64(7))).astype(np.uint8))
+        self.n_inserted += len(hashes)
+
+    def estimated_fp_rate(self):
+        """Probability that an unseen reading is reported as seen at the current fill."""
+        return (1 - math.exp(-self.n_hashes * self.n_inserted / self.n_bits)) ** self.n_hashes
+
+def source_digest(path, block_size=1 << 20):
+    """SHA-256 of an input file, which identifies the batch of readings it adds to the index."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class DedupIndexStore:
+    """
+    The persistent duplicate index of one mode ("exact" or "bloom") and a ledger of
+    the input batches that filled it.
+
+    Every committed batch writes a new index snapshot, and the ledger (replaced
+    atomically, last) names the current snapshot and the one from before the latest
+    batch. Validating the latest batch's input again (an Airflow retry, or a rerun
+    on the same raw file) starts from that earlier snapshot, so the batch does not
+    drop its own rows; nothing on disk changes until ``commit``.
+    """
+
+    def __init__(self, mode, directory, bloom_capacity, bloom_fp_rate):
+        if mode not in ("exact", "bloom"):
+            raise ValueError(f"Unknown DEDUP_INDEX_MODE '{mode}' (expected off, exact or bloom)")
+        self.mode = mode
+        self.directory = directory
+        self.bloom_capacity = bloom_capacity
+        self.bloom_fp_rate = bloom_fp_rate
+        self.ledger_path = os.path.join(directory, f"{mode}_{LEDGER_FILE}")
+        self.ledger = self._read_ledger()
+
+    def _read_ledger(self):
+        if os.path.exists(self.ledger_path):
+            with open(self.ledger_path) as f:
+                return json.load(f)
+        # Index written before the ledger existed: keep it as the current snapshot
+        legacy = EXACT_INDEX_FILE if self.mode == "exact" else BLOOM_INDEX_FILE
+        current = legacy if os.path.exists(os.path.join(self.directory, legacy)) else None
+        return {"generation": 0, "current": current, "base": None, "batches": []}
+
+    def _load_snapshot(self, name):
+        path = os.path.join(self.directory, name) if name else None
+        if self.mode == "exact":
+            return SortedHashSet(np.load(path) if path else None)
+        if path is None:
+            return BloomFilter(self.bloom_capacity, self.bloom_fp_rate)
+        saved = np.load(path)
+        return BloomFilter(int(saved["capacity"]), float(saved["fp_rate"]),
+                           bits=saved["bits"], n_inserted=int(saved["n_inserted"]))
+
+    def batch_status(self, source):
+        """"new", "latest" (the last committed batch) or "earlier" for an input digest."""
+        batches = self.ledger["batches"]
+        if batches and batches[-1]["source"] == source:
+            return "latest"
+        if any(batch["source"] == source for batch in batches):
+            return "earlier"
+        return "new"
+
+    def open(self, source):
+        """
+        Returns the index to check ``source``'s rows against: every committed batch
+        except ``source`` itself. Returns None when ``source`` was committed before a
+        later batch, whose snapshot cannot be separated from it.
+        """
+        status = self.batch_status(source)
+        if status == "earlier":
+            return None
+        return self._load_snapshot(self.ledger["base"] if status == "latest" else self.ledger["current"])
+
+    def commit(self, index, source, **details):
+        """Saves ``index`` as the snapshot after ``source`` and records the batch; returns the snapshot path."""
+        os.makedirs(self.directory, exist_ok=True)
+        ledger = dict(self.ledger)
+        if self.batch_status(source) == "latest":
+            ledger["batches"] = ledger["batches"][:-1]
+        else:
+            ledger["base"] = ledger["current"]
+        ledger["generation"] += 1
+        if self.mode == "exact":
+            name = f"sensor_hashes.{ledger['generation']}.npy"
+            np.save(os.path.join(self.directory, name), index.to_array())
+        else:
+            name = f"sensor_bloom.{ledger['generation']}.npz"
+            np.savez(os.path.join(self.directory, name), bits=index.bits, capacity=index.capacity,
+                     fp_rate=index.fp_rate, n_inserted=index.n_inserted)
+        ledger["current"] = name
+        ledger["batches"] = ledger["batches"] + [{"source": source, "entries": len(index), **details}]
+
+        tmp_path = self.ledger_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(ledger, f, indent=2)
+        os.replace(tmp_path, self.ledger_path)
+        self.ledger = ledger
+        self._remove_unreferenced_snapshots()
+        return os.path.join(self.directory, name)
+
+    def _remove_unreferenced_snapshots(self):
+        prefix = "sensor_hashes" if self.mode == "exact" else "sensor_bloom"
+        keep = {self.ledger["current"], self.ledger["base"]}
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name not in keep:
+                os.remove(os.path.join(self.directory, name))
+
+def describe_dedup_index(index):
+    """Entries, memory and false-positive rate of an index, for logs and metadata."""
+    if isinstance(index, BloomFilter):
+        return {
+            "entries": len(index),
+            "memory_mb": round(index.nbytes / 1024**2, 3),
+            "estimated_fp_rate": index.estimated_fp_rate(),
+            "capacity": index.capacity
+        }
+    return {
+        "entries": len(index),
+        "memory_mb": round(index.nbytes / 1024**2, 3),
+        "estimated_fp_rate": 0.0
+    }
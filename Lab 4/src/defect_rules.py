@@ -0,0 +1,58 @@
+import operator
+import numpy as np
+from src.utils import DEFECT_RULES, DEFAULT_QUALITY_LABEL, SENSOR_FEATURES
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+}
+
+def compile_rules(rules=DEFECT_RULES, features=SENSOR_FEATURES):
+    """Validates declarative rules and turns each condition into (column, comparison, threshold)."""
+    compiled = []
+    for rule in rules:
+        clauses = []
+        for clause in rule["any_of"]:
+            conditions = []
+            for feature, op, threshold in clause:
+                if feature not in features:
+                    raise ValueError(f"Rule '{rule['name']}' uses unknown feature '{feature}'")
+                if op not in OPERATORS:
+                    raise ValueError(f"Rule '{rule['name']}' uses unsupported operator '{op}'")
+                conditions.append((feature, OPERATORS[op], threshold))
+            clauses.append(conditions)
+        compiled.append({"label": rule["label"], "name": rule["name"], "clauses": clauses})
+    return compiled
+
+def rule_masks(data, rules=DEFECT_RULES):
+    """
+    Evaluates every rule over whole columns.
+
+    data: DataFrame or mapping of column name -> 1-D array.
+    Returns [(rule, mask)] in rule order, where mask marks rows the rule matches.
+    """
+    compiled = compile_rules(rules)
+    columns = {}
+    masks = []
+    for rule in compiled:
+        matched = None
+        for conditions in rule["clauses"]:
+            clause_mask = None
+            for feature, compare, threshold in conditions:
+                if feature not in columns:
+                    columns[feature] = np.asarray(data[feature])
+                condition = compare(columns[feature], threshold)
+                clause_mask = condition if clause_mask is None else clause_mask & condition
+            matched = clause_mask if matched is None else matched | clause_mask
+        masks.append((rule, matched))
+    return masks
+
+def assign_labels(data, rules=DEFECT_RULES, default=DEFAULT_QUALITY_LABEL):
+    """Labels every row with the first matching rule (same precedence as an if/elif chain)."""
+    masks = rule_masks(data, rules)
+    if not masks:
+        return np.full(len(data), default, dtype=np.int64)
+    return np.select([m for _, m in masks], [r["label"] for r, _ in masks], default=default).astype(np.int64)
@@ -0,0 +1,70 @@
+import os
+import glob
+import numpy as np
+
+CACHE_FILE_PREFIX = "features-"
+
+class FeatureCache:
+    """
+    Engineered feature values keyed by the 64-bit hash of a row's raw sensor tuple.
+
+    Hashes are kept sorted next to a (rows x features) value matrix, so a lookup is
+    one binary search per row. The file name carries the feature version; opening
+    the cache with a different version discards every older file.
+    """
+
+    def __init__(self, directory, version, columns):
+        self.directory = str(directory)
+        self.version = version
+        self.columns = list(columns)
+        self.path = os.path.join(self.directory, f"{CACHE_FILE_PREFIX}{version}.npz")
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.values = np.empty((0, len(self.columns)), dtype=np.float64)
+        # Compute cost measured on the last run with misses, used to estimate time saved
+        self.seconds_per_row = 0.0
+        self.invalidated = []
+
+    def __len__(self):
+        return len(self.hashes)
+
+    @property
+    def nbytes(self):
+        return self.hashes.nbytes + self.values.nbytes
+
+    def load(self):
+        for stale in glob.glob(os.path.join(self.directory, f"{CACHE_FILE_PREFIX}*.npz")):
+            if stale != self.path:
+                os.remove(stale)
+                self.invalidated.append(os.path.basename(stale))
+        if os.path.exists(self.path):
+            saved = np.load(self.path)
+            if list(saved["columns"]) == self.columns:
+                self.hashes, self.values = saved["hashes"], saved["values"]
+                self.seconds_per_row = float(saved["seconds_per_row"])
+        return self
+
+    def lookup(self, hashes):
+        """Returns (hit mask, cached values of the hit rows in input order)."""
+        if not len(self.hashes):
+            return np.zeros(len(hashes), dtype=bool), self.values
+        positions = np.minimum(np.searchsorted(self.hashes, hashes), len(self.hashes) - 1)
+        hits = self.hashes[positions] == hashes
+        return hits, self.values[positions[hits]]
+
+    def add(self, hashes, values):
+        """Inserts freshly computed rows, keeping the hash array sorted and unique."""
+        if not len(hashes):
+            return
+        hashes = np.concatenate([self.hashes, np.asarray(hashes, dtype=np.uint64)])
+        values = np.concatenate([self.values, np.asarray(values, dtype=np.float64)])
+        self.hashes, first = np.unique(hashes, return_index=True)
+        self.values = values[first]
+
+    def save(self):
+        """Atomically replaces the on-disk cache."""
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, hashes=self.hashes, values=self.values,
+                 columns=np.array(self.columns), seconds_per_row=self.seconds_per_row)
+        os.replace(tmp_path, self.path)
+        return self.path
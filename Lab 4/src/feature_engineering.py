@@ -1,15 +1,81 @@
+import time
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from src.utils import (
-    get_logger, log_stage, log_dataframe_summary, log_dict_table,
-    VALIDATED_DATA_PATH, FEATURES_PATH, ENGINEERED_FEATURES,
-    save_metadata
+    get_logger, log_stage, log_dataframe_summary, log_dict_table, trace_span,
+    VALIDATED_DATA_PATH, FEATURES_PATH, SENSOR_FEATURES, ENGINEERED_FEATURES,
+    FEATURE_DEFINITIONS, FEATURE_CACHE, FEATURE_CACHE_DIR, save_metadata
 )
+from src.validation_engine import sensor_row_hashes
+from src.feature_cache import FeatureCache
+from src.feature_registry import compile_features
+from src.data_io import read_frame, write_frame, report_storage
+from src.streaming_stats import MomentsAccumulator
 
 logger = get_logger(__name__)
 
+# Rows folded into the feature/target moments per chunk
+STATS_CHUNK_ROWS = 100000
+
+FEATURE_PLAN = compile_features(FEATURE_DEFINITIONS, SENSOR_FEATURES)
+# Any edit to the definitions changes the version and invalidates the feature cache
+FEATURE_VERSION = FEATURE_PLAN.version
+
+def compute_features(df):
+    """Computes ENGINEERED_FEATURES from the sensor columns of ``df`` in one pass of the compiled plan."""
+    for name, expression in FEATURE_DEFINITIONS.items():
+        logger.info(f"Creating {name} = {expression}")
+    return FEATURE_PLAN.evaluate_frame(df)
+
+def add_engineered_features(df):
+    """
+    Fills ENGINEERED_FEATURES into ``df``, computing only rows whose sensor tuple
+    is not in the feature cache. Returns the cache statistics (None when disabled).
+    """
+    features = np.empty((len(df), len(ENGINEERED_FEATURES)), dtype=np.float64)
+    misses = np.ones(len(df), dtype=bool)
+    cache = None
+    if FEATURE_CACHE:
+        with trace_span("feature_cache_lookup", rows=len(df)):
+            cache = FeatureCache(FEATURE_CACHE_DIR, FEATURE_VERSION, ENGINEERED_FEATURES).load()
+            if cache.invalidated:
+                logger.info(f"Feature definitions changed; discarded cache file(s): {', '.join(cache.invalidated)}")
+            hashes = sensor_row_hashes(df[SENSOR_FEATURES].to_numpy(dtype=np.float64))
+            hits, cached = cache.lookup(hashes)
+            features[hits] = cached
+            misses = ~hits
+
+    n_misses = int(misses.sum())
+    start = time.perf_counter()
+    if n_misses:
+        with trace_span("compute_features", rows=n_misses):
+            features[misses] = compute_features(df.loc[misses]).to_numpy(dtype=np.float64)
+    else:
+        logger.info("All rows served from the feature cache")
+    compute_seconds = time.perf_counter() - start
+    df[ENGINEERED_FEATURES] = features
+
+    if cache is None:
+        return None
+    n_hits = len(df) - n_misses
+    if n_misses:
+        cache.seconds_per_row = compute_seconds / n_misses
+    time_saved = n_hits * cache.seconds_per_row
+    with trace_span("feature_cache_save", rows=n_misses):
+        cache.add(hashes[misses], features[misses])
+        cache.save()
+    return {
+        "version": FEATURE_VERSION,
+        "rows": len(df),
+        "hits": n_hits,
+        "computed": n_misses,
+        "hit_rate": n_hits / len(df) if len(df) else 0.0,
+        "compute_seconds": round(compute_seconds, 4),
+        "estimated_seconds_saved": round(time_saved, 4),
+        "entries": len(cache),
+        "size_mb": round(cache.nbytes / 1024**2, 3)
+    }
+
 @log_stage("Feature Engineering")
 def run():
     """Creates domain-specific features and analyzes correlations."""
@@ -17,38 +83,38 @@ def run():
         logger.error(f"Validated data file not found at {VALIDATED_DATA_PATH}")
         return
 
-    df = pd.read_csv(VALIDATED_DATA_PATH)
+    with trace_span("load_validated"):
+        df = read_frame(VALIDATED_DATA_PATH)
     logger.info(f"Input data shape: {df.shape}")
 
-    # 1. speed_feed_ratio
-    logger.info("Creating speed_feed_ratio = spindle_speed / (feed_rate + 1e-6)")
-    df["speed_feed_ratio"] = df["spindle_speed"] / (df["feed_rate"] + 1e-6)
-
-    # 2. vibration_temp_interaction
-    logger.info("Creating vibration_temp_interaction = vibration * temperature / 1000")
-    df["vibration_temp_interaction"] = df["vibration"] * df["temperature"] / 1000
-
-    # 3. tool_wear_severity
-    logger.info("Creating tool_wear_severity = tool_wear^2 * vibration")
-    df["tool_wear_severity"] = (df["tool_wear"] ** 2) * df["vibration"]
-
-    # 4. cutting_energy_proxy
-    logger.info("Creating cutting_energy_proxy = spindle_speed * feed_rate * depth_of_cut / 1e6")
-    df["cutting_energy_proxy"] = (df["spindle_speed"] * df["feed_rate"] * df["depth_of_cut"]) / 1e6
+    cache_stats = add_engineered_features(df)
+    if cache_stats:
+        log_dict_table(logger, {
+            "Rows": f"{cache_stats['rows']:,}",
+            "Cache Hits": f"{cache_stats['hits']:,} ({cache_stats['hit_rate']:.1%})",
+            "Computed": f"{cache_stats['computed']:,} in {cache_stats['compute_seconds']:.3f}s",
+            "Estimated Time Saved": f"{cache_stats['estimated_seconds_saved']:.3f}s",
+            "Cache Entries": f"{cache_stats['entries']:,} ({cache_stats['size_mb']:.2f} MB)"
+        }, "Feature Cache")
 
-    # 5. thermal_stress_index
-    logger.info("Creating thermal_stress_index = ((temperature - 200) / 100 * depth_of_cut).clip(0)")
-    df["thermal_stress_index"] = (((df["temperature"] - 200) / 100) * df["depth_of_cut"]).clip(0)
+    # Feature/target moments, accumulated chunk by chunk
+    with trace_span("feature_moments", rows=len(df)):
+        moments = MomentsAccumulator(ENGINEERED_FEATURES + ["quality"])
+        for start in range(0, len(df), STATS_CHUNK_ROWS):
+            chunk = df[moments.columns].iloc[start:start + STATS_CHUNK_ROWS]
+            moments.update(chunk.to_numpy(dtype=np.float64))
 
     # Feature Statistics
-    feat_stats = df[ENGINEERED_FEATURES].describe().T[["mean", "std", "min", "max"]].to_dict("index")
+    feat_stats = moments.summary()
+    del feat_stats["quality"]
     stats_table = {k: f"Mean: {v['mean']:.2f}, Std: {v['std']:.2f}, Range: [{v['min']:.2f}, {v['max']:.2f}]" 
                    for k, v in feat_stats.items()}
     log_dict_table(logger, stats_table, "Engineered Feature Statistics")
 
     # Correlation Analysis
     logger.info("Calculating feature-target correlations...")
-    correlations = df[ENGINEERED_FEATURES + ["quality"]].corr()["quality"].drop("quality").abs().sort_values(ascending=False)
+    quality_corr = moments.correlation()[-1, :-1]
+    correlations = pd.Series(np.abs(quality_corr), index=ENGINEERED_FEATURES).sort_values(ascending=False)
     
     corr_table = {}
     for feat, val in correlations.items():
@@ -58,8 +124,10 @@ def run():
 
     # Final Logging
     log_dataframe_summary(logger, df, "Features Ready for Training")
-    df.to_csv(FEATURES_PATH, index=False)
+    with trace_span("write_features", rows=len(df)):
+        write_frame(df, FEATURES_PATH)
     logger.info(f"Features saved to {FEATURES_PATH} ({FEATURES_PATH.stat().st_size / 1024:.2f} KB)")
+    storage_stats = report_storage(logger, FEATURES_PATH)
 
     # Update metadata
     metadata = {
@@ -67,6 +135,8 @@ def run():
             "total_features": len(df.columns),
             "engineered_features": ENGINEERED_FEATURES,
             "top_correlations": correlations.to_dict(),
+            "feature_cache": cache_stats,
+            "storage": storage_stats,
             "timestamp": pd.Timestamp.now().isoformat()
         }
     }
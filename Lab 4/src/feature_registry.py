@@ -0,0 +1,127 @@
+import ast
+import hashlib
+import numpy as np
+import pandas as pd
+
+# Rows evaluated per step; every intermediate lives in a scratch buffer of this size
+CHUNK_ROWS = 16384
+
+BINARY_OPERATORS = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply,
+                    ast.Div: np.divide, ast.Pow: np.power}
+UNARY_OPERATORS = {ast.USub: np.negative}
+FUNCTIONS = {"maximum": np.maximum, "minimum": np.minimum, "abs": np.absolute,
+             "sqrt": np.sqrt, "exp": np.exp, "log1p": np.log1p}
+
+def _fill(value, out):
+    out[...] = value
+
+class FeaturePlan:
+    """
+    Evaluation plan compiled from feature expressions.
+
+    ``ops`` is a straight-line program over registers: the input columns, then
+    chunk-sized scratch buffers for intermediates. Subexpressions shared between
+    features are computed once, and each feature's last operation writes straight
+    into its output column, so a whole batch is one pass over row chunks with no
+    full-length temporaries. A single request runs the same program on one row.
+    """
+
+    def __init__(self, definitions, inputs, ops, n_scratch):
+        self.definitions = dict(definitions)
+        self.inputs = list(inputs)
+        self.outputs = list(self.definitions)
+        self.ops = ops
+        self.n_scratch = n_scratch
+        self.version = hashlib.sha256(repr((self.inputs, list(self.definitions.items()))).encode("utf-8")).hexdigest()[:16]
+
+    def evaluate_columns(self, columns, chunk_rows=CHUNK_ROWS):
+        """Evaluates every feature over equal-length input columns; returns a (features x rows) array."""
+        columns = [np.ascontiguousarray(column, dtype=np.float64) for column in columns]
+        n_rows = len(columns[0]) if columns else 0
+        out = np.empty((len(self.outputs), n_rows))
+        scratch = [np.empty(min(chunk_rows, n_rows)) for _ in range(self.n_scratch)]
+        for start in range(0, n_rows, chunk_rows):
+            stop = min(start + chunk_rows, n_rows)
+            registers = [column[start:stop] for column in columns] + [buf[:stop - start] for buf in scratch]
+            targets = out[:, start:stop]
+            for func, args, dest in self.ops:
+                values = [registers[a] if kind == "reg" else a for kind, a in args]
+                func(*values, out=registers[dest[1]] if dest[0] == "reg" else targets[dest[1]])
+        return out
+
+    def evaluate_frame(self, df):
+        """Batch evaluation: returns a DataFrame of the features, indexed like ``df``."""
+        out = self.evaluate_columns([df[name].to_numpy() for name in self.inputs])
+        # out.T is a column-major view, which pandas stores as one block without copying
+        return pd.DataFrame(out.T, columns=self.outputs, index=df.index, copy=False)
+
+    def evaluate_one(self, record):
+        """Single-request evaluation from a mapping of input name to value."""
+        out = self.evaluate_columns([np.array([record[name]], dtype=np.float64) for name in self.inputs])
+        return {name: float(out[i, 0]) for i, name in enumerate(self.outputs)}
+
+class _Compiler:
+    def __init__(self, inputs):
+        self.registers = {name: ("reg", i) for i, name in enumerate(inputs)}
+        self.n_inputs = len(inputs)
+        self.n_scratch = 0
+        self.ops = []
+        self.memo = {}
+
+    def operand(self, node, feature):
+        if isinstance(node, ast.Name):
+            if node.id not in self.registers:
+                raise ValueError(f"Feature '{feature}' uses unknown input '{node.id}'")
+            return self.registers[node.id]
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            return ("const", float(node.value))
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+            func = BINARY_OPERATORS[type(node.op)]
+            args = [self.operand(node.left, feature), self.operand(node.right, feature)]
+            if func is np.power and args[1] == ("const", 2.0):
+                func, args = np.square, args[:1]
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+            func, args = UNARY_OPERATORS[type(node.op)], [self.operand(node.operand, feature)]
+        elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+              and node.func.id in FUNCTIONS and not node.keywords):
+            func, args = FUNCTIONS[node.func.id], [self.operand(arg, feature) for arg in node.args]
+        else:
+            raise ValueError(f"Unsupported syntax in feature '{feature}': {ast.dump(node)}")
+
+        if len(args) != func.nin:
+            raise ValueError(f"'{func.__name__}' takes {func.nin} argument(s) in feature '{feature}'")
+        if all(kind == "const" for kind, _ in args):
+            return ("const", float(func(*[value for _, value in args])))
+        key = (func.__name__, tuple(args))
+        if key not in self.memo:
+            self.memo[key] = ("reg", self.n_inputs + self.n_scratch)
+            self.n_scratch += 1
+            self.ops.append((func, args, self.memo[key]))
+        return self.memo[key]
+
+    def compile(self, definitions):
+        roots = [self.operand(ast.parse(expression, mode="eval").body, name)
+                 for name, expression in definitions.items()]
+        # Retarget each feature's final op to its output column unless another feature reuses the value
+        uses = {}
+        for _, args, _ in self.ops:
+            for arg in args:
+                uses[arg] = uses.get(arg, 0) + 1
+        for root in roots:
+            uses[root] = uses.get(root, 0) + 1
+        ops = list(self.ops)
+        for i, root in enumerate(roots):
+            if root[0] == "const":
+                ops.append((_fill, [root], ("out", i)))
+            elif root[1] >= self.n_inputs and uses[root] == 1:
+                index = next(j for j, op in enumerate(ops) if op[2] == root)
+                ops[index] = (ops[index][0], ops[index][1], ("out", i))
+            else:
+                ops.append((np.positive, [root], ("out", i)))
+        return ops
+
+def compile_features(definitions, inputs):
+    """Compiles {feature: expression over ``inputs``} into a FeaturePlan."""
+    compiler = _Compiler(inputs)
+    ops = compiler.compile(definitions)
+    return FeaturePlan(definitions, inputs, ops, compiler.n_scratch)
@@ -1,11 +1,10 @@
 import os
 import json
-import mlflow
 from datetime import datetime
 from src.utils import (
-    get_logger, log_stage, log_dict_table,
+    get_logger, log_stage, log_dict_table, trace_span,
     DATA_DIR, MLFLOW_EXPERIMENT_NAME, MLFLOW_TRACKING_URI,
-    MLFLOW_REGISTRY_MODEL, save_metadata
+    MLFLOW_REGISTRY_MODEL, save_metadata, export_metadata_json
 )
 
 logger = get_logger(__name__)
@@ -85,13 +84,16 @@ def run_register():
     model_name = champion["model_name"]
     metrics = champion["metrics"]
 
+    # Imported here so the DAG file and the other tasks do not load MLflow
+    import mlflow
     mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
     
     logger.info(f"Registering {model_name} (Run ID: {run_id}) as '{MLFLOW_REGISTRY_MODEL}'...")
     
     # Register model
     model_uri = f"runs:/{run_id}/model"
-    mv = mlflow.register_model(model_uri, MLFLOW_REGISTRY_MODEL)
+    with trace_span("register_model", model=model_name):
+        mv = mlflow.register_model(model_uri, MLFLOW_REGISTRY_MODEL)
     
     # Update description and tags
     client = mlflow.tracking.MlflowClient()
@@ -120,6 +122,8 @@ def run_register():
         "registered_model_name": MLFLOW_REGISTRY_MODEL,
         "registered_version": mv.version
     })
+    # Readable snapshot of the metadata store for the end of the run
+    logger.info(f"Metadata snapshot written to {export_metadata_json()}")
 
 if __name__ == "__main__":
     import sys
@@ -1,110 +1,72 @@
-import os
 import json
 import time
 import warnings
 import numpy as np
-import pandas as pd
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-import mlflow
-import mlflow.sklearn
-import mlflow.xgboost
-import mlflow.lightgbm
-
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
+
 from sklearn.metrics import (
     accuracy_score, f1_score, precision_score, recall_score,
-    confusion_matrix, classification_report
+    classification_report
 )
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.neural_network import MLPClassifier
 
 from src.utils import (
-    get_logger, log_stage, log_dataframe_summary, log_dict_table,
-    FEATURES_PATH, MODEL_CONFIGS, MLFLOW_EXPERIMENT_NAME, 
-    MLFLOW_TRACKING_URI, QUALITY_CLASSES, DATA_DIR
+    get_logger, log_stage, log_dict_table, trace_span,
+    MODEL_CONFIGS, MLFLOW_EXPERIMENT_NAME, 
+    MLFLOW_TRACKING_URI, QUALITY_CLASSES, DATA_DIR,
+    MLFLOW_BATCH_LOGGING, MLFLOW_ARTIFACT_WORKERS,
+    TRAINING_CPU_BUDGET, TRAINING_CONCURRENCY, CPU_BUDGETING
 )
+from src.training_data import load_training_data
+from src.cpu_budget import CpuBudget
 
 warnings.filterwarnings("ignore")
 logger = get_logger(__name__)
 
-def plot_confusion_matrix(y_true, y_pred, model_name, save_path):
-    """Generates and saves a confusion matrix heatmap."""
-    cm = confusion_matrix(y_true, y_pred)
-    plt.figure(figsize=(8, 6))
-    sns.heatmap(cm, annot=True, fmt="d", cmap="RdYlGn_r", 
-                xticklabels=QUALITY_CLASSES, yticklabels=QUALITY_CLASSES)
-    plt.title(f"Confusion Matrix: {model_name}")
-    plt.xlabel("Predicted")
-    plt.ylabel("Actual")
-    plt.tight_layout()
-    plt.savefig(save_path)
-    plt.close()
-
-def plot_feature_importance(model, feature_names, model_name, save_path):
-    """Generates and saves a feature importance bar chart."""
-    if hasattr(model, "feature_importances_"):
-        importances = model.feature_importances_
-        indices = np.argsort(importances)[::-1]
-        
-        plt.figure(figsize=(10, 6))
-        plt.title(f"Feature Importance: {model_name}")
-        plt.barh(range(len(importances)), importances[indices], align="center")
-        plt.yticks(range(len(importances)), [feature_names[i] for i in indices])
-        plt.xlabel("Relative Importance")
-        plt.tight_layout()
-        plt.savefig(save_path)
-        plt.close()
-        return dict(zip(feature_names, importances.tolist()))
-    return None
-
 @log_stage("Model Training")
 def run(model_name):
     """Trains a specific model with full MLflow tracking."""
-    if not FEATURES_PATH.exists():
-        logger.error(f"Features file not found at {FEATURES_PATH}")
+    # Split and scaled once by the prepare_training_data task; mapped read-only and shared between trainers
+    with trace_span("load_training_data", model=model_name):
+        prepared = load_training_data()
+    if prepared is None:
+        logger.error("Prepared training data not found; run the prepare_training_data task first")
         return
+    X_train_scaled, X_test_scaled, y_train, y_test, manifest = prepared
+    feature_names = manifest["feature_names"]
 
-    df = pd.read_csv(FEATURES_PATH)
-    X = df.drop(columns=["quality", "timestamp", "machine_id"], errors="ignore")
-    y = df["quality"]
-    feature_names = X.columns.tolist()
-
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
-    
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
+    # MLflow (through run_logger) and the model libraries are imported here rather than
+    # at module load, so parsing the DAG file or running another task does not pay for them
+    with trace_span("import_run_logger", model=model_name):
+        from src.run_logger import BatchedRunLogger
 
     logger.info(f"Training {model_name}...")
-    logger.info(f"Train size: {X_train.shape}, Test size: {X_test.shape}")
+    logger.info(f"Train size: {X_train_scaled.shape}, Test size: {X_test_scaled.shape}")
     
-    mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
-    try:
-        mlflow.set_experiment(MLFLOW_EXPERIMENT_NAME)
-    except Exception as e:
-        logger.warning(f"Experiment setup race condition: {e}. Retrying...")
-        time.sleep(random.random() * 3)
-        mlflow.set_experiment(MLFLOW_EXPERIMENT_NAME)
-
-    with mlflow.start_run(run_name=f"{model_name}_run") as run:
+    # Tags, params and metrics are sent in batches and artifacts upload in the background;
+    # everything is flushed before the run is closed
+    run_logger = BatchedRunLogger(MLFLOW_TRACKING_URI, MLFLOW_EXPERIMENT_NAME, f"{model_name}_run",
+                                  batched=MLFLOW_BATCH_LOGGING, artifact_workers=MLFLOW_ARTIFACT_WORKERS)
+    with trace_span("mlflow_setup", model=model_name):
+        run_logger.start()
+    with run_logger as run:
         # Tags
-        mlflow.set_tag("model_type", model_name)
-        mlflow.set_tag("pipeline_stage", "training")
-        mlflow.set_tag("author", "Ajith Srikanth")
-        mlflow.set_tag("domain", "Manufacturing")
+        run.set_tags({
+            "model_type": model_name,
+            "pipeline_stage": "training",
+            "author": "Ajith Srikanth",
+            "domain": "Manufacturing"
+        })
 
         # Config & Params
-        config = MODEL_CONFIGS.get(model_name, {})
-        mlflow.log_params(config)
+        # Each trainer gets its share of the worker's cores instead of all of them
+        slot = list(MODEL_CONFIGS).index(model_name) if model_name in MODEL_CONFIGS else 0
+        budget = CpuBudget(TRAINING_CONCURRENCY, slot=slot, total=TRAINING_CPU_BUDGET, enabled=CPU_BUDGETING)
+        config = {**MODEL_CONFIGS.get(model_name, {}), **budget.estimator_params(model_name)}
+        run.log_params(config)
 
         # Model instantiation
         start_train = time.time()
         if model_name == "RandomForest":
+            from sklearn.ensemble import RandomForestClassifier
             model = RandomForestClassifier(**config)
         elif model_name == "XGBoost":
             import xgboost as xgb
@@ -113,16 +75,22 @@ def run(model_name):
             import lightgbm as lgb
             model = lgb.LGBMClassifier(**config)
         elif model_name == "NeuralNet":
+            from sklearn.neural_network import MLPClassifier
             model = MLPClassifier(**config)
         else:
             raise ValueError(f"Unknown model name: {model_name}")
 
-        # Train
-        model.fit(X_train_scaled, y_train)
-        train_time = time.time() - start_train
-        
-        # Predict
-        y_pred = model.predict(X_test_scaled)
+        # Train and predict with BLAS/OpenMP capped at the task's quota
+        with budget.limit():
+            parallelism = budget.report(model_threads=config.get("n_jobs"))
+            log_dict_table(logger, parallelism, f"{model_name} CPU Budget")
+            with trace_span("fit", model=model_name, rows=len(X_train_scaled), threads=budget.cores):
+                model.fit(X_train_scaled, y_train)
+            train_time = time.time() - start_train
+
+            with trace_span("predict", model=model_name, rows=len(X_test_scaled)):
+                y_pred = model.predict(X_test_scaled)
+        run.log_params({f"parallelism.{key}": value for key, value in parallelism.items() if key != "model_threads"})
         
         # Metrics
         metrics = {
@@ -139,7 +107,7 @@ def run(model_name):
         for i, f1 in enumerate(f1_per_class):
             metrics[f"f1_class_{i}"] = f1
             
-        mlflow.log_metrics(metrics)
+        run.log_metrics(metrics)
         log_dict_table(logger, metrics, f"{model_name} Metrics")
 
         # Artifacts
@@ -148,44 +116,66 @@ def run(model_name):
         report_path = DATA_DIR / f"{model_name}_report.txt"
         with open(report_path, "w") as f:
             f.write(report)
-        mlflow.log_artifact(str(report_path))
+        run.log_artifact(report_path)
 
-        # 2. Confusion Matrix
-        cm_path = DATA_DIR / f"{model_name}_cm.png"
-        plot_confusion_matrix(y_test, y_pred, model_name, str(cm_path))
-        mlflow.log_artifact(str(cm_path))
+        # 2. Predictions for the render_reports task, which draws the confusion matrix
+        # and feature importance plots off the training critical path
+        importances = getattr(model, "feature_importances_", None)
+        predictions_path = DATA_DIR / f"{model_name}_predictions.npz"
+        with trace_span("save_predictions", model=model_name):
+            np.savez(predictions_path, y_test=np.asarray(y_test), y_pred=np.asarray(y_pred),
+                     feature_names=np.array(feature_names),
+                     importances=np.asarray(importances if importances is not None else [], dtype=np.float64))
 
         # 3. Feature Importance
-        fi_path = DATA_DIR / f"{model_name}_fi.png"
-        fi_data = plot_feature_importance(model, feature_names, model_name, str(fi_path))
-        if fi_data:
-            mlflow.log_artifact(str(fi_path))
+        if importances is not None:
+            fi_data = dict(zip(feature_names, np.asarray(importances).tolist()))
             fi_json_path = DATA_DIR / f"{model_name}_fi.json"
             with open(fi_json_path, "w") as f:
                 json.dump(fi_data, f, indent=4)
-            mlflow.log_artifact(str(fi_json_path))
+            run.log_artifact(fi_json_path)
 
         # 4. Model
-        if model_name == "XGBoost":
-            mlflow.xgboost.log_model(model, "model")
-        elif model_name == "LightGBM":
-            mlflow.lightgbm.log_model(model, "model")
-        else:
-            mlflow.sklearn.log_model(model, "model")
-
-        logger.info(f"{model_name} training complete. Run ID: {run.info.run_id}")
-        
-        # Result dict for evaluator
-        result = {
-            "model_name": model_name,
-            "run_id": run.info.run_id,
-            "metrics": metrics
-        }
-        result_path = DATA_DIR / f"{model_name}_result.json"
-        with open(result_path, "w") as f:
-            json.dump(result, f, indent=4)
-        
-        return str(result_path)
+        with trace_span("log_model", model=model_name):
+            if model_name == "XGBoost":
+                import mlflow.xgboost
+                run.log_model(mlflow.xgboost, model, "model")
+            elif model_name == "LightGBM":
+                import mlflow.lightgbm
+                run.log_model(mlflow.lightgbm, model, "model")
+            else:
+                import mlflow.sklearn
+                run.log_model(mlflow.sklearn, model, "model")
+
+        with trace_span("mlflow_flush", model=model_name):
+            run.flush()
+            run.wait_for_artifacts()
+
+    tracking = run_logger.stats()
+    log_dict_table(logger, {
+        "Round Trips": tracking["round_trips"],
+        "Requests": ", ".join(f"{name}={count}" for name, count in tracking["calls"].items()),
+        "Logged": ", ".join(f"{kind}={count}" for kind, count in tracking["logged"].items()),
+        "Tracking Time": f"{tracking['tracking_seconds']:.3f}s",
+        "Batched": tracking["batched"]
+    }, f"{model_name} MLflow Tracking")
+    logger.info(f"{model_name} training complete. Run ID: {run.run_id}")
+
+    # Result dict for evaluator
+    result = {
+        "model_name": model_name,
+        "run_id": run.run_id,
+        "metrics": metrics,
+        "parallelism": parallelism,
+        "predictions": str(predictions_path),
+        "training_data": manifest["created_at"],
+        "tracking": tracking
+    }
+    result_path = DATA_DIR / f"{model_name}_result.json"
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=4)
+
+    return str(result_path)
 
 if __name__ == "__main__":
     import sys
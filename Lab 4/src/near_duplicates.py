@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+GRID_DIMENSIONS = 3
+# Rows whose candidate pairs are generated per batch (bounds memory on dense cells)
+PAIR_BATCH_ROWS = 200000
+_KEY_MULTIPLIERS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9], dtype=np.uint64)
+
+def _cell_keys(cells):
+    """Mixes integer grid coordinates into one uint64 key (collisions only add candidates)."""
+    keys = np.zeros(len(cells), dtype=np.uint64)
+    for d in range(cells.shape[1]):
+        keys ^= cells[:, d].astype(np.uint64) * _KEY_MULTIPLIERS[d]
+        keys = (keys << np.uint64(7)) | (keys >> np.uint64(57))
+    return keys
+
+def _half_neighbourhood(dims):
+    """Offsets in {-1, 0, 1}^dims that are lexicographically >= 0, so each cell pair is visited once."""
+    grid = np.array(np.meshgrid(*[[-1, 0, 1]] * dims, indexing="ij")).reshape(dims, -1).T
+    keep = [tuple(o) >= (0,) * dims for o in grid]
+    return grid[keep]
+
+def choose_grid_features(scaled, dims=GRID_DIMENSIONS):
+    """Picks the sensors whose tolerance-sized cells are most spread out (fewest rows per cell)."""
+    spread = [len(np.unique(np.floor(scaled[:, j]))) for j in range(scaled.shape[1])]
+    return list(np.argsort(spread)[::-1][:dims])
+
+def near_duplicate_pairs(sensors, tolerances):
+    """
+    Finds all pairs (i < j) with |sensors[i, f] - sensors[j, f]| <= tolerances[f] for every sensor f.
+
+    Values are divided by their tolerance and bucketed on a unit grid over the
+    most spread-out sensors; a matching pair always sits in the same or an adjacent
+    cell, so only those cells are compared and every candidate is verified on all
+    sensors. Cost is near-linear unless many rows share a cell.
+    """
+    sensors = np.asarray(sensors, dtype=np.float64)
+    scaled = sensors / np.asarray(tolerances, dtype=np.float64)
+    n_rows = len(scaled)
+    if n_rows < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    grid_features = choose_grid_features(scaled)
+    cells = np.floor(scaled[:, grid_features]).astype(np.int64)
+    keys = _cell_keys(cells)
+    order = np.argsort(keys, kind="stable")
+    cell_keys, cell_starts, cell_sizes = np.unique(keys[order], return_index=True, return_counts=True)
+    # Hash lookup of neighbour cells (most of them are empty)
+    cell_index = pd.Index(cell_keys)
+
+    firsts, seconds = [], []
+    for offset in _half_neighbourhood(len(grid_features)):
+        neighbour_keys = _cell_keys(cells + offset)
+        for start in range(0, n_rows, PAIR_BATCH_ROWS):
+            stop = min(start + PAIR_BATCH_ROWS, n_rows)
+            cells_found = cell_index.get_indexer(neighbour_keys[start:stop])
+            occupied = np.flatnonzero(cells_found >= 0)
+            lo = cell_starts[cells_found[occupied]]
+            counts = cell_sizes[cells_found[occupied]]
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            rows = np.repeat(start + occupied, counts)
+            within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            partners = order[np.repeat(lo, counts) + within]
+            candidate = rows != partners
+            if not offset.any():
+                candidate &= rows < partners
+            rows, partners = rows[candidate], partners[candidate]
+            match = np.all(np.abs(scaled[rows] - scaled[partners]) <= 1.0, axis=1)
+            rows, partners = rows[match], partners[match]
+            firsts.append(np.minimum(rows, partners))
+            seconds.append(np.maximum(rows, partners))
+
+    if not firsts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    pairs = np.unique(np.stack([np.concatenate(firsts), np.concatenate(seconds)], axis=1), axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+def near_duplicate_clusters(sensors, tolerances):
+    """
+    Groups near-duplicate readings into clusters (connected components of the pair graph).
+
+    Returns:
+        cluster_ids: per-row cluster id, -1 for rows without a near-duplicate.
+        representative: boolean mask, True for rows to keep (the first row of each
+            cluster and every unclustered row).
+        n_pairs: number of near-duplicate pairs found.
+    """
+    n_rows = len(sensors)
+    first, second = near_duplicate_pairs(sensors, tolerances)
+    cluster_ids = np.full(n_rows, -1, dtype=np.int64)
+    representative = np.ones(n_rows, dtype=bool)
+    if not len(first):
+        return cluster_ids, representative, 0
+
+    graph = coo_matrix((np.ones(len(first), dtype=np.int8), (first, second)), shape=(n_rows, n_rows))
+    _, components = connected_components(graph, directed=False)
+    clustered = np.zeros(n_rows, dtype=bool)
+    clustered[first] = True
+    clustered[second] = True
+    _, dense_ids = np.unique(components[clustered], return_inverse=True)
+    cluster_ids[clustered] = dense_ids
+
+    rows = np.flatnonzero(clustered)
+    _, first_in_cluster = np.unique(dense_ids, return_index=True)
+    representative[clustered] = False
+    representative[rows[first_in_cluster]] = True
+    return cluster_ids, representative, len(first)
@@ -0,0 +1,118 @@
+import json
+import time
+import numpy as np
+from src.utils import (
+    get_logger, log_stage, log_dict_table, trace_span,
+    MODEL_CONFIGS, MLFLOW_TRACKING_URI, QUALITY_CLASSES, DATA_DIR, save_metadata
+)
+from src.training_data import load_manifest
+
+logger = get_logger(__name__)
+
+def _pyplot():
+    """Imports pyplot on the headless backend (only the rendering task pays for it)."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+def plot_confusion_matrix(y_true, y_pred, model_name, save_path):
+    """Generates and saves a confusion matrix heatmap."""
+    import seaborn as sns
+    from sklearn.metrics import confusion_matrix
+    plt = _pyplot()
+    cm = confusion_matrix(y_true, y_pred)
+    plt.figure(figsize=(8, 6))
+    sns.heatmap(cm, annot=True, fmt="d", cmap="RdYlGn_r",
+                xticklabels=QUALITY_CLASSES, yticklabels=QUALITY_CLASSES)
+    plt.title(f"Confusion Matrix: {model_name}")
+    plt.xlabel("Predicted")
+    plt.ylabel("Actual")
+    plt.tight_layout()
+    plt.savefig(save_path)
+    plt.close()
+
+def plot_feature_importance(importances, feature_names, model_name, save_path):
+    """Generates and saves a feature importance bar chart."""
+    plt = _pyplot()
+    indices = np.argsort(importances)[::-1]
+    plt.figure(figsize=(10, 6))
+    plt.title(f"Feature Importance: {model_name}")
+    plt.barh(range(len(importances)), importances[indices], align="center")
+    plt.yticks(range(len(importances)), [feature_names[i] for i in indices])
+    plt.xlabel("Relative Importance")
+    plt.tight_layout()
+    plt.savefig(save_path)
+    plt.close()
+
+def render_model_report(model_name, result):
+    """Renders the plots of one trained model from its saved predictions; returns the PNG paths."""
+    with np.load(result["predictions"]) as saved:
+        y_test, y_pred = saved["y_test"], saved["y_pred"]
+        importances, feature_names = saved["importances"], saved["feature_names"].tolist()
+
+    paths = []
+    cm_path = DATA_DIR / f"{model_name}_cm.png"
+    with trace_span("plot_confusion_matrix", model=model_name):
+        plot_confusion_matrix(y_test, y_pred, model_name, str(cm_path))
+    paths.append(cm_path)
+
+    if len(importances):
+        fi_path = DATA_DIR / f"{model_name}_fi.png"
+        with trace_span("plot_feature_importance", model=model_name):
+            plot_feature_importance(importances, feature_names, model_name, str(fi_path))
+        paths.append(fi_path)
+    return paths
+
+@log_stage("Report Rendering")
+def run():
+    """
+    Renders each trained model's plots from the predictions its training task saved
+    and attaches them to the model's MLflow run. Runs after training, off the path
+    to evaluation and registration, and also when some trainers failed: only
+    results trained on this run's prepared data are rendered.
+    """
+    manifest = load_manifest()
+    if manifest is None:
+        logger.error("Prepared training data manifest not found; nothing to render.")
+        return
+    from mlflow.tracking import MlflowClient
+    client = MlflowClient(MLFLOW_TRACKING_URI)
+
+    rendered = {}
+    for model_name in MODEL_CONFIGS:
+        result_path = DATA_DIR / f"{model_name}_result.json"
+        if not result_path.exists():
+            logger.warning(f"Result file for {model_name} not found at {result_path}")
+            continue
+        with open(result_path) as f:
+            result = json.load(f)
+        if "predictions" not in result:
+            logger.warning(f"No saved predictions for {model_name}; skipping its report")
+            continue
+        if result.get("training_data") != manifest["created_at"]:
+            logger.warning(f"{result_path.name} was trained on earlier prepared data; skipping its report")
+            continue
+
+        start = time.perf_counter()
+        paths = render_model_report(model_name, result)
+        render_seconds = time.perf_counter() - start
+        for path in paths:
+            with trace_span("log_artifact", model=model_name, artifact=path.name):
+                client.log_artifact(result["run_id"], str(path))
+        rendered[model_name] = {
+            "plots": [path.name for path in paths],
+            "render_seconds": round(render_seconds, 3),
+            "total_seconds": round(time.perf_counter() - start, 3)
+        }
+
+    if not rendered:
+        logger.error("No model results found to render.")
+        return
+    log_dict_table(logger, {name: f"{stats['render_seconds']:.2f}s render, {stats['total_seconds']:.2f}s with upload "
+                                  f"({', '.join(stats['plots'])})" for name, stats in rendered.items()},
+                   "Rendered Reports")
+    save_metadata({"report_rendering": rendered})
+
+if __name__ == "__main__":
+    run()
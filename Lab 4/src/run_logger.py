@@ -0,0 +1,225 @@
+import os
+import fcntl
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+import mlflow
+from mlflow.entities import Metric, Param, RunTag
+from mlflow.exceptions import MlflowException
+from mlflow.tracking import MlflowClient
+
+# Entity limits of one log_batch request
+MAX_METRICS_PER_BATCH = 1000
+MAX_PARAMS_PER_BATCH = 100
+MAX_TAGS_PER_BATCH = 100
+MAX_ENTITIES_PER_BATCH = 1000
+EXPERIMENT_LOCK_FILE = ".experiment_create.lock"
+
+@contextmanager
+def _experiment_creation_lock(tracking_uri):
+    """
+    Serializes experiment creation between processes on a local file store, which
+    (unlike a database store) does not reject a second experiment with the same name.
+    """
+    parsed = urlparse(tracking_uri)
+    if parsed.scheme not in ("", "file"):
+        yield
+        return
+    os.makedirs(parsed.path, exist_ok=True)
+    with open(os.path.join(parsed.path, EXPERIMENT_LOCK_FILE), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+class BatchedRunLogger:
+    """
+    One MLflow run whose tags, params and metrics are buffered and sent with
+    ``log_batch`` on ``flush()`` and when the run closes, while artifact files
+    upload on background threads that are drained before the run ends.
+
+    Every request to the tracking server is counted, so ``stats()`` reports the
+    round trips a run cost. With ``batched=False`` each call goes straight to
+    the server, as the fluent API does. Use it as a context manager; the run is
+    also the active fluent run, so ``mlflow.<flavor>.log_model`` works inside it.
+    """
+
+    def __init__(self, tracking_uri, experiment_name, run_name, batched=True, artifact_workers=2):
+        self.tracking_uri = tracking_uri
+        self.experiment_name = experiment_name
+        self.run_name = run_name
+        self.batched = batched
+        self.artifact_workers = artifact_workers if batched else 0
+        self.client = MlflowClient(tracking_uri)
+        self.run = None
+        self.calls = {}
+        self.tracking_seconds = 0.0
+        self.logged = {"tags": 0, "params": 0, "metrics": 0, "artifacts": 0}
+        self._tags, self._params, self._metrics = {}, {}, []
+        self._lock = threading.Lock()
+        self._artifacts = queue.Queue()
+        self._artifact_errors = []
+        self._threads = []
+
+    @property
+    def run_id(self):
+        return self.run.info.run_id
+
+    def artifact_uri(self, artifact_path=None):
+        """Artifact URI of the run (or of ``artifact_path`` inside it), without a server request."""
+        root = self.run.info.artifact_uri
+        return f"{root}/{artifact_path}" if artifact_path else root
+
+    def _call(self, name, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.calls[name] = self.calls.get(name, 0) + 1
+                self.tracking_seconds += time.perf_counter() - start
+
+    def ensure_experiment(self):
+        """
+        Returns the experiment id, creating (or restoring) the experiment if needed.
+
+        Safe for parallel tasks: when another task creates the experiment first,
+        the failed create is followed by a lookup instead of a sleep and retry.
+        """
+        experiment = self._call("get_experiment_by_name", self.client.get_experiment_by_name, self.experiment_name)
+        if experiment is None:
+            with _experiment_creation_lock(self.tracking_uri):
+                try:
+                    return self._call("create_experiment", self.client.create_experiment, self.experiment_name)
+                except MlflowException:
+                    experiment = self._call("get_experiment_by_name", self.client.get_experiment_by_name,
+                                            self.experiment_name)
+                    if experiment is None:
+                        raise
+        if experiment.lifecycle_stage == "deleted":
+            self._call("restore_experiment", self.client.restore_experiment, experiment.experiment_id)
+        return experiment.experiment_id
+
+    def start(self):
+        """Creates the run (once) and starts the artifact upload threads."""
+        if self.run is not None:
+            return self
+        mlflow.set_tracking_uri(self.tracking_uri)
+        experiment_id = self.ensure_experiment()
+        self.run = self._call("create_run", mlflow.start_run, experiment_id=experiment_id, run_name=self.run_name)
+        for _ in range(self.artifact_workers):
+            thread = threading.Thread(target=self._upload_artifacts, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.flush()
+            self.wait_for_artifacts()
+        finally:
+            self._call("update_run", mlflow.end_run, "FAILED" if exc_type else "FINISHED")
+        if self._artifact_errors and exc_type is None:
+            raise self._artifact_errors[0]
+        return False
+
+    def set_tag(self, key, value):
+        self.set_tags({key: value})
+
+    def set_tags(self, tags):
+        tags = {key: str(value) for key, value in tags.items()}
+        self.logged["tags"] += len(tags)
+        if self.batched:
+            self._tags.update(tags)
+        else:
+            self._send([], [], [RunTag(key, value) for key, value in tags.items()])
+
+    def log_param(self, key, value):
+        self.log_params({key: value})
+
+    def log_params(self, params):
+        params = {key: str(value) for key, value in params.items()}
+        self.logged["params"] += len(params)
+        if self.batched:
+            self._params.update(params)
+        else:
+            self._send([], [Param(key, value) for key, value in params.items()], [])
+
+    def log_metric(self, key, value, step=None):
+        self.log_metrics({key: value}, step=step)
+
+    def log_metrics(self, metrics, step=None):
+        timestamp = int(time.time() * 1000)
+        entries = [Metric(key, float(value), timestamp, step or 0) for key, value in metrics.items()]
+        self.logged["metrics"] += len(entries)
+        if self.batched:
+            self._metrics.extend(entries)
+        else:
+            self._send(entries, [], [])
+
+    def log_artifact(self, local_path, artifact_path=None):
+        """Queues a file for upload (uploads immediately when not batched or after wait_for_artifacts)."""
+        self.logged["artifacts"] += 1
+        if self._threads:
+            self._artifacts.put((str(local_path), artifact_path))
+        else:
+            self._call("log_artifact", self.client.log_artifact, self.run_id, str(local_path), artifact_path)
+
+    def log_model(self, flavor, model, artifact_path="model", **kwargs):
+        """Logs ``model`` with an MLflow flavor module (e.g. mlflow.sklearn) into this run."""
+        return self._call("log_model", flavor.log_model, model, artifact_path, **kwargs)
+
+    def flush(self):
+        """Sends the buffered tags, params and metrics in as few log_batch requests as the limits allow."""
+        metrics, params, tags = self._metrics, list(self._params.items()), list(self._tags.items())
+        self._metrics, self._params, self._tags = [], {}, {}
+        metrics_start = params_start = tags_start = 0
+        while metrics_start < len(metrics) or params_start < len(params) or tags_start < len(tags):
+            tag_batch = tags[tags_start:tags_start + MAX_TAGS_PER_BATCH]
+            param_batch = params[params_start:params_start + min(MAX_PARAMS_PER_BATCH, MAX_ENTITIES_PER_BATCH - len(tag_batch))]
+            room = MAX_ENTITIES_PER_BATCH - len(tag_batch) - len(param_batch)
+            metric_batch = metrics[metrics_start:metrics_start + min(MAX_METRICS_PER_BATCH, room)]
+            self._send(metric_batch, [Param(key, value) for key, value in param_batch],
+                       [RunTag(key, value) for key, value in tag_batch])
+            tags_start += len(tag_batch)
+            params_start += len(param_batch)
+            metrics_start += len(metric_batch)
+
+    def _send(self, metrics, params, tags):
+        self._call("log_batch", self.client.log_batch, self.run_id, metrics=metrics, params=params, tags=tags)
+
+    def _upload_artifacts(self):
+        while True:
+            item = self._artifacts.get()
+            try:
+                if item is None:
+                    return
+                self._call("log_artifact", self.client.log_artifact, self.run_id, *item)
+            except Exception as e:
+                self._artifact_errors.append(e)
+            finally:
+                self._artifacts.task_done()
+
+    def wait_for_artifacts(self):
+        """Blocks until every queued artifact is uploaded; later artifacts upload synchronously."""
+        for _ in self._threads:
+            self._artifacts.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def stats(self):
+        """Round trips to the tracking server by request type, and what they carried."""
+        return {
+            "batched": self.batched,
+            "round_trips": sum(self.calls.values()),
+            "calls": dict(sorted(self.calls.items())),
+            "logged": dict(self.logged),
+            "tracking_seconds": round(self.tracking_seconds, 3)
+        }
@@ -0,0 +1,73 @@
+import numpy as np
+
+class MomentsAccumulator:
+    """
+    Streaming count, mean, co-moment matrix, min and max over a fixed set of columns.
+
+    Chunks are folded in with the pairwise update of Chan et al., so accumulators
+    built over separate chunks or worker processes merge into exactly the moments
+    of the combined data, without the cancellation of a sum / sum-of-squares.
+    Rows containing NaN are skipped.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.count = 0
+        self.mean = np.zeros(k)
+        self.comoment = np.zeros((k, k))
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+
+    def update(self, values):
+        """Adds a (rows x columns) chunk."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values).any(axis=1)]
+        if not len(values):
+            return self
+        chunk = MomentsAccumulator(self.columns)
+        chunk.count = len(values)
+        chunk.mean = values.mean(axis=0)
+        centered = values - chunk.mean
+        chunk.comoment = centered.T @ centered
+        chunk.min = values.min(axis=0)
+        chunk.max = values.max(axis=0)
+        return self.merge(chunk)
+
+    def merge(self, other):
+        """Folds another accumulator over the same columns into this one."""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.comoment = other.count, other.mean.copy(), other.comoment.copy()
+            self.min, self.max = other.min.copy(), other.max.copy()
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.comoment = self.comoment + other.comoment + np.outer(delta, delta) * (self.count * other.count / total)
+        self.mean = self.mean + delta * (other.count / total)
+        self.count = total
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        return self
+
+    def covariance(self, ddof=1):
+        if self.count <= ddof:
+            return np.full_like(self.comoment, np.nan)
+        return self.comoment / (self.count - ddof)
+
+    def std(self, ddof=1):
+        return np.sqrt(np.diag(self.covariance(ddof)))
+
+    def correlation(self):
+        """Pearson correlation matrix; NaN for constant columns (as in DataFrame.corr)."""
+        scale = np.sqrt(np.diag(self.comoment))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = self.comoment / np.outer(scale, scale)
+        return np.clip(corr, -1.0, 1.0)
+
+    def summary(self):
+        """Per-column mean, std, min and max, as DataFrame.describe() reports them."""
+        std = self.std()
+        return {column: {"mean": self.mean[i], "std": std[i], "min": self.min[i], "max": self.max[i]}
+                for i, column in enumerate(self.columns)}
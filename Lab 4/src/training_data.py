@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+from src.utils import (
+    get_logger, log_stage, log_dict_table, trace_span,
+    FEATURES_PATH, TRAINING_DATA_DIR, SENSOR_FEATURES, ENGINEERED_FEATURES,
+    TRAIN_TEST_SPLIT_SEED, TEST_SIZE, save_metadata
+)
+from src.data_io import read_frame
+
+logger = get_logger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+SCALER_FILE = "scaler.joblib"
+ARRAY_NAMES = ["X_train", "X_test", "y_train", "y_test"]
+
+def _save_array(name, array):
+    """Writes ``name``.npy atomically (readers never see a partial file)."""
+    path = TRAINING_DATA_DIR / f"{name}.npy"
+    tmp_path = TRAINING_DATA_DIR / f"{name}.tmp.npy"
+    np.save(tmp_path, np.ascontiguousarray(array))
+    os.replace(tmp_path, path)
+    return {"file": path.name, "shape": list(array.shape), "dtype": str(array.dtype)}
+
+@log_stage("Training Data Preparation")
+def run():
+    """
+    Splits and scales the engineered features once for every trainer.
+
+    X_train/X_test (scaled) and y_train/y_test are saved as .npy files that the
+    parallel training tasks memory-map read-only, so they share one copy in the
+    page cache. The manifest, written last, records the split and the scaler.
+    """
+    if not FEATURES_PATH.exists():
+        logger.error(f"Features file not found at {FEATURES_PATH}")
+        return
+
+    feature_names = SENSOR_FEATURES + ENGINEERED_FEATURES
+    with trace_span("load_features"):
+        df = read_frame(FEATURES_PATH, columns=feature_names + ["quality"])
+    X = df[feature_names].to_numpy()
+    y = df["quality"].to_numpy()
+
+    with trace_span("split"):
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=TEST_SIZE, stratify=y, random_state=TRAIN_TEST_SPLIT_SEED
+        )
+
+    with trace_span("scale"):
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
+        X_test_scaled = scaler.transform(X_test)
+
+    TRAINING_DATA_DIR.mkdir(parents=True, exist_ok=True)
+    manifest_path = TRAINING_DATA_DIR / MANIFEST_FILE
+    if manifest_path.exists():
+        manifest_path.unlink()
+    with trace_span("write_arrays", rows=len(X)):
+        arrays = {
+            "X_train": _save_array("X_train", X_train_scaled),
+            "X_test": _save_array("X_test", X_test_scaled),
+            "y_train": _save_array("y_train", y_train),
+            "y_test": _save_array("y_test", y_test)
+        }
+        joblib.dump(scaler, TRAINING_DATA_DIR / SCALER_FILE)
+
+    manifest = {
+        "source": str(FEATURES_PATH),
+        "source_mtime": FEATURES_PATH.stat().st_mtime,
+        "rows": len(X),
+        "feature_names": feature_names,
+        "split": {"test_size": TEST_SIZE, "random_state": TRAIN_TEST_SPLIT_SEED, "stratify": "quality"},
+        "scaler": {
+            "type": "StandardScaler",
+            "file": SCALER_FILE,
+            "mean": scaler.mean_.tolist(),
+            "scale": scaler.scale_.tolist()
+        },
+        "arrays": arrays,
+        "created_at": pd.Timestamp.now().isoformat()
+    }
+    tmp_manifest = TRAINING_DATA_DIR / f"{MANIFEST_FILE}.tmp"
+    with open(tmp_manifest, "w") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(tmp_manifest, manifest_path)
+
+    total_mb = sum(os.path.getsize(TRAINING_DATA_DIR / a["file"]) for a in arrays.values()) / 1024**2
+    log_dict_table(logger, {
+        "Train": f"{X_train_scaled.shape} {X_train_scaled.dtype}",
+        "Test": f"{X_test_scaled.shape} {X_test_scaled.dtype}",
+        "Split": f"test_size={TEST_SIZE}, random_state={TRAIN_TEST_SPLIT_SEED}, stratified",
+        "Size on Disk": f"{total_mb:.2f} MB"
+    }, "Prepared Training Data")
+    logger.info(f"Training data saved to {TRAINING_DATA_DIR}")
+
+    save_metadata({
+        "training_data_stats": {
+            "rows": len(X),
+            "train_rows": len(X_train_scaled),
+            "test_rows": len(X_test_scaled),
+            "size_mb": round(total_mb, 3),
+            "manifest": str(manifest_path)
+        }
+    })
+
+def load_manifest():
+    """Returns the prepared-data manifest, or None when the prepare stage has not run."""
+    manifest_path = TRAINING_DATA_DIR / MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def load_training_data():
+    """
+    Maps the prepared arrays read-only. Returns (X_train, X_test, y_train, y_test, manifest),
+    or None when the prepare stage has not run.
+    """
+    manifest = load_manifest()
+    if manifest is None:
+        return None
+    start = time.perf_counter()
+    arrays = []
+    for name in ARRAY_NAMES:
+        spec = manifest["arrays"][name]
+        array = np.load(TRAINING_DATA_DIR / spec["file"], mmap_mode="r")
+        if list(array.shape) != spec["shape"] or str(array.dtype) != spec["dtype"]:
+            raise ValueError(f"{spec['file']} does not match the training data manifest")
+        arrays.append(array)
+    logger.info(f"Mapped prepared training data from {TRAINING_DATA_DIR} in {time.perf_counter() - start:.3f}s")
+    return (*arrays, manifest)
+
+if __name__ == "__main__":
+    run()
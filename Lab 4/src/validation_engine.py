@@ -0,0 +1,299 @@
+import io
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.utils import SENSOR_FEATURES, SENSOR_RANGES
+from src.data_io import is_parquet, copy_kept_rows, open_parquet_writer
+
+REQUIRED_COLUMNS = SENSOR_FEATURES + ["quality"]
+VALID_LABELS = [0, 1, 2]
+NEWLINE = ord("\n")
+
+def read_header(path):
+    """Returns (column names, byte offset where the data rows start)."""
+    with open(path, "rb") as f:
+        header = f.readline()
+    columns = header.decode("utf-8").strip().split(",")
+    return columns, len(header)
+
+def iter_blocks(path, start, end, block_size):
+    """Yields newline-terminated blocks covering bytes [start, end) of the file."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        position = start
+        carry = b""
+        while position < end:
+            data = f.read(min(block_size, end - position))
+            if not data:
+                break
+            position += len(data)
+            data = carry + data
+            cut = data.rfind(b"\n") + 1
+            if cut == 0:
+                carry = data
+                continue
+            carry = data[cut:]
+            yield data[:cut]
+        if carry:
+            yield carry + b"\n"
+
+def sensor_row_hashes(sensors):
+    """64-bit hash of each sensor tuple; -0.0 is folded into 0.0 so hashes match value equality."""
+    return pd.util.hash_pandas_object(pd.DataFrame(sensors + 0.0), index=False).to_numpy()
+
+class SortedHashSet:
+    """
+    Set of uint64 hashes kept as a few sorted runs that are merged like a binary
+    counter, so lookups are a handful of binary searches and inserts stay amortized
+    O(log n) without holding a Python object per row.
+    """
+
+    def __init__(self, hashes=None):
+        self._runs = []
+        if hashes is not None and len(hashes):
+            self._runs.append(np.unique(np.asarray(hashes, dtype=np.uint64)))
+
+    def __len__(self):
+        return sum(len(run) for run in self._runs)
+
+    @property
+    def nbytes(self):
+        return sum(run.nbytes for run in self._runs)
+
+    def contains(self, hashes):
+        found = np.zeros(len(hashes), dtype=bool)
+        for run in self._runs:
+            positions = np.minimum(np.searchsorted(run, hashes), len(run) - 1)
+            found |= run[positions] == hashes
+        return found
+
+    def add(self, hashes):
+        if not len(hashes):
+            return
+        self._runs.append(np.unique(np.asarray(hashes, dtype=np.uint64)))
+        while len(self._runs) > 1 and len(self._runs[-2]) <= 2 * len(self._runs[-1]):
+            newer = self._runs.pop()
+            self._runs[-1] = np.union1d(self._runs[-1], newer)
+
+    def to_array(self):
+        if not self._runs:
+            return np.empty(0, dtype=np.uint64)
+        while len(self._runs) > 1:
+            newer = self._runs.pop()
+            self._runs[-1] = np.union1d(self._runs[-1], newer)
+        return self._runs[0]
+
+def new_stats():
+    return {
+        "input_rows": 0,
+        "invalid_quality": 0,
+        "range_issues": {feature: 0 for feature in SENSOR_RANGES},
+        "null_values": 0,
+        "null_rows": 0,
+        "duplicates": 0,
+        "previously_seen": 0,
+        "output_rows": 0,
+        "quality_counts": {label: 0 for label in VALID_LABELS}
+    }
+
+def merge_stats(total, part):
+    """Adds the counters of ``part`` into ``total``."""
+    for key, value in part.items():
+        if isinstance(value, dict):
+            for k, v in value.items():
+                total[key][k] = total[key].get(k, 0) + v
+        else:
+            total[key] += value
+    return total
+
+def _line_bounds(block):
+    ends = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == NEWLINE)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    return starts, ends + 1
+
+def _write_kept_lines(out, block, starts, stops, keep):
+    """Writes the kept lines of a block as contiguous byte slices."""
+    if keep.all():
+        out.write(block)
+        return
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], keep, [False])).astype(np.int8)))
+    for first, last in zip(edges[::2], edges[1::2]):
+        out.write(block[starts[first]:stops[last - 1]])
+
+def validate_block(block, columns, seen):
+    """Parses one newline-aligned CSV block and validates it (see validate_frame)."""
+    df = pd.read_csv(io.BytesIO(block), header=None, names=columns, usecols=REQUIRED_COLUMNS)
+    return validate_frame(df, seen)
+
+def validate_frame(df, seen):
+    """
+    Runs every check over one block of rows in a single sweep.
+
+    Drop order matches the original validator: invalid quality labels, then rows
+    with nulls in required columns, then sensor duplicates (keeping the first
+    occurrence, including occurrences already recorded in ``seen``). Range
+    violations are counted on rows with valid labels but not dropped.
+
+    Returns (keep mask, hashes of kept rows, labels of kept rows, stats).
+    """
+    stats = new_stats()
+    stats["input_rows"] = len(df)
+
+    valid_quality = df["quality"].isin(VALID_LABELS).to_numpy()
+    stats["invalid_quality"] = int((~valid_quality).sum())
+
+    sensors = df[SENSOR_FEATURES].to_numpy(dtype=np.float64)
+    for i, feature in enumerate(SENSOR_FEATURES):
+        limits = SENSOR_RANGES.get(feature)
+        if limits:
+            column = sensors[:, i]
+            out_of_range = (column < limits["min"]) | (column > limits["max"])
+            stats["range_issues"][feature] = int((out_of_range & valid_quality).sum())
+
+    nulls = np.isnan(sensors) & valid_quality[:, None]
+    stats["null_values"] = int(nulls.sum())
+    has_null = nulls.any(axis=1)
+    stats["null_rows"] = int(has_null.sum())
+
+    keep = valid_quality & ~has_null
+    candidates = np.flatnonzero(keep)
+    hashes = sensor_row_hashes(sensors[candidates])
+    first = np.zeros(len(candidates), dtype=bool)
+    first[np.unique(hashes, return_index=True)[1]] = True
+    unique = first & ~seen.contains(hashes)
+    keep[candidates[~unique]] = False
+    stats["duplicates"] = int((~unique).sum())
+
+    kept_hashes = hashes[unique]
+    seen.add(kept_hashes)
+    quality = df["quality"].to_numpy()[keep]
+    for label in VALID_LABELS:
+        stats["quality_counts"][label] = int((quality == label).sum())
+    stats["output_rows"] = int(keep.sum())
+    return keep, kept_hashes, quality, stats
+
+def validate_range(path, start, end, columns, out, block_size, seen=None):
+    """
+    Validates bytes [start, end) of the raw CSV block by block, streaming kept
+    lines (verbatim) to the binary file object ``out``.
+
+    Returns (stats, hashes of the written rows, labels of the written rows).
+    """
+    seen = SortedHashSet() if seen is None else seen
+    stats = new_stats()
+    hashes, labels = [np.empty(0, dtype=np.uint64)], [np.empty(0)]
+    for block in iter_blocks(path, start, end, block_size):
+        starts, stops = _line_bounds(block)
+        keep, kept_hashes, kept_labels, block_stats = validate_block(block, columns, seen)
+        if len(keep) != len(starts):
+            raise ValueError("Raw CSV contains blank or multi-line records; cannot validate line by line")
+        _write_kept_lines(out, block, starts, stops, keep)
+        hashes.append(kept_hashes)
+        labels.append(kept_labels)
+        merge_stats(stats, block_stats)
+    return stats, np.concatenate(hashes), np.concatenate(labels)
+
+def validate_row_groups(path, first, stop, writer, seen=None):
+    """
+    Parquet counterpart of validate_range: validates row groups [first, stop) of
+    ``path`` one at a time and writes the kept rows, unchanged, to ``writer``.
+    """
+    seen = SortedHashSet() if seen is None else seen
+    stats = new_stats()
+    hashes, labels = [np.empty(0, dtype=np.uint64)], [np.empty(0)]
+    parquet_file = pq.ParquetFile(path)
+    for i in range(first, stop):
+        table = parquet_file.read_row_group(i)
+        keep, kept_hashes, kept_labels, block_stats = validate_frame(table.select(REQUIRED_COLUMNS).to_pandas(), seen)
+        if keep.any():
+            writer.write_table(table if keep.all() else table.filter(pa.array(keep)))
+        hashes.append(kept_hashes)
+        labels.append(kept_labels)
+        merge_stats(stats, block_stats)
+    return stats, np.concatenate(hashes), np.concatenate(labels)
+
+def split_byte_ranges(path, start, end, n_ranges):
+    """Splits bytes [start, end) into up to ``n_ranges`` ranges that begin at line starts."""
+    bounds = [start]
+    with open(path, "rb") as f:
+        for i in range(1, n_ranges):
+            target = start + (end - start) * i // n_ranges
+            if target <= bounds[-1]:
+                continue
+            # The range starts after the newline at or following byte target-1
+            f.seek(target - 1)
+            f.readline()
+            position = f.tell()
+            if bounds[-1] < position < end:
+                bounds.append(position)
+    bounds.append(end)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def validate_part(task):
+    """
+    Worker entry point: validates one range (bytes of a CSV, row groups of a
+    Parquet file) into its own part file and saves the hashes and labels of the
+    written rows next to it for the ordered merge.
+    """
+    index, start, end, path, columns, parts_dir, block_size = task
+    if is_parquet(path):
+        part_path = os.path.join(parts_dir, f"part-{index:05d}.parquet")
+        with open_parquet_writer(part_path, pq.ParquetFile(path).schema_arrow) as writer:
+            stats, hashes, labels = validate_row_groups(path, start, end, writer)
+    else:
+        part_path = os.path.join(parts_dir, f"part-{index:05d}.csv")
+        with open(part_path, "wb") as out:
+            stats, hashes, labels = validate_range(path, start, end, columns, out, block_size)
+    np.savez(os.path.splitext(part_path)[0] + ".npz", hashes=hashes, labels=labels)
+    return part_path, stats
+
+def merge_parts(part_results, out, block_size, history=None):
+    """
+    Appends the part files to ``out`` (a binary file, or a Parquet writer for
+    Parquet parts) in range order, dropping rows whose sensor
+    tuple already appeared in an earlier range (keep-first over the whole file)
+    and, when a persistent ``history`` index is given, rows seen in earlier runs.
+    Kept rows are added to ``history``. Returns the merged stats.
+    """
+    seen = SortedHashSet()
+    total = new_stats()
+    for part_path, stats in part_results:
+        arrays = np.load(os.path.splitext(part_path)[0] + ".npz")
+        hashes, labels = arrays["hashes"], arrays["labels"]
+        fresh = ~seen.contains(hashes)
+        seen.add(hashes[fresh])
+        stats["duplicates"] += int((~fresh).sum())
+        if history is not None:
+            previously_seen = fresh & history.contains(hashes)
+            stats["previously_seen"] += int(previously_seen.sum())
+            fresh &= ~previously_seen
+            history.add(hashes[fresh])
+
+        repeated = labels[~fresh]
+        stats["output_rows"] -= len(repeated)
+        for label in VALID_LABELS:
+            stats["quality_counts"][label] -= int((repeated == label).sum())
+        merge_stats(total, stats)
+
+        if is_parquet(part_path):
+            copy_kept_rows(part_path, fresh, out)
+        else:
+            copy_kept_lines(part_path, 0, fresh, out, block_size)
+    return total
+
+def copy_kept_lines(path, start, keep, out, block_size):
+    """Copies the lines of ``path`` from byte ``start`` onwards whose ``keep`` flag is set."""
+    if keep.all():
+        with open(path, "rb") as f:
+            f.seek(start)
+            shutil.copyfileobj(f, out, block_size)
+        return
+    offset = 0
+    for block in iter_blocks(path, start, os.path.getsize(path), block_size):
+        starts, stops = _line_bounds(block)
+        _write_kept_lines(out, block, starts, stops, keep[offset:offset + len(starts)])
+        offset += len(starts)
+
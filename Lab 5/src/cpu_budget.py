@@ -0,0 +1,112 @@
+import os
+import math
+from contextlib import contextmanager
+from joblib import parallel_backend
+from threadpoolctl import threadpool_info, threadpool_limits
+
+# Read by OpenMP/BLAS runtimes when they start, so they cover child processes of the task
+THREAD_ENV_VARS = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                   "BLIS_NUM_THREADS", "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS"]
+# Estimators whose own thread count is set through ``n_jobs`` (LightGBM and XGBoost map it to num_threads/nthread)
+N_JOBS_MODELS = ("RandomForest", "XGBoost", "LightGBM")
+
+def _container_cpu_limit():
+    """CPU quota of the container (e.g. docker --cpus) rounded up to whole cores, or None."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+    except (OSError, ValueError):
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f, open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as g:
+                quota, period = f.read().strip(), g.read().strip()
+        except OSError:
+            return None
+    if quota in ("max", "-1"):
+        return None
+    return max(1, math.ceil(int(quota) / int(period)))
+
+def available_cpus():
+    """Cores this process may run on: its affinity mask, capped by the container CPU quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = _container_cpu_limit()
+    return min(cpus, limit) if limit else cpus
+
+def loaded_threadpools():
+    """Threads of every BLAS/OpenMP pool loaded in this process, as {library: threads}."""
+    return {f"{pool['user_api']}:{pool['prefix']}": pool["num_threads"] for pool in threadpool_info()}
+
+class CpuBudget:
+    """
+    Core quota of one of ``concurrency`` training tasks sharing a worker.
+
+    The worker's cores are split evenly between the tasks (the first slots take
+    the remainder), and every thread pool the task can start is capped at its
+    quota: the estimator's own ``n_jobs``, the BLAS/OpenMP pools already loaded
+    (threadpoolctl), and the thread environment variables for anything started
+    later. With ``enabled=False`` the quota is reported but nothing is capped.
+    """
+
+    def __init__(self, concurrency, slot=0, total=0, enabled=True):
+        self.total = total or available_cpus()
+        self.concurrency = max(1, concurrency)
+        self.slot = slot % self.concurrency
+        self.enabled = enabled
+        base, extra = divmod(self.total, self.concurrency)
+        self.cores = max(1, base + (1 if self.slot < extra else 0))
+
+    def estimator_params(self, model_name, threads=None):
+        """Parameters that set ``model_name``'s own thread count (empty when budgeting is off)."""
+        if not self.enabled or model_name not in N_JOBS_MODELS:
+            return {}
+        return {"n_jobs": threads or self.cores}
+
+    def search_jobs(self):
+        """n_jobs for a hyperparameter search: one single-threaded candidate fit per core of the quota."""
+        return self.cores if self.enabled else -1
+
+    @contextmanager
+    def limit(self, threads=None):
+        """Caps BLAS/OpenMP threads at ``threads`` (default: the quota) for the duration of the block."""
+        if not self.enabled:
+            yield
+            return
+        threads = threads or self.cores
+        saved = {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+        os.environ.update({name: str(threads) for name in THREAD_ENV_VARS})
+        try:
+            with threadpool_limits(limits=threads):
+                yield
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+    @contextmanager
+    def search(self):
+        """Quota-wide limits in this process and single-threaded BLAS/OpenMP in the search's worker processes."""
+        if not self.enabled:
+            yield
+            return
+        with self.limit(), parallel_backend("loky", inner_max_num_threads=1):
+            yield
+
+    def report(self, model_threads=None, search_jobs=None):
+        """Effective parallelism of the task; call inside ``limit()`` to see the capped pools."""
+        pools = loaded_threadpools()
+        report = {
+            "cpu_budgeting": self.enabled,
+            "cpus_available": self.total,
+            "concurrent_tasks": self.concurrency,
+            "core_quota": self.cores,
+            "model_threads": model_threads if model_threads is not None else ("threadpool limit" if self.enabled else "library default"),
+            "threadpool_max": max(pools.values()) if pools else 0,
+            "threadpools": ", ".join(f"{name}={threads}" for name, threads in sorted(pools.items()))
+        }
+        if search_jobs is not None:
+            report["search_jobs"] = search_jobs
+        return report
@@ -2,7 +2,7 @@ import numpy as np
 import pandas as pd
 import random
 from src.utils import (
-    get_logger, log_stage, log_dataframe_summary, log_dict_table,
+    get_logger, log_stage, log_dataframe_summary, log_dict_table, trace_span,
     RAW_DATA_PATH, DATA_DIR, SENSOR_FEATURES, save_metadata
 )
 
@@ -44,7 +44,8 @@ def run(tracker=None, context_id=None):
             
         return 0
 
-    df["quality"] = df.apply(get_quality, axis=1)
+    with trace_span("label_quality", rows=num_samples):
+        df["quality"] = df.apply(get_quality, axis=1)
 
     # 3. Rules statistics logging
     rule_stats = {
@@ -77,7 +78,8 @@ def run(tracker=None, context_id=None):
 
     # Save data
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    df.to_csv(RAW_DATA_PATH, index=False)
+    with trace_span("write_raw", rows=num_samples):
+        df.to_csv(RAW_DATA_PATH, index=False)
     logger.info(f"Raw data saved to {RAW_DATA_PATH} ({RAW_DATA_PATH.stat().st_size / 1024:.2f} KB)")
 
     # Save metadata
@@ -1,7 +1,7 @@
 import pandas as pd
 import numpy as np
 from src.utils import (
-    get_logger, log_stage, log_dataframe_summary, log_dict_table,
+    get_logger, log_stage, log_dataframe_summary, log_dict_table, trace_span,
     RAW_DATA_PATH, VALIDATED_DATA_PATH, SENSOR_FEATURES, SENSOR_RANGES,
     save_metadata
 )
@@ -15,7 +15,8 @@ def run():
         logger.error(f"Raw data file not found at {RAW_DATA_PATH}")
         return
 
-    df = pd.read_csv(RAW_DATA_PATH)
+    with trace_span("load_raw"):
+        df = pd.read_csv(RAW_DATA_PATH)
     initial_rows = len(df)
     logger.info(f"Starting validation on {initial_rows} rows")
 
@@ -89,7 +90,8 @@ def run():
     log_dataframe_summary(logger, df, "Validated Data")
 
     # Save output
-    df.to_csv(VALIDATED_DATA_PATH, index=False)
+    with trace_span("write_validated", rows=len(df)):
+        df.to_csv(VALIDATED_DATA_PATH, index=False)
     logger.info(f"Validated data saved to {VALIDATED_DATA_PATH}")
 
     # Update metadata
@@ -3,13 +3,16 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from src.utils import (
-    get_logger, log_stage, log_dataframe_summary, log_dict_table,
-    VALIDATED_DATA_PATH, FEATURES_PATH, ENGINEERED_FEATURES,
-    save_metadata
+    get_logger, log_stage, log_dataframe_summary, log_dict_table, trace_span,
+    VALIDATED_DATA_PATH, FEATURES_PATH, SENSOR_FEATURES, ENGINEERED_FEATURES,
+    FEATURE_DEFINITIONS, save_metadata
 )
+from src.feature_registry import compile_features
 
 logger = get_logger(__name__)
 
+FEATURE_PLAN = compile_features(FEATURE_DEFINITIONS, SENSOR_FEATURES)
+
 @log_stage("Feature Engineering")
 def run(tracker=None, context_id=None, input_artifact_id=None):
     """Creates domain-specific features and analyzes correlations."""
@@ -17,28 +20,15 @@ def run(tracker=None, context_id=None, input_artifact_id=None):
         logger.error(f"Validated data file not found at {VALIDATED_DATA_PATH}")
         return
 
-    df = pd.read_csv(VALIDATED_DATA_PATH)
+    with trace_span("load_validated"):
+        df = pd.read_csv(VALIDATED_DATA_PATH)
     logger.info(f"Input data shape: {df.shape}")
 
-    # 1. speed_feed_ratio
-    logger.info("Creating speed_feed_ratio = spindle_speed / (feed_rate + 1e-6)")
-    df["speed_feed_ratio"] = df["spindle_speed"] / (df["feed_rate"] + 1e-6)
-
-    # 2. vibration_temp_interaction
-    logger.info("Creating vibration_temp_interaction = vibration * temperature / 1000")
-    df["vibration_temp_interaction"] = df["vibration"] * df["temperature"] / 1000
-
-    # 3. tool_wear_severity
-    logger.info("Creating tool_wear_severity = tool_wear^2 * vibration")
-    df["tool_wear_severity"] = (df["tool_wear"] ** 2) * df["vibration"]
-
-    # 4. cutting_energy_proxy
-    logger.info("Creating cutting_energy_proxy = spindle_speed * feed_rate * depth_of_cut / 1e6")
-    df["cutting_energy_proxy"] = (df["spindle_speed"] * df["feed_rate"] * df["depth_of_cut"]) / 1e6
-
-    # 5. thermal_stress_index
-    logger.info("Creating thermal_stress_index = ((temperature - 200) / 100 * depth_of_cut).clip(0)")
-    df["thermal_stress_index"] = (((df["temperature"] - 200) / 100) * df["depth_of_cut"]).clip(0)
+    # Engineered features: one pass of the compiled FEATURE_DEFINITIONS plan
+    for name, expression in FEATURE_DEFINITIONS.items():
+        logger.info(f"Creating {name} = {expression}")
+    with trace_span("compute_features", rows=len(df)):
+        df[ENGINEERED_FEATURES] = FEATURE_PLAN.evaluate_frame(df)
 
     # Feature Statistics
     feat_stats = df[ENGINEERED_FEATURES].describe().T[["mean", "std", "min", "max"]].to_dict("index")
@@ -58,7 +48,8 @@ def run(tracker=None, context_id=None, input_artifact_id=None):
 
     # Final Logging
     log_dataframe_summary(logger, df, "Features Ready for Training")
-    df.to_csv(FEATURES_PATH, index=False)
+    with trace_span("write_features", rows=len(df)):
+        df.to_csv(FEATURES_PATH, index=False)
     logger.info(f"Features saved to {FEATURES_PATH} ({FEATURES_PATH.stat().st_size / 1024:.2f} KB)")
 
     # Update metadata
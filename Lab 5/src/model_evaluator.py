@@ -5,9 +5,9 @@ import mlflow
 from google.cloud import storage
 from datetime import datetime
 from src.utils import (
-    get_logger, log_stage, log_dict_table,
+    get_logger, log_stage, log_dict_table, trace_span,
     DATA_DIR, RESULTS_DIR, MLFLOW_EXPERIMENT_NAME, MLFLOW_TRACKING_URI,
-    MLFLOW_REGISTRY_MODEL, save_metadata, GCS_BUCKET
+    MLFLOW_REGISTRY_MODEL, save_metadata, export_metadata_json, GCS_BUCKET
 )
 
 logger = get_logger(__name__)
@@ -65,7 +65,8 @@ def run_evaluate(tracker=None, context_id=None):
                 client = storage.Client()
                 bucket = client.bucket(GCS_BUCKET)
                 blob = bucket.blob("models/champion_model.pkl")
-                blob.upload_from_filename(str(final_champion_path))
+                with trace_span("upload_champion", bucket=GCS_BUCKET):
+                    blob.upload_from_filename(str(final_champion_path))
                 logger.info(f"Uploaded champion model to gs://{GCS_BUCKET}/models/champion_model.pkl")
             except Exception as e:
                 logger.error(f"Failed to upload champion model to GCS: {e}")
@@ -117,7 +118,8 @@ def run_register(tracker=None, context_id=None):
     
     # Register model
     model_uri = f"runs:/{run_id}/model"
-    mv = mlflow.register_model(model_uri, MLFLOW_REGISTRY_MODEL)
+    with trace_span("register_model", model=model_name):
+        mv = mlflow.register_model(model_uri, MLFLOW_REGISTRY_MODEL)
     
     # Update description and tags
     client = mlflow.tracking.MlflowClient()
@@ -146,6 +148,8 @@ def run_register(tracker=None, context_id=None):
         "registered_model_name": MLFLOW_REGISTRY_MODEL,
         "registered_version": mv.version
     })
+    # Readable snapshot of the metadata store for the end of the run
+    logger.info(f"Metadata snapshot written to {export_metadata_json()}")
 
 if __name__ == "__main__":
     import sys
@@ -1,7 +1,6 @@
 import os
 import json
 import time
-import random
 import warnings
 import numpy as np
 import pandas as pd
@@ -15,6 +14,7 @@ import mlflow.sklearn
 import mlflow.xgboost
 import mlflow.lightgbm
 
+from sklearn.base import clone
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import (
@@ -25,10 +25,14 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.neural_network import MLPClassifier
 
 from src.utils import (
-    get_logger, log_stage, log_dataframe_summary, log_dict_table,
+    get_logger, log_stage, log_dataframe_summary, log_dict_table, trace_span,
     FEATURES_PATH, MODEL_PARAM_GRIDS, MLFLOW_EXPERIMENT_NAME, 
-    MLFLOW_TRACKING_URI, QUALITY_CLASSES, DATA_DIR, RESULTS_DIR
+    MLFLOW_TRACKING_URI, QUALITY_CLASSES, DATA_DIR, RESULTS_DIR,
+    MLFLOW_BATCH_LOGGING, MLFLOW_ARTIFACT_WORKERS,
+    TRAINING_CPU_BUDGET, TRAINING_CONCURRENCY, CPU_BUDGETING
 )
+from src.cpu_budget import CpuBudget
+from src.run_logger import BatchedRunLogger
 
 warnings.filterwarnings("ignore")
 logger = get_logger(__name__)
@@ -70,38 +74,41 @@ def run(model_name, tracker=None, context_id=None, features_artifact_id=None):
         logger.error(f"Features file not found at {FEATURES_PATH}")
         return
 
-    df = pd.read_csv(FEATURES_PATH)
-    X = df.drop(columns=["quality", "timestamp", "machine_id"], errors="ignore")
-    y = df["quality"]
-    feature_names = X.columns.tolist()
+    with trace_span("load_features", model=model_name):
+        df = pd.read_csv(FEATURES_PATH)
+        X = df.drop(columns=["quality", "timestamp", "machine_id"], errors="ignore")
+        y = df["quality"]
+        feature_names = X.columns.tolist()
 
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
+    with trace_span("split", model=model_name):
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
     
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
+    with trace_span("scale", model=model_name):
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
+        X_test_scaled = scaler.transform(X_test)
 
     logger.info(f"Training {model_name}...")
     logger.info(f"Train size: {X_train.shape}, Test size: {X_test.shape}")
     
-    mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
-    try:
-        mlflow.set_experiment(MLFLOW_EXPERIMENT_NAME)
-    except Exception as e:
-        logger.warning(f"Experiment setup race condition: {e}. Retrying...")
-        time.sleep(random.random() * 3)
-        mlflow.set_experiment(MLFLOW_EXPERIMENT_NAME)
-
-    with mlflow.start_run(run_name=f"{model_name}_run") as run:
+    # Tags, params and metrics are sent in batches and artifacts upload in the background;
+    # everything is flushed before the run is closed
+    run_logger = BatchedRunLogger(MLFLOW_TRACKING_URI, MLFLOW_EXPERIMENT_NAME, f"{model_name}_run",
+                                  batched=MLFLOW_BATCH_LOGGING, artifact_workers=MLFLOW_ARTIFACT_WORKERS)
+    with trace_span("mlflow_setup", model=model_name):
+        run_logger.start()
+    with run_logger as run:
         # Tags
-        mlflow.set_tag("model_type", model_name)
-        mlflow.set_tag("pipeline_stage", "training")
-        mlflow.set_tag("author", "Ajith Srikanth")
-        mlflow.set_tag("domain", "Manufacturing")
+        run.set_tags({
+            "model_type": model_name,
+            "pipeline_stage": "training",
+            "author": "Ajith Srikanth",
+            "domain": "Manufacturing"
+        })
 
         # Config & Params
         param_grid = MODEL_PARAM_GRIDS.get(model_name, {})
-        mlflow.log_params({"tuning_method": "GridSearchCV"})
+        run.log_params({"tuning_method": "GridSearchCV"})
 
         # Model instantiation
         start_train = time.time()
@@ -122,19 +129,38 @@ def run(model_name, tracker=None, context_id=None, features_artifact_id=None):
         else:
             raise ValueError(f"Unknown model name: {model_name}")
 
+        # The task's core quota runs that many single-threaded candidate fits at once;
+        # the best candidate is then refit with the whole quota
+        slot = list(MODEL_PARAM_GRIDS).index(model_name) if model_name in MODEL_PARAM_GRIDS else 0
+        budget = CpuBudget(TRAINING_CONCURRENCY, slot=slot, total=TRAINING_CPU_BUDGET, enabled=CPU_BUDGETING)
+        base_model.set_params(**budget.estimator_params(model_name, threads=1))
+
         # Train with tuning
         logger.info(f"Running GridSearchCV for {model_name}...")
-        grid_search = GridSearchCV(base_model, param_grid, cv=3, scoring='f1_weighted', n_jobs=-1, verbose=1)
-        grid_search.fit(X_train_scaled, y_train)
-        
-        model = grid_search.best_estimator_
-        train_time = time.time() - start_train
-        
+        grid_search = GridSearchCV(base_model, param_grid, cv=3, scoring='f1_weighted',
+                                   n_jobs=budget.search_jobs(), refit=not budget.enabled, verbose=1)
+        # Only the search runs under the loky backend; inside it the refit's own n_jobs
+        # would also switch from threads to worker processes and pickle every tree
+        with budget.limit():
+            parallelism = budget.report(model_threads=budget.estimator_params(model_name).get("n_jobs"),
+                                        search_jobs=grid_search.n_jobs)
+            log_dict_table(logger, parallelism, f"{model_name} CPU Budget")
+            with trace_span("fit", model=model_name, rows=len(X_train), threads=budget.cores):
+                with budget.search():
+                    grid_search.fit(X_train_scaled, y_train)
+                if budget.enabled:
+                    model = clone(base_model).set_params(**grid_search.best_params_, **budget.estimator_params(model_name))
+                    model.fit(X_train_scaled, y_train)
+                else:
+                    model = grid_search.best_estimator_
+            train_time = time.time() - start_train
+
+            with trace_span("predict", model=model_name, rows=len(X_test)):
+                y_pred = model.predict(X_test_scaled)
+
         logger.info(f"Best parameters for {model_name}: {grid_search.best_params_}")
-        mlflow.log_params(grid_search.best_params_)
-        
-        # Predict
-        y_pred = model.predict(X_test_scaled)
+        run.log_params(grid_search.best_params_)
+        run.log_params({f"parallelism.{key}": value for key, value in parallelism.items() if key != "model_threads"})
         
         # Metrics
         metrics = {
@@ -151,7 +177,7 @@ def run(model_name, tracker=None, context_id=None, features_artifact_id=None):
         for i, f1 in enumerate(f1_per_class):
             metrics[f"f1_class_{i}"] = f1
             
-        mlflow.log_metrics(metrics)
+        run.log_metrics(metrics)
         log_dict_table(logger, metrics, f"{model_name} Metrics")
 
         # Artifacts
@@ -161,65 +187,82 @@ def run(model_name, tracker=None, context_id=None, features_artifact_id=None):
         report_path = RESULTS_DIR / f"{model_name}_report.txt"
         with open(report_path, "w") as f:
             f.write(report)
-        mlflow.log_artifact(str(report_path))
+        run.log_artifact(report_path)
 
         # 2. Confusion Matrix
         cm_path = RESULTS_DIR / f"{model_name}_cm.png"
-        plot_confusion_matrix(y_test, y_pred, model_name, str(cm_path))
-        mlflow.log_artifact(str(cm_path))
+        with trace_span("plot_confusion_matrix", model=model_name):
+            plot_confusion_matrix(y_test, y_pred, model_name, str(cm_path))
+        run.log_artifact(cm_path)
 
         # 3. Feature Importance
         fi_path = RESULTS_DIR / f"{model_name}_fi.png"
-        fi_data = plot_feature_importance(model, feature_names, model_name, str(fi_path))
+        with trace_span("plot_feature_importance", model=model_name):
+            fi_data = plot_feature_importance(model, feature_names, model_name, str(fi_path))
         if fi_data:
-            mlflow.log_artifact(str(fi_path))
+            run.log_artifact(fi_path)
             fi_json_path = RESULTS_DIR / f"{model_name}_fi.json"
             with open(fi_json_path, "w") as f:
                 json.dump(fi_data, f, indent=4)
-            mlflow.log_artifact(str(fi_json_path))
+            run.log_artifact(fi_json_path)
 
         # 4. Model
         import joblib
         joblib.dump(model, RESULTS_DIR / f"{model_name}_model.pkl")
         
-        if model_name == "XGBoost":
-            mlflow.xgboost.log_model(model, "model")
-        elif model_name == "LightGBM":
-            mlflow.lightgbm.log_model(model, "model")
-        else:
-            mlflow.sklearn.log_model(model, "model")
+        with trace_span("log_model", model=model_name):
+            if model_name == "XGBoost":
+                run.log_model(mlflow.xgboost, model, "model")
+            elif model_name == "LightGBM":
+                run.log_model(mlflow.lightgbm, model, "model")
+            else:
+                run.log_model(mlflow.sklearn, model, "model")
 
-        logger.info(f"{model_name} training complete. Run ID: {run.info.run_id}")
-        
-        # Result dict for evaluator
-        result = {
-            "model_name": model_name,
-            "run_id": run.info.run_id,
-            "metrics": metrics
-        }
-        result_path = RESULTS_DIR / f"{model_name}_result.json"
-        with open(result_path, "w") as f:
-            json.dump(result, f, indent=4)
-        
-        if tracker and context_id is not None:
-            model_artifact_id = tracker.record_model(
-                model_name=model_name,
-                accuracy=metrics["accuracy"],
-                f1=metrics["f1_weighted"],
-                framework="sklearn" if "Net" in model_name or "Forest" in model_name else model_name.lower(),
-                path=mlflow.get_artifact_uri("model"), 
-                context_id=context_id
-            )
-            tracker.record_execution(
-                exec_type=tracker.training_exec_type,
-                properties={"model_type": (model_name, "string"), "training_time_s": (train_time, "double")},
-                input_ids=[features_artifact_id] if features_artifact_id else [],
-                output_ids=[model_artifact_id],
-                context_id=context_id
-            )
-            return str(result_path), model_artifact_id
-
-        return str(result_path), None
+        with trace_span("mlflow_flush", model=model_name):
+            run.flush()
+            run.wait_for_artifacts()
+
+    tracking = run_logger.stats()
+    log_dict_table(logger, {
+        "Round Trips": tracking["round_trips"],
+        "Requests": ", ".join(f"{name}={count}" for name, count in tracking["calls"].items()),
+        "Logged": ", ".join(f"{kind}={count}" for kind, count in tracking["logged"].items()),
+        "Tracking Time": f"{tracking['tracking_seconds']:.3f}s",
+        "Batched": tracking["batched"]
+    }, f"{model_name} MLflow Tracking")
+    logger.info(f"{model_name} training complete. Run ID: {run.run_id}")
+
+    # Result dict for evaluator
+    result = {
+        "model_name": model_name,
+        "run_id": run.run_id,
+        "metrics": metrics,
+        "parallelism": parallelism,
+        "tracking": tracking
+    }
+    result_path = RESULTS_DIR / f"{model_name}_result.json"
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=4)
+
+    if tracker and context_id is not None:
+        model_artifact_id = tracker.record_model(
+            model_name=model_name,
+            accuracy=metrics["accuracy"],
+            f1=metrics["f1_weighted"],
+            framework="sklearn" if "Net" in model_name or "Forest" in model_name else model_name.lower(),
+            path=run.artifact_uri("model"), 
+            context_id=context_id
+        )
+        tracker.record_execution(
+            exec_type=tracker.training_exec_type,
+            properties={"model_type": (model_name, "string"), "training_time_s": (train_time, "double")},
+            input_ids=[features_artifact_id] if features_artifact_id else [],
+            output_ids=[model_artifact_id],
+            context_id=context_id
+        )
+        return str(result_path), model_artifact_id
+
+    return str(result_path), None
 
 if __name__ == "__main__":
     import sys
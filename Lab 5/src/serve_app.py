@@ -9,6 +9,14 @@ from google.cloud import storage
 import uvicorn
 import logging
 
+try:
+    from src.utils import SENSOR_FEATURES, ENGINEERED_FEATURES, FEATURE_DEFINITIONS
+    from src.feature_registry import compile_features
+except ImportError:
+    # Flat layout of the serving image (Dockerfile.serve)
+    from utils import SENSOR_FEATURES, ENGINEERED_FEATURES, FEATURE_DEFINITIONS
+    from feature_registry import compile_features
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("PredictionService")
 
@@ -20,6 +28,8 @@ CHAMPION_MODEL_FILE = os.environ.get("CHAMPION_MODEL_FILE", "champion_model.pkl"
 
 # We will load the model globally
 champion_model = None
+# Same compiled feature plan the pipeline uses, so serving never re-implements the formulas
+FEATURE_PLAN = compile_features(FEATURE_DEFINITIONS, SENSOR_FEATURES)
 
 class PredictionRequest(BaseModel):
     features: dict
@@ -176,7 +186,7 @@ def read_root():
                 btn.innerText = '⏳ Processing...';
                 btn.disabled = true;
                 
-                // Read and calculate engineered features automatically for the user
+                // Engineered features are computed by the service from these sensor readings
                 const spd = parseFloat(document.getElementById('spindle').value);
                 const feed = parseFloat(document.getElementById('feed').value);
                 const depth = parseFloat(document.getElementById('depth').value);
@@ -190,12 +200,7 @@ def read_root():
                     "depth_of_cut": depth,
                     "vibration": vib,
                     "temperature": temp,
-                    "tool_wear": wear,
-                    "speed_feed_ratio": spd / feed,
-                    "vibration_temp_interaction": vib * temp,
-                    "tool_wear_severity": wear * depth,
-                    "cutting_energy_proxy": spd * feed * depth,
-                    "thermal_stress_index": temp * wear
+                    "tool_wear": wear
                 };
 
                 try {
@@ -244,7 +249,12 @@ def predict(request: PredictionRequest):
         raise HTTPException(status_code=503, detail="Model not loaded. Service unavailable.")
         
     try:
-        df = pd.DataFrame([request.features])
+        missing = [f for f in SENSOR_FEATURES if f not in request.features]
+        if missing:
+            raise ValueError(f"Missing sensor readings: {missing}")
+        features = {f: float(request.features[f]) for f in SENSOR_FEATURES}
+        features.update(FEATURE_PLAN.evaluate_one(features))
+        df = pd.DataFrame([features], columns=SENSOR_FEATURES + ENGINEERED_FEATURES)
         prediction = champion_model.predict(df)[0]
         
         # Check if model supports predict_proba
@@ -1,11 +1,23 @@
 import os
+import sys
+import gc
 import json
+import queue
+import atexit
 import logging
+import logging.handlers
+import sqlite3
+import threading
 import time
+import cProfile
+import resource
+import tracemalloc
 import functools
 import traceback
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
 # Path Constants
@@ -14,9 +26,33 @@ RAW_DATA_PATH = DATA_DIR / "raw_sensor_data.csv"
 VALIDATED_DATA_PATH = DATA_DIR / "validated_sensor_data.csv"
 FEATURES_PATH = DATA_DIR / "engineered_features.csv"
 METADATA_PATH = DATA_DIR / "pipeline_metadata.json"
+METADATA_DB_PATH = Path(os.getenv("METADATA_DB_PATH", str(DATA_DIR / "pipeline_metadata.db")))
+# Seconds a writer waits for the metadata store lock before giving up
+METADATA_BUSY_TIMEOUT = float(os.getenv("METADATA_BUSY_TIMEOUT", "30"))
+# Per-stage profiling in log_stage: "resources", "tracemalloc", "cprofile" (comma-separated) or "all"
+PIPELINE_PROFILE = os.getenv("PIPELINE_PROFILE", "").lower()
+PROFILES_DIR = DATA_DIR / "profiles"
+TRACEMALLOC_FRAMES = 1
+TRACEMALLOC_TOP = 10
+# log_dataframe_summary samples frames larger than this unless exact=True / SUMMARY_EXACT=true
+SUMMARY_SAMPLE_THRESHOLD = int(os.getenv("SUMMARY_SAMPLE_THRESHOLD", "1000000"))
+SUMMARY_SAMPLE_SIZE = int(os.getenv("SUMMARY_SAMPLE_SIZE", "100000"))
+SUMMARY_SAMPLE_SEED = 0
+SUMMARY_EXACT = os.getenv("SUMMARY_EXACT", "false").lower() == "true"
+# Chrome trace timeline per DAG run under DATA_DIR/traces (set PIPELINE_TRACING=false to disable)
+PIPELINE_TRACING = os.getenv("PIPELINE_TRACING", "true").lower() == "true"
+TRACES_DIR = DATA_DIR / "traces"
 PIPELINE_LOG_PATH = DATA_DIR / "pipeline_execution.log"
+# "text" (default) or "json" for structured JSON-lines records in the pipeline log file
+PIPELINE_LOG_FORMAT = os.getenv("PIPELINE_LOG_FORMAT", "text").lower()
 RESULTS_DIR = DATA_DIR / "results"
 MODELS_DIR = DATA_DIR / "models"
+# Cores shared by the parallel training tasks; 0 detects the worker's cores (including a container CPU limit)
+TRAINING_CPU_BUDGET = int(os.getenv("TRAINING_CPU_BUDGET", "0"))
+# Training tasks running at once that split the budget (one per entry of MODEL_PARAM_GRIDS)
+TRAINING_CONCURRENCY = int(os.getenv("TRAINING_CONCURRENCY", "4"))
+# false leaves every library at its default threading (each trainer and its grid search use all cores)
+CPU_BUDGETING = os.getenv("CPU_BUDGETING", "true").lower() == "true"
 
 MLMD_DB_PATH = os.environ.get("MLMD_DB_PATH", "/opt/airflow/mlmd/mlmd.sqlite")
 GCS_BUCKET = os.environ.get("GCS_BUCKET", "")
@@ -30,6 +66,9 @@ PIPELINE_VERSION = "lab5-v1.0"
 MLFLOW_EXPERIMENT_NAME = "manufacturing-defect-detection"
 MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI", "http://mlflow:5001")
 MLFLOW_REGISTRY_MODEL = "manufacturing-defect-champion"
+# Trainers buffer tags/params/metrics into log_batch calls and upload artifacts on background threads
+MLFLOW_BATCH_LOGGING = os.getenv("MLFLOW_BATCH_LOGGING", "true").lower() == "true"
+MLFLOW_ARTIFACT_WORKERS = int(os.getenv("MLFLOW_ARTIFACT_WORKERS", "2"))
 
 # Manufacturing Constants
 SENSOR_FEATURES = [
@@ -41,13 +80,17 @@ SENSOR_FEATURES = [
     "tool_wear"
 ]
 
-ENGINEERED_FEATURES = [
-    "speed_feed_ratio", 
-    "vibration_temp_interaction", 
-    "tool_wear_severity", 
-    "cutting_energy_proxy", 
-    "thermal_stress_index"
-]
+# Engineered features, each declared once as an expression over SENSOR_FEATURES
+# (arithmetic, numeric constants and maximum/minimum/abs/sqrt/exp/log1p); compiled by src/feature_registry.py
+FEATURE_DEFINITIONS = {
+    "speed_feed_ratio": "spindle_speed / (feed_rate + 1e-6)",
+    "vibration_temp_interaction": "vibration * temperature / 1000",
+    "tool_wear_severity": "tool_wear ** 2 * vibration",
+    "cutting_energy_proxy": "spindle_speed * feed_rate * depth_of_cut / 1e6",
+    "thermal_stress_index": "maximum((temperature - 200) / 100 * depth_of_cut, 0)"
+}
+
+ENGINEERED_FEATURES = list(FEATURE_DEFINITIONS)
 
 QUALITY_CLASSES = ["Good", "Minor Defect", "Major Defect"]
 QUALITY_MAP = {0: "Good", 1: "Minor Defect", 2: "Major Defect"}
@@ -127,33 +170,338 @@ class PipelineFormatter(logging.Formatter):
 class FileFormatter(logging.Formatter):
     """Plain text formatter for log files."""
     def __init__(self):
-        super().__init__("[%Y-%m-%d %H:%M:%S] %(levelname)s - %(name)s: %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+        super().__init__("[%(asctime)s] %(levelname)s - %(name)s: %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record for machine-readable pipeline logs."""
+    STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+            "process": record.processName,
+            "thread": record.threadName
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        # Anything passed via `extra=` becomes a top-level field
+        for key, value in vars(record).items():
+            if key not in self.STANDARD_ATTRS:
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+class CurrentStderrHandler(logging.StreamHandler):
+    """Console handler that always writes to the current sys.stderr (Airflow redirects it per task)."""
+    @property
+    def stream(self):
+        return sys.stderr
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+class AtomicAppendFileHandler(logging.Handler):
+    """
+    Appends each record to the log file with a single O_APPEND write, so lines from
+    concurrent processes never interleave or overwrite each other.
+
+    The file is reopened on the next record after close(): libraries that call
+    logging.config.dictConfig on import (mlflow does) close every existing handler.
+    """
+    def __init__(self, path):
+        super().__init__()
+        self.path = str(path)
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o664)
+
+    def emit(self, record):
+        try:
+            if self.fd is None:
+                self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o664)
+            os.write(self.fd, (self.format(record) + "\n").encode("utf-8"))
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        if self.fd is not None:
+            try:
+                os.close(self.fd)
+            except OSError:
+                pass
+            self.fd = None
+        super().close()
+
+class _FlushMarker:
+    """Queue item that signals when every record enqueued before it has been written."""
+    def __init__(self):
+        self.done = threading.Event()
+
+class _PipelineQueueListener(logging.handlers.QueueListener):
+    def handle(self, record):
+        if isinstance(record, _FlushMarker):
+            record.done.set()
+            return
+        super().handle(record)
+
+# Process-wide logging state. Kept on a logger object rather than in this module because
+# some modules import this file both as `utils` and `src.utils`.
+_LOG_STATE_HOST = logging.getLogger("manufacturing_pipeline.logging")
+
+def _ensure_log_listener():
+    """Starts the background log writer once per process and returns the shared QueueHandler."""
+    state = getattr(_LOG_STATE_HOST, "pipeline_log_state", None)
+    if state is not None and state["pid"] == os.getpid():
+        return state["handler"]
+
+    # First call in this process (or first call after a fork: the writer thread does not survive it)
+    log_queue = queue.SimpleQueue()
+    console = CurrentStderrHandler()
+    console.setFormatter(PipelineFormatter())
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    file_handler = AtomicAppendFileHandler(PIPELINE_LOG_PATH)
+    file_handler.setFormatter(JsonLinesFormatter() if PIPELINE_LOG_FORMAT == "json" else FileFormatter())
+
+    listener = _PipelineQueueListener(log_queue, console, file_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    # Reuse the inherited handler object after a fork so loggers configured in the parent keep working
+    handler = state["handler"] if state is not None else logging.handlers.QueueHandler(log_queue)
+    handler.queue = log_queue
+    _LOG_STATE_HOST.pipeline_log_state = {"pid": os.getpid(), "handler": handler, "listener": listener}
+    return handler
+
+def flush_logs(timeout=5.0):
+    """Blocks until the background writer has written every record queued so far."""
+    state = getattr(_LOG_STATE_HOST, "pipeline_log_state", None)
+    if state is None or state["pid"] != os.getpid():
+        return
+    marker = _FlushMarker()
+    state["handler"].queue.put_nowait(marker)
+    marker.done.wait(timeout)
 
 def get_logger(name):
-    """Creates a configured logger with console and file handlers."""
+    """
+    Returns a logger that hands records to a per-process background writer.
+    Handlers are created once per process; repeated calls are cheap and idempotent.
+    """
+    handler = _ensure_log_listener()
     logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
-    
-    if logger.hasHandlers():
+    if handler not in logger.handlers:
         logger.handlers.clear()
-        
-    # Console Handler
-    ch = logging.StreamHandler()
-    ch.setFormatter(PipelineFormatter())
-    logger.addHandler(ch)
-    
-    # File Handler
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    fh = logging.FileHandler(PIPELINE_LOG_PATH)
-    fh.setFormatter(FileFormatter())
-    logger.addHandler(fh)
-    
+        logger.addHandler(handler)
     logger.propagate = False
     return logger
 
+# Timeline Tracing
+# Spans are appended to one Chrome trace file per DAG run (JSON array format, which
+# chrome://tracing and ui.perfetto.dev accept without the closing bracket). Each event
+# is a single O_APPEND write, so every task process can add to the same file.
+def current_run_id():
+    """Identifies the pipeline run a process belongs to (Airflow DAG run id when available)."""
+    return os.getenv("PIPELINE_RUN_ID") or os.getenv("AIRFLOW_CTX_DAG_RUN_ID") or "local"
+
+def trace_path(run_id=None):
+    run_id = run_id or current_run_id()
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in run_id)
+    return TRACES_DIR / f"{safe}.trace.json"
+
+# (pid, tid, path) keys of threads that already wrote their process/thread name events
+_TRACE_NAMED = set()
+
+def _create_trace_file(path):
+    """
+    Creates the trace file with its "[" header in one atomic step: the header is
+    written to a private temp file that is then hard-linked into place, so no other
+    process can append an event before the header exists.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_native_id()}.tmp")
+    fd = os.open(str(tmp_path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, b"[\n")
+    finally:
+        os.close(fd)
+    try:
+        os.link(str(tmp_path), str(path))
+    except FileExistsError:
+        pass
+    finally:
+        os.unlink(str(tmp_path))
+
+def _append_trace_events(events):
+    path = trace_path()
+    if not path.exists():
+        _create_trace_file(path)
+    payload = "".join(json.dumps(e, default=str) + ",\n" for e in events).encode("utf-8")
+    fd = os.open(str(path), os.O_WRONLY | os.O_APPEND)
+    try:
+        os.write(fd, payload)
+    finally:
+        os.close(fd)
+
+def _write_trace_span(name, start, duration, category, args):
+    pid, tid = os.getpid(), threading.get_native_id()
+    events = []
+    key = (pid, tid, str(trace_path()))
+    if key not in _TRACE_NAMED:
+        _TRACE_NAMED.add(key)
+        process = os.getenv("AIRFLOW_CTX_TASK_ID") or Path(sys.argv[0]).stem or "python"
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": f"{process} (pid {pid})"}})
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": threading.current_thread().name}})
+    events.append({
+        "name": name, "cat": category, "ph": "X",
+        "ts": int(start * 1e6), "dur": max(int(duration * 1e6), 1),
+        "pid": pid, "tid": tid, "args": args
+    })
+    _append_trace_events(events)
+
+@contextmanager
+def trace_span(name, category="step", **args):
+    """Records the enclosed block as one span on this process/thread's timeline."""
+    if not PIPELINE_TRACING:
+        yield
+        return
+    start = time.time()
+    try:
+        yield
+    except BaseException as e:
+        args["error"] = type(e).__name__
+        raise
+    finally:
+        try:
+            _write_trace_span(name, start, time.time() - start, category, args)
+        except OSError:
+            pass
+
+# Stage Profiling
+PROFILE_OPTIONS = ("resources", "tracemalloc", "cprofile")
+
+def _profile_options(profile):
+    """Normalises a profile spec ("resources,tracemalloc", "all", True, ...) to a set of options."""
+    if profile is None:
+        profile = PIPELINE_PROFILE
+    if profile is True:
+        profile = "resources"
+    if not profile or profile in ("off", "false", "none"):
+        return frozenset()
+    options = {p.strip().lower() for p in str(profile).split(",") if p.strip()}
+    if "all" in options:
+        return frozenset(PROFILE_OPTIONS)
+    return frozenset(options & set(PROFILE_OPTIONS))
+
+def _read_proc_io():
+    """Bytes read/written by this process (Linux /proc only)."""
+    try:
+        with open("/proc/self/io", "r") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return {k: int(fields[k]) for k in ("rchar", "wchar", "read_bytes", "write_bytes")}
+    except (OSError, KeyError, ValueError):
+        return None
+
+class _StageProfiler:
+    """Collects CPU, memory, GC and I/O measurements around one stage."""
+
+    def __init__(self, stage_name, options):
+        self.stage_name = stage_name
+        self.options = options
+        self.gc_pauses = [0, 0, 0]
+        self.gc_pause_seconds = 0.0
+        self._gc_started = None
+        self._started_tracemalloc = False
+        self._cprofile = None
+
+    def _on_gc(self, phase, info):
+        if phase == "start":
+            self._gc_started = time.perf_counter()
+        elif self._gc_started is not None:
+            self.gc_pause_seconds += time.perf_counter() - self._gc_started
+            self.gc_pauses[info.get("generation", 2)] += 1
+            self._gc_started = None
+
+    def start(self):
+        if "resources" in self.options:
+            self._rusage = resource.getrusage(resource.RUSAGE_SELF)
+            self._io = _read_proc_io()
+            gc.callbacks.append(self._on_gc)
+        if "tracemalloc" in self.options:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                self._started_tracemalloc = True
+            elif hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+        if "cprofile" in self.options:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stop(self, duration, status):
+        if self._cprofile is not None:
+            self._cprofile.disable()
+
+        report = {
+            "stage": self.stage_name,
+            "status": status,
+            "wall_seconds": round(duration, 3),
+            "pid": os.getpid(),
+            "recorded_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        if "resources" in self.options:
+            gc.callbacks.remove(self._on_gc)
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            report["cpu_user_seconds"] = round(usage.ru_utime - self._rusage.ru_utime, 3)
+            report["cpu_system_seconds"] = round(usage.ru_stime - self._rusage.ru_stime, 3)
+            # ru_maxrss is KB on Linux and bytes on macOS; it is the peak of the whole process
+            report["peak_rss_mb"] = round(usage.ru_maxrss / (1024**2 if sys.platform == "darwin" else 1024), 1)
+            report["gc_pauses"] = {f"gen{g}": n for g, n in enumerate(self.gc_pauses)}
+            report["gc_pause_seconds"] = round(self.gc_pause_seconds, 4)
+            io_end = _read_proc_io()
+            if self._io and io_end:
+                report["io_bytes"] = {k: io_end[k] - self._io[k] for k in io_end}
+        if "tracemalloc" in self.options:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            report["tracemalloc_peak_mb"] = round(peak / 1024**2, 2)
+            # Allocations still alive at stage end, grouped by source line
+            report["top_allocators"] = [
+                {"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 "size_kb": round(stat.size / 1024, 1), "blocks": stat.count}
+                for stat in snapshot.statistics("lineno")[:TRACEMALLOC_TOP]
+            ]
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        if self._cprofile is not None:
+            PROFILES_DIR.mkdir(parents=True, exist_ok=True)
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            path = PROFILES_DIR / f"{_stage_slug(self.stage_name)}_{stamp}_{os.getpid()}.prof"
+            self._cprofile.dump_stats(str(path))
+            report["cprofile_path"] = str(path)
+        return report
+
+def _stage_slug(stage_name):
+    return "".join(c if c.isalnum() else "_" for c in stage_name.lower()).strip("_")
+
+def _record_stage_profile(logger, report):
+    key = f"stage_profile.{_stage_slug(report['stage'])}"
+    # Parallel tasks can share a stage name (e.g. one "Model Training" per model)
+    task_id = os.getenv("AIRFLOW_CTX_TASK_ID")
+    if task_id:
+        key = f"{key}.{task_id}"
+    save_metadata({key: report})
+    summary = {k: v for k, v in report.items() if k not in ("top_allocators", "stage", "recorded_at")}
+    log_dict_table(logger, summary, title=f"Profile: {report['stage']}")
+
 # Decorators
-def log_stage(stage_name):
-    """Wraps functions with entry/exit banners and timing."""
+def log_stage(stage_name, profile=None):
+    """
+    Wraps functions with entry/exit banners and timing.
+
+    profile: "resources", "tracemalloc", "cprofile" (comma-separated) or "all".
+    Defaults to the PIPELINE_PROFILE environment variable; profiling is off when unset.
+    """
     def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
@@ -162,10 +510,17 @@ def log_stage(stage_name):
             logger.info(f"STAGE: {stage_name}")
             logger.info("="*60)
             
+            options = _profile_options(profile)
+            profiler = _StageProfiler(stage_name, options) if options else None
+            if profiler:
+                profiler.start()
             start_time = time.time()
+            status = "failed"
             try:
-                result = func(*args, **kwargs)
+                with trace_span(stage_name, category="stage"):
+                    result = func(*args, **kwargs)
                 duration = time.time() - start_time
+                status = "success"
                 logger.info(f"SUCCESS: {stage_name} completed in {duration:.2f}s")
                 return result
             except Exception as e:
@@ -173,42 +528,207 @@ def log_stage(stage_name):
                 logger.error(f"FAILURE: {stage_name} failed after {duration:.2f}s")
                 logger.error(traceback.format_exc())
                 raise e
+            finally:
+                if profiler:
+                    try:
+                        _record_stage_profile(logger, profiler.stop(time.time() - start_time, status))
+                    except Exception as e:
+                        logger.warning(f"Could not record profile for {stage_name}: {e}")
+                # Airflow may hard-exit the task process, so drain the writer at stage end
+                flush_logs()
         return wrapper
     return decorator
 
 # Metadata I/O
-def save_metadata(data, path=METADATA_PATH):
-    """Saves pipeline metadata to a JSON file."""
+# Metadata lives in an append-only SQLite log (WAL mode): every save_metadata() call
+# appends one row per top-level key in a single short transaction, so the parallel
+# training tasks never overwrite each other and a write costs O(update), not O(history).
+# load_metadata() returns the latest value of every key, matching the old JSON file.
+def _metadata_jsonable(value):
+    """Converts numpy scalars (and dict keys) so metadata round-trips through JSON."""
+    if isinstance(value, dict):
+        return {
+            (k.item() if hasattr(k, "item") else k): _metadata_jsonable(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [_metadata_jsonable(v) for v in value]
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):
+        return value.item()
+    return value
+
+# SQLite connections must not cross a fork or be shared between threads
+_METADATA_CONNECTIONS = {}
+
+def _metadata_connection(path=METADATA_DB_PATH):
+    """Returns this process/thread's connection to the metadata store, creating the schema once."""
+    path = Path(path)
+    key = (os.getpid(), threading.get_ident(), str(path))
+    conn = _METADATA_CONNECTIONS.get(key)
+    if conn is not None:
+        return conn
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # isolation_level=None: transactions are opened explicitly with BEGIN IMMEDIATE
+    conn = sqlite3.connect(str(path), timeout=METADATA_BUSY_TIMEOUT, isolation_level=None)
+    conn.execute(f"PRAGMA busy_timeout = {int(METADATA_BUSY_TIMEOUT * 1000)}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        created = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'metadata_log'"
+        ).fetchone() is None
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS metadata_log ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "recorded_at TEXT NOT NULL, pid INTEGER NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS metadata_log_key ON metadata_log (key, seq)")
+        # One-time import of a pre-existing pipeline_metadata.json
+        if created and METADATA_PATH.exists():
+            try:
+                with open(METADATA_PATH, "r") as f:
+                    legacy = json.load(f)
+                _append_metadata_rows(conn, legacy)
+            except (OSError, ValueError) as e:
+                print(f"Skipping legacy metadata import: {e}")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        conn.close()
+        raise
+
+    _METADATA_CONNECTIONS[key] = conn
+    return conn
+
+def _append_metadata_rows(conn, data):
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    conn.executemany(
+        "INSERT INTO metadata_log (key, value, recorded_at, pid) VALUES (?, ?, ?, ?)",
+        [(str(k), json.dumps(_metadata_jsonable(v)), now, os.getpid()) for k, v in data.items()]
+    )
+
+def save_metadata(data, path=METADATA_DB_PATH):
+    """Appends pipeline metadata (one row per top-level key) to the metadata store."""
     try:
-        existing_data = load_metadata(path)
-        existing_data.update(data)
-        existing_data["last_updated"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        with open(path, 'w') as f:
-            json.dump(existing_data, f, indent=4)
+        entries = dict(data)
+        entries["last_updated"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        conn = _metadata_connection(path)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            _append_metadata_rows(conn, entries)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
     except Exception as e:
         print(f"Error saving metadata: {e}")
 
-def load_metadata(path=METADATA_PATH):
-    """Loads pipeline metadata from a JSON file."""
-    if not path.exists():
-        return {}
+def get_metadata(key, default=None, path=METADATA_DB_PATH):
+    """Reads the latest value of a single metadata key."""
+    try:
+        row = _metadata_connection(path).execute(
+            "SELECT value FROM metadata_log WHERE key = ? ORDER BY seq DESC LIMIT 1", (key,)
+        ).fetchone()
+    except Exception:
+        return default
+    return json.loads(row[0]) if row else default
+
+def get_metadata_history(key, limit=None, path=METADATA_DB_PATH):
+    """Returns [(recorded_at, value), ...] for a key, newest first (e.g. stage profiles across runs)."""
+    query = "SELECT recorded_at, value FROM metadata_log WHERE key = ? ORDER BY seq DESC"
+    params = (key,)
+    if limit:
+        query += " LIMIT ?"
+        params = (key, int(limit))
+    try:
+        rows = _metadata_connection(path).execute(query, params).fetchall()
+    except Exception:
+        return []
+    return [(recorded_at, json.loads(value)) for recorded_at, value in rows]
+
+def load_metadata(path=METADATA_DB_PATH):
+    """Loads the latest value of every metadata key (same shape as the old JSON file)."""
     try:
-        with open(path, 'r') as f:
-            return json.load(f)
+        rows = _metadata_connection(path).execute(
+            "SELECT key, value FROM metadata_log WHERE seq IN "
+            "(SELECT MAX(seq) FROM metadata_log GROUP BY key) ORDER BY seq"
+        ).fetchall()
     except Exception:
         return {}
+    return {key: json.loads(value) for key, value in rows}
+
+def compact_metadata(path=METADATA_DB_PATH):
+    """Drops superseded rows, keeping only the latest value of each key."""
+    conn = _metadata_connection(path)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        removed = conn.execute(
+            "DELETE FROM metadata_log WHERE seq NOT IN "
+            "(SELECT MAX(seq) FROM metadata_log GROUP BY key)"
+        ).rowcount
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return removed
+
+def export_metadata_json(path=METADATA_PATH):
+    """Writes a readable snapshot of the current metadata to pipeline_metadata.json."""
+    snapshot = load_metadata()
+    tmp_path = Path(str(path) + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot, f, indent=4)
+    os.replace(tmp_path, path)
+    return path
 
 # Display Helpers
-def log_dataframe_summary(logger, df, name="DataFrame"):
-    """Logs key statistics of a pandas DataFrame."""
-    logger.info(f"Summary of {name}:")
+def log_dataframe_summary(logger, df, name="DataFrame", exact=None):
+    """
+    Logs key statistics of a pandas DataFrame.
+
+    Nothing is computed unless the logger will emit INFO records. Frames with more
+    than SUMMARY_SAMPLE_THRESHOLD rows are summarised from a uniform sample of
+    SUMMARY_SAMPLE_SIZE rows (estimates are prefixed with "~"); pass exact=True,
+    or set SUMMARY_EXACT=true, for full-frame statistics.
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    if exact is None:
+        exact = SUMMARY_EXACT
+    n_rows = len(df)
+    if exact or n_rows <= SUMMARY_SAMPLE_THRESHOLD:
+        logger.info(f"Summary of {name}:")
+        logger.info(f" - Shape: {df.shape}")
+        logger.info(f" - Memory: {df.memory_usage(deep=True).sum() / 1024**2:.2f} MB")
+        logger.info(f" - Missing Values: {df.isnull().sum().sum()}")
+        if "quality" in df.columns:
+            dist = df["quality"].value_counts().to_dict()
+            logger.info(f" - Class Distribution: {dist}")
+        return
+
+    rng = np.random.default_rng(SUMMARY_SAMPLE_SEED)
+    rows = np.sort(rng.choice(n_rows, size=SUMMARY_SAMPLE_SIZE, replace=False))
+    sample = df.take(rows)
+    scale = n_rows / len(sample)
+
+    # Fixed-width columns are sized exactly from dtypes; only object payloads are estimated
+    memory = df.memory_usage(deep=False).sum()
+    object_columns = sample.select_dtypes(include="object").columns
+    if len(object_columns):
+        payload = (sample[object_columns].memory_usage(deep=True, index=False).sum()
+                   - sample[object_columns].memory_usage(deep=False, index=False).sum())
+        memory += payload * scale
+
+    logger.info(f"Summary of {name} (sampled {len(sample):,} of {n_rows:,} rows):")
     logger.info(f" - Shape: {df.shape}")
-    logger.info(f" - Memory: {df.memory_usage(deep=True).sum() / 1024**2:.2f} MB")
-    logger.info(f" - Missing Values: {df.isnull().sum().sum()}")
-    if "quality" in df.columns:
-        dist = df["quality"].value_counts().to_dict()
-        logger.info(f" - Class Distribution: {dist}")
+    logger.info(f" - Memory: ~{memory / 1024**2:.2f} MB")
+    logger.info(f" - Missing Values: ~{int(round(sample.isnull().sum().sum() * scale))}")
+    if "quality" in sample.columns:
+        dist = {k: int(round(v * scale)) for k, v in sample["quality"].value_counts().items()}
+        logger.info(f" - Class Distribution: ~{dist}")
 
 def log_dict_table(logger, data, title="Data"):
     """Formats a dictionary as an aligned table in logs."""